@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Time the compiled key-path program (context_ops.compile_ops) on large --set/--add sets.
+
+  python benchmarks/bench_context_ops.py                 # 10k and 100k operations
+  python benchmarks/bench_context_ops.py -s 1000000 -n 3
+
+Operations look like generated configs: dotted --set keys sharing prefixes,
+KEY[] / KEY[n] array forms, --add and KEY:INDEX pairs. Each size is applied
+by the compiled program and by a per-pair walk from the root (what
+context_ops did before), best of N; the script fails (exit 1) if the two
+contexts differ.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.context_ops import _ensure_list_at, _set_nested, compile_ops  # noqa: E402
+from modules.utils import _ARRAY_KEY_RE, _COLON_INDEX_RE  # noqa: E402
+
+FLAGS = ("set", "set_file", "set_json", "set_json_file", "add", "add_file", "set_index", "set_file_index")
+
+
+def _operations(n: int) -> SimpleNamespace:
+  ops: Dict[str, List[str]] = {flag: [] for flag in FLAGS}
+  for i in range(n):
+    svc, kind = f"services.svc{i % 200}", i % 10
+    if kind < 6:
+      ops["set"].append(f"{svc}.settings.group{i % 7}.key{i}=value{i}")
+    elif kind == 6:
+      ops["set"].append(f"{svc}.tags[]=tag{i}")
+    elif kind == 7:
+      ops["set"].append(f"{svc}.slots[{i % 5}]=slot{i}")
+    elif kind == 8:
+      ops["add"].append(f"{svc}.notes=note{i}")
+    else:
+      ops["set_index"].append(f"{svc}.ports:{i % 3}={8000 + i}")
+  return SimpleNamespace(**ops)
+
+
+def _set_index(lst: List[Any], i: int, value: Any) -> None:
+  if len(lst) <= i: lst.extend([None] * (i + 1 - len(lst)))
+  lst[i] = value
+
+
+def _per_pair(ops: SimpleNamespace) -> Dict[str, Any]:
+  # The pre-compilation algorithm: split and walk from the root for every pair.
+  ctx: Dict[str, Any] = {}
+  for pair in ops.set:
+    key, value = pair.split("=", 1)
+    parts, last = key.split("."), key.split(".")[-1]
+    m = _ARRAY_KEY_RE.match(last)
+    if not m or m.group("index") is None:
+      _set_nested(ctx, key, value); continue
+    lst = _ensure_list_at(ctx, ".".join(parts[:-1] + [m.group("name")]))
+    if m.group("index") == "":
+      lst.append(value)
+    else:
+      _set_index(lst, int(m.group("index")), value)
+  for pair in ops.add:
+    key, value = pair.split("=", 1)
+    _ensure_list_at(ctx, key).append(value)
+  for pair in ops.set_index:
+    key, value = pair.split("=", 1)
+    m = _COLON_INDEX_RE.match(key)
+    _set_index(_ensure_list_at(ctx, m.group("name")), int(m.group("index")), value)  # type: ignore[union-attr]
+  return ctx
+
+
+def _compiled(ops: SimpleNamespace) -> Dict[str, Any]:
+  return compile_ops(ops).run({})
+
+
+def _time(fn: Callable[[SimpleNamespace], Any], ops: SimpleNamespace, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn(ops)
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  ap.add_argument("-s", "--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Operation counts to time.")
+  ap.add_argument("-n", "--repeat", type=int, default=5, help="Runs per implementation; the best is reported.")
+  args = ap.parse_args(argv)
+
+  mismatches = 0
+  for size in args.sizes:
+    ops = _operations(size)
+    if _compiled(ops) != _per_pair(ops):
+      print(f"{size:>9} ops: MISMATCH between compiled and per-pair results")
+      mismatches += 1
+      continue
+    before, after = _time(_per_pair, ops, args.repeat), _time(_compiled, ops, args.repeat)
+    print(f"{size:>9} ops: per-pair {before * 1000:8.1f} ms   compiled {after * 1000:8.1f} ms   x{before / after:.2f}")
+  return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Time merge.Merger against the recursive deep_merge on many large --load documents.
+
+  python benchmarks/bench_merge.py                       # 50 documents of ~10 MB
+  python benchmarks/bench_merge.py -d 20 -m 2 -n 3
+
+The documents look like layered configs: every one sets the same sections
+(so later ones override earlier ones), carries a keyed `services` list and
+adds a section of its own. Both merges start from an empty context; document
+generation is not timed. The script fails (exit 1) if the contexts differ,
+or if the Merger modified a source document. The keyed:name run is reported
+on its own (the recursive merge has no strategies).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.merge import Merger  # noqa: E402
+
+ROW = 70  # approximate JSON bytes per generated setting
+
+
+def _document(i: int, mb: float) -> Dict[str, Any]:
+  rows = max(1, int(mb * 1024 * 1024 / ROW))
+  groups, services = max(1, rows // 1000), max(1, rows // 200)
+  per_group = max(1, (rows - services * 4) // (groups + 1))
+  doc: Dict[str, Any] = {"settings": {
+    f"group{g}": {f"key{k}": f"value {i:03d}/{g}/{k} " + "x" * 40 for k in range(per_group)}
+    for g in range(groups)
+  }}
+  doc["services"] = [{"name": f"svc{s}", "env": {f"E{i % 4}": f"doc{i}"}, "replicas": i, "tags": [f"t{i}"]}
+                     for s in range(i % 3, services, 3)]
+  doc[f"doc{i}"] = {f"own{k}": f"only in document {i}, row {k}" for k in range(per_group)}
+  return doc
+
+
+def _deep_merge(dst: Dict[str, Any], src: Dict[str, Any]) -> Dict[str, Any]:
+  # The recursive merge that utils.deep_merge used before merge.Merger.
+  for k, v in src.items():
+    if isinstance(v, dict) and isinstance(dst.get(k), dict):
+      _deep_merge(dst[k], v)
+    else:
+      dst[k] = v
+  return dst
+
+
+def _run(merge: Callable[[Dict[str, Any], Dict[str, Any]], Any], docs: int, mb: float, check: bool = False) -> float:
+  ctx: Dict[str, Any] = {}
+  total = 0.0
+  sample: List[Any] = []
+  for i in range(docs):
+    doc = _document(i, mb)
+    if check and i == 0:
+      sample = [doc, json.dumps(doc)]
+    start = time.perf_counter()
+    merge(ctx, doc)
+    total += time.perf_counter() - start
+  if check and json.dumps(sample[0]) != sample[1]:
+    raise SystemExit("Merger modified a source document")
+  _run.last = ctx  # type: ignore[attr-defined]
+  return total
+
+
+def _best(fn: Callable[[], float], repeat: int) -> float:
+  return min(fn() for _ in range(repeat))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  ap.add_argument("-d", "--docs", type=int, default=50, help="Documents merged per run.")
+  ap.add_argument("-m", "--mb", type=float, default=10.0, help="Approximate JSON size of each document in MB.")
+  ap.add_argument("-n", "--repeat", type=int, default=1, help="Runs per implementation; the best is reported.")
+  args = ap.parse_args(argv)
+
+  size = len(json.dumps(_document(0, args.mb))) / 1024 / 1024
+  print(f"{args.docs} documents of {size:.1f} MB")
+  recursive = _best(lambda: _run(_deep_merge, args.docs, args.mb), args.repeat)
+  expected = _run.last  # type: ignore[attr-defined]
+  merger = _best(lambda: _run(Merger().merge, args.docs, args.mb, check=True), args.repeat)
+  if _run.last != expected:  # type: ignore[attr-defined]
+    print("MISMATCH between Merger and recursive deep_merge results")
+    return 1
+  keyed = _best(lambda: _run(Merger({"services": "keyed:name"}).merge, args.docs, args.mb), args.repeat)
+  print(f"recursive {recursive * 1000:9.1f} ms   Merger {merger * 1000:9.1f} ms   x{recursive / merger:.2f}")
+  print(f"Merger with services=keyed:name {keyed * 1000:9.1f} ms")
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
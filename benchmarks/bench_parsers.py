@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Compare the JSON/YAML parser backends (modules/parsers.py) on a --load corpus.
+
+  python benchmarks/bench_parsers.py                     # repo resources/ + config/
+  python benchmarks/bench_parsers.py data/**/*.yaml -n 50
+
+Each backend parses every corpus file; the script reports the best-of-N
+total time per backend and fails (exit 1) if any backend's documents differ
+from the stdlib/pure-Python result. Files no backend can parse (e.g. YAML
+templates with Jinja tags) are skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules import parsers  # noqa: E402
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_PATTERNS = ["resources/**/*.json", "resources/**/*.yaml", "resources/**/*.yml",
+                    "config/**/*.json", "config/**/*.yaml", "config/**/*.yml"]
+
+
+def _corpus(patterns: List[str]) -> List[Tuple[str, str]]:
+  files = {f for pat in patterns for f in glob.glob(pat, recursive=True) if os.path.isfile(f)}
+  out = []
+  for f in sorted(files):
+    with open(f, encoding="utf-8") as fp:
+      out.append((f, fp.read()))
+  return out
+
+
+def _parser(kind: str, backend: str) -> Callable[[str], Any]:
+  os.environ[parsers.JSON_ENV if kind == "json" else parsers.YAML_ENV] = backend
+  if kind == "json":
+    return parsers.json_backend()[1]
+  loader = parsers.yaml_backend()[1]
+  import yaml
+  return lambda text: list(yaml.load_all(text, Loader=loader))
+
+
+def _available(kind: str) -> List[str]:
+  names = []
+  for backend in (("stdlib", "orjson") if kind == "json" else ("python", "c")):
+    try:
+      _parser(kind, backend)
+      names.append(backend)
+    except SystemExit:
+      pass
+  return names
+
+
+def _time(fn: Callable[[str], Any], texts: List[str], repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for t in texts:
+      fn(t)
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  ap.add_argument("paths", nargs="*", help="Corpus files or globs (default: the repo's resources/ and config/).")
+  ap.add_argument("-n", "--repeat", type=int, default=20, help="Runs per backend; the best is reported.")
+  args = ap.parse_args(argv)
+
+  corpus = _corpus(args.paths or [os.path.join(REPO, p) for p in DEFAULT_PATTERNS])
+  mismatches = 0
+  for kind in ("json", "yaml"):
+    backends = _available(kind)
+    reference = _parser(kind, backends[0])
+    # JSON backends get the .json files; YAML backends get everything (JSON is YAML).
+    texts, expected = [], []
+    for path, text in corpus:
+      if kind == "json" and not path.endswith(".json"):
+        continue
+      try:
+        expected.append(reference(text))
+        texts.append(text)
+      except Exception:
+        continue
+    size = sum(len(t) for t in texts)
+    print(f"{kind}: {len(texts)} files, {size / 1024:.1f} KiB, best of {args.repeat}")
+    timings: Dict[str, float] = {}
+    for backend in backends:
+      fn = _parser(kind, backend)
+      if [fn(t) for t in texts] != expected:
+        print(f"  {backend:8s} MISMATCH against {backends[0]}")
+        mismatches += 1
+        continue
+      timings[backend] = _time(fn, texts, args.repeat)
+    base = timings.get(backends[0])
+    for backend, secs in timings.items():
+      speedup = f"  x{base / secs:.1f}" if base and secs else ""
+      print(f"  {backend:8s} {secs * 1000:9.2f} ms{speedup}")
+  return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
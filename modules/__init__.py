@@ -1,8 +1,10 @@
 __all__ = [
+    "batch",
     "cli",
     "config",
     "context_ops",
     "jinja_filters",
+    "renderer",
     "structload",
     "template_env",
     "utils",
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from .layered import LayeredDict
+from .utils import die, expand_path
+
+# Context-building keys accepted by a manifest entry (same meaning as the CLI flags).
+OP_KEYS = [
+  "load", "load_into",
+  "set", "set_file", "set_json", "set_json_file",
+  "add", "add_file", "set_index", "set_file_index",
+]
+
+# Per-process state shared by every item rendered in that process.
+_BASE_CTX: Dict[str, Any] = {}
+_BASE_SEARCH: List[str] = []
+
+
+def _as_list(val: Any) -> List[Any]:
+  if val is None:
+    return []
+  return list(val) if isinstance(val, list) else [val]
+
+
+def load_manifest(path_str: str) -> List[Dict[str, Any]]:
+  """Read a batch manifest.
+
+  `.jsonl`/`.ndjson` files hold one JSON object per line (blank lines and
+  lines starting with '#' are skipped). Anything else is read as JSON/YAML:
+  either a list of entries, a mapping with an `items` list, or a multi-doc
+  YAML stream with one entry per document.
+  """
+  p = Path(expand_path(path_str))
+  if not p.exists():
+    die(f"Batch manifest not found: {p}")
+  if p.suffix.lower() in (".jsonl", ".ndjson"):
+    entries: List[Any] = []
+    for lineno, line in enumerate(p.read_text(encoding="utf-8").splitlines(), 1):
+      line = line.strip()
+      if not line or line.startswith("#"):
+        continue
+      try:
+        entries.append(json.loads(line))
+      except Exception as e:
+        die(f"Invalid JSON in batch manifest {p}:{lineno}: {e}")
+  else:
+    from .structload import load_structured_file
+    docs = load_structured_file(str(p))
+    if len(docs) == 1 and isinstance(docs[0], list):
+      entries = docs[0]
+    elif len(docs) == 1 and isinstance(docs[0], dict) and isinstance(docs[0].get("items"), list):
+      entries = docs[0]["items"]
+    else:
+      entries = [d for d in docs if d is not None]
+  for i, entry in enumerate(entries):
+    if not isinstance(entry, dict):
+      die(f"Batch manifest entry {i} must be a mapping, got {type(entry).__name__}")
+  return entries
+
+
+def _init_worker(base_ctx: Dict[str, Any], base_search: List[str], cache_environments: bool = True) -> None:
+  from .template_env import enable_environment_cache
+  global _BASE_CTX, _BASE_SEARCH
+  _BASE_CTX, _BASE_SEARCH = base_ctx, base_search
+  if cache_environments:
+    enable_environment_cache()
+
+
+def render_entry(entry: Dict[str, Any], default_template: Optional[str] = None) -> str:
+  """Render one manifest entry on top of the shared base context.
+
+  Besides the CLI-style operations, `values` maps (dotted) keys to values
+  assigned as-is after them. Returns the output path written, or the
+  rendered text when the entry has no `out`.
+  """
+  from .cli import apply_context_ops
+  from .template_env import render_template, stream_template, write_rendered
+
+  template = entry.get("template") or entry.get("template_name") or default_template
+  if not template:
+    die("batch entry has no 'template'")
+  tpl_path = Path(expand_path(str(template)))
+  if not tpl_path.exists():
+    die(f"Template not found: {tpl_path}")
+
+  ops = SimpleNamespace(**{k: [str(x) if not isinstance(x, dict) else x for x in _as_list(entry.get(k))]
+                           for k in OP_KEYS})
+  # A copy-on-write layer: the entry's cost grows with its overrides, not the base.
+  ctx = apply_context_ops(LayeredDict(_BASE_CTX), ops)
+  if entry.get("values"):
+    from .context_ops import _set_nested
+    for key, value in entry["values"].items():
+      _set_nested(ctx, str(key), value)
+
+  extra_search = _BASE_SEARCH + [str(x) for x in _as_list(entry.get("template_search"))]
+  out = entry.get("out")
+  if not out:
+    return render_template(tpl_path, ctx, extra_search)
+  out_path = Path(expand_path(str(out)))
+  write_rendered(stream_template(tpl_path, ctx, extra_search), out_path)
+  return str(out_path)
+
+
+def _run_item(item: Tuple[int, Dict[str, Any], Optional[str]]) -> Tuple[int, bool, str]:
+  """Render one item, turning die()/exceptions into a failure record."""
+  import contextlib
+  import io
+  index, entry, default_template = item
+  err = io.StringIO()
+  try:
+    with contextlib.redirect_stderr(err):
+      return index, True, render_entry(entry, default_template)
+  except SystemExit:
+    msg = err.getvalue().strip()
+    if msg.startswith("ERROR: "):
+      msg = msg[len("ERROR: "):]
+    return index, False, msg or "failed"
+  except Exception as e:
+    return index, False, f"{type(e).__name__}: {e}"
+
+
+def run_batch(args) -> None:
+  """Render every manifest entry, sharing config, base context and environments."""
+  run_entries(args, load_manifest(args.batch))
+
+
+def run_entries(args, entries: List[Dict[str, Any]], *, default_jobs: int = 1) -> None:
+  """Render entries on top of the base context built from args.
+
+  The base context is built once from the config/CLI flags; each entry's own
+  operations are applied to a copy of it. Failures are reported per item and
+  summarised at the end instead of aborting the run.
+  """
+  from .cli import build_context
+
+  base_ctx = build_context(args)
+  if args.print_context:
+    from .lazy_values import context_json
+    sys.stderr.write(context_json(base_ctx) + "\n")
+
+  jobs = default_jobs if args.jobs is None else args.jobs
+  if jobs <= 0:
+    jobs = os.cpu_count() or 1
+  items = [(i, e, args.template_name) for i, e in enumerate(entries)]
+
+  start = time.perf_counter()
+  if jobs == 1 or len(items) <= 1:
+    _init_worker(base_ctx, list(args.template_search))
+    results = [_run_item(it) for it in items]
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items)), initializer=_init_worker,
+                             initargs=(base_ctx, list(args.template_search))) as pool:
+      results = list(pool.map(_run_item, items, chunksize=max(1, len(items) // (jobs * 4))))
+  elapsed = time.perf_counter() - start
+
+  failed = 0
+  for index, ok, payload in results:
+    if not ok:
+      failed += 1
+      sys.stderr.write(f"FAILED [{index}] {entries[index].get('template') or args.template_name}: {payload}\n")
+    elif not entries[index].get("out"):
+      print(payload, end="")
+
+  done = len(results) - failed
+  rate = len(results) / elapsed if elapsed > 0 else float("inf")
+  sys.stderr.write(f"batch: {done} rendered, {failed} failed, {elapsed:.2f}s ({rate:.1f} items/s, jobs={jobs})\n")
+  if failed:
+    raise SystemExit(1)
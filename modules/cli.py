@@ -1,31 +1,55 @@
 from __future__ import annotations
 
 import argparse
-import json
+import contextlib
+import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional
 
 from .utils import die
+from .parsers import JSON_BACKENDS, YAML_BACKENDS
 from .config import find_config_path, load_config, merge_config_into_args
-from .context_ops import (
-  apply_set_pairs, apply_set_file, apply_set_json, apply_set_json_file,
-  apply_add, apply_add_file, apply_set_index, apply_set_file_index
-)
-from .structload import load_structured_glob
-from .template_env import render_template
+from .context_ops import compile_ops
 
-with open('./docs/codex_prompt_builder.cli.help.md') as f:
-  helptext = f.read()
+# Heavy modules (jinja2 via template_env, yaml via structload/jinja_filters, json)
+# are imported inside the code paths that need them to keep cold start cheap.
+
+HELP_PATH = Path(__file__).resolve().parent.parent / "docs" / "codex_prompt_builder.cli.help.md"
+_extended_help: Optional[str] = None
+
+
+def extended_help() -> str:
+  """Extended help text, read from HELP_PATH on first use (independent of cwd)."""
+  global _extended_help
+  if _extended_help is None:
+    try:
+      _extended_help = HELP_PATH.read_text(encoding="utf-8")
+    except OSError:
+      _extended_help = f"(extended help not found: {HELP_PATH})\n"
+  return _extended_help
+
+
+def __getattr__(name: str) -> Any:
+  # Back-compat: EXTENDED_HELP used to be a module constant read at import time.
+  if name == "EXTENDED_HELP":
+    return extended_help()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazyEpilogParser(argparse.ArgumentParser):
+  """ArgumentParser whose epilog (the extended help) is only read when help is formatted."""
+
+  def format_help(self) -> str:
+    self.epilog = extended_help()
+    return super().format_help()
 
-EXTENDED_HELP = helptext
 
 def build_argparser() -> argparse.ArgumentParser:
-  p = argparse.ArgumentParser(
+  p = _LazyEpilogParser(
     description="Render a Jinja2 template with values from CLI flags (modular Codex Assistant).",
     formatter_class=argparse.RawTextHelpFormatter,
-    epilog=EXTENDED_HELP
   )
-  p.add_argument("--template-name", required=True, help="Path to the Jinja2 template file.")
+  p.add_argument("--template-name", help="Path to the Jinja2 template file. Required unless --batch or --pipeline is given.")
   p.add_argument("--template-search", action="append", default=[], help="Additional template/include search paths. Repeatable.")
   p.add_argument("--config", help="Optional path to codex config (YAML/JSON). If omitted, default locations are searched.")
   p.add_argument("--help-extended", action="store_true", help="Show extended help (config schema, macros, examples) and exit.")
@@ -33,6 +57,7 @@ def build_argparser() -> argparse.ArgumentParser:
   # Structured config loading
   p.add_argument("--load", action="append", default=[], help="PATH_OR_GLOB of .json/.yaml/.yml. Deep-merge mapping docs into root context. Repeatable.")
   p.add_argument("--load-into", action="append", default=[], help="KEY=PATH_OR_GLOB of .json/.yaml/.yml. Assign parsed doc(s) to KEY. Repeatable.")
+  p.add_argument("--merge-strategy", action="append", default=[], help="PATH=replace|append|merge|keyed:FIELD. How --load merges the value at PATH ('*' matches any key). Repeatable.")
 
   # Scalars / JSON
   p.add_argument("--set", action="append", default=[], help="KEY=VALUE (nest with A.B=value). '@path' loads file text. Repeatable.")
@@ -47,13 +72,66 @@ def build_argparser() -> argparse.ArgumentParser:
   p.add_argument("--add-file", action="append", default=[], help="KEY=/path/or/glob. Append contents of matches to list KEY. Repeatable.")
   p.add_argument("--set-index", action="append", default=[], help="KEY:INDEX=VALUE. Set list element at INDEX. VALUE may be '@file'. Repeatable.")
   p.add_argument("--set-file-index", action="append", default=[], help="KEY:INDEX=/path. Set list element from file (exactly one match). Repeatable.")
+  p.add_argument("--list-index-limit", type=int, help="Reject KEY[n]/KEY:n assignments with n above this (default: no limit).")
+  p.add_argument("--dense-list-gap", type=int, help="Pad lists with at most this many None slots per index assignment; larger jumps make the list sparse (default 65536; -1 = always pad).")
+  p.add_argument("--exclude", action="append", default=[], help="Gitignore-style pattern pruned from every glob (e.g. node_modules/). Repeatable.")
+  p.add_argument("--respect-ignore", action="store_true", default=None, help="Also prune paths matched by .gitignore/.codexignore files when expanding globs.")
+  p.add_argument("--no-ignore", action="store_true", help="Do not read .gitignore/.codexignore files (the default; overrides --respect-ignore and config).")
+
+  # Template bytecode cache
+  p.add_argument("--cache-dir", help="Directory for on-disk caches (default: $CODEX_CACHE_DIR or $XDG_CACHE_HOME/codex-assistant).")
+  p.add_argument("--no-template-cache", action="store_true", help="Do not read or write the compiled-template cache.")
+  p.add_argument("--clear-template-cache", action="store_true", help="Delete the compiled-template cache (exits if nothing else to do).")
+  p.add_argument("--json-backend", choices=JSON_BACKENDS, help="JSON parser for --load/read_json: stdlib, orjson (if installed) or auto (default).")
+  p.add_argument("--yaml-backend", choices=YAML_BACKENDS, help="YAML parser/dumper: c (libyaml), python, or auto (default: c when available).")
+  p.add_argument("--io-workers", type=int, help="Threads reading the matches of multi-file loads/globs concurrently (default 8; 1 = sequential).")
+  p.add_argument("--parse-processes", type=int, help="Processes parsing the files of a multi-file --load/--load-into in parallel (default 0 = in-process).")
+  p.add_argument("--no-doc-cache", action="store_true", help="Do not read or write the parsed-document cache for YAML --load files.")
+  p.add_argument("--stream-loads", action="store_true", default=None, help="Bind every --load-into as a stream of documents parsed during iteration (always on for .jsonl/.ndjson).")
+  p.add_argument("--lazy-files", action="store_true", default=None, help="Read --set-file/--add-file and $file/$files/$glob/$glob_one contents only when a template uses them.")
+
+  # Ahead-of-time compilation
+  p.add_argument("--compile-templates", metavar="TARGET", help="Compile every template under the search paths into TARGET (.zip or directory) and exit.")
+  p.add_argument("--check-templates", action="store_true", help="Compile every template under the search paths in parallel, report errors and exit.")
+  p.add_argument("--precompiled", metavar="PATH", help="Load templates compiled by --compile-templates from PATH before falling back to sources.")
 
   # Output / debug
   p.add_argument("--out", help="Write the rendered output to this file (otherwise print to stdout).")
+  p.add_argument("--save-context", metavar="PATH", help="Write the merged context and a manifest of its input files to a binary snapshot.")
+  p.add_argument("--load-context", metavar="PATH", help="Reuse the snapshot at PATH while its inputs and context flags are unchanged; otherwise rebuild and rewrite it.")
   p.add_argument("--print-context", action="store_true", help="Print the merged context (JSON) to stderr for debugging.")
+  p.add_argument("--stats", action="store_true", help="Print file-system cost counters (globs, directory scans, file cache hits) to stderr after the run.")
+  p.add_argument("--watch", action="store_true", help="Re-render whenever a template, include or input file changes (Ctrl-C to stop).")
+
+  # Batch rendering
+  p.add_argument("--batch", metavar="MANIFEST", help="Render every entry of a JSONL/YAML manifest in one run (see --help-extended).")
+  p.add_argument("--jobs", type=int, default=None,
+                 help="Worker processes for --batch/--matrix (1 = in-process, 0 = one per CPU).\nDefaults: 1 for --batch, one per CPU for --matrix.")
+  p.add_argument("--pipeline", metavar="FILE", help="Run a multi-phase pipeline definition (YAML/JSON); see --help-extended.")
+  p.add_argument("--force", action="store_true", help="With --pipeline: re-render every phase, ignoring the incremental state.")
+  p.add_argument("--matrix", action="append", default=[], help="KEY=v1,v2,... Render once per combination of all --matrix axes. Repeatable.")
+
+  # Render daemon
+  p.add_argument("--serve", metavar="SOCKET", help="Run a warm render server on this Unix socket (see --help-extended).")
+  p.add_argument("--connect", metavar="SOCKET", help="Send the remaining arguments to a --serve process and print its output.")
   return p
 
 
+def _strip_connect(argv: List[str]) -> List[str]:
+  """Drop '--connect SOCKET' / '--connect=SOCKET' so the server sees the plain argv."""
+  out: List[str] = []
+  skip = False
+  for a in argv:
+    if skip:
+      skip = False; continue
+    if a == "--connect":
+      skip = True; continue
+    if a.startswith("--connect="):
+      continue
+    out.append(a)
+  return out
+
+
 def _strip_index_prefix(s: str) -> str:
   """Strip a leading '<digits>=' prefix if present, even for strings like '0=KEY=PATH'."""
   if "=" not in s:
@@ -64,30 +142,42 @@ def _strip_index_prefix(s: str) -> str:
   return s
 
 
-def _apply_load(ctx: Dict[str, Any], patterns, *, optional: bool):
-  from .utils import deep_merge
+def _apply_load(ctx: Dict[str, Any], patterns, *, optional: bool, strategies=None):
+  from .merge import Merger
+  from .structload import load_structured_glob
+  merger = Merger(strategies)  # one for all documents: each is merged without copying the others
   for pat in patterns or []:
     if isinstance(pat, str):
       pat = _strip_index_prefix(pat)
     docs = load_structured_glob(pat, optional=optional)
     for d in docs:
       if isinstance(d, dict):
-        deep_merge(ctx, d)
+        merger.merge(ctx, d)
       else:
         die(f"--load expects mapping documents; got {type(d).__name__} in {pat}")
 
 
+def _load_into_value(pat: str, *, optional: bool) -> Any:
+  """Value bound by --load-into: a DocumentStream, the single document, a list of them, or None."""
+  from .structload import load_structured_glob, open_document_stream
+  stream = open_document_stream(pat, optional=optional)
+  if stream is not None:
+    return stream
+  docs = load_structured_glob(pat, optional=optional)
+  if not docs:
+    return None  # optional and missing -> skip
+  return docs[0] if len(docs) == 1 else docs
+
+
 def _apply_load_into(ctx: Dict[str, Any], pairs, *, optional: bool):
   from .context_ops import _set_nested
   for pair in pairs or []:
     # Dict-style entries coming directly from YAML (e.g. {"DATA": "./file.json"})
     if isinstance(pair, dict):
       for key, pat in pair.items():
-        docs = load_structured_glob(pat, optional=optional)
-        if not docs:
-          continue  # optional and missing -> skip
-        value = docs[0] if len(docs) == 1 else docs
-        _set_nested(ctx, key, value)
+        value = _load_into_value(pat, optional=optional)
+        if value is not None:
+          _set_nested(ctx, key, value)
       continue
 
     # String entries: support accidental index prefix AND KEY=PATH
@@ -96,25 +186,154 @@ def _apply_load_into(ctx: Dict[str, Any], pairs, *, optional: bool):
       if "=" in s:
         key, pat = s.split("=", 1)
         if key:
-          docs = load_structured_glob(pat, optional=optional)
-          if not docs:
-            continue  # optional and missing -> skip
-          value = docs[0] if len(docs) == 1 else docs
-          _set_nested(ctx, key, value)
+          value = _load_into_value(pat, optional=optional)
+          if value is not None:
+            _set_nested(ctx, key, value)
           continue
 
     die(f"--load-into expects KEY=PATH_OR_GLOB, got: {pair}")
 
 
-def main() -> None:
+def apply_context_ops(ctx: Dict[str, Any], ops, *, load_optional: bool = False,
+                      load_into_optional: bool = False) -> Dict[str, Any]:
+  """Apply the context-building flags held by `ops` (an argparse namespace or
+  anything with the same list attributes) to ctx, in CLI order."""
+  # 1) structured config
+  _apply_load(ctx, ops.load, optional=load_optional, strategies=getattr(ops, "merge_strategy", None))
+  _apply_load_into(ctx, ops.load_into, optional=load_into_optional)
+  # 2) scalars/files/json, then 3) zsh-friendly array ops: compiled into one
+  #    program over a trie of their key paths (see context_ops.KeyProgram)
+  return compile_ops(ops).run(ctx)
+
+
+def build_context(args) -> Dict[str, Any]:
+  # Determine optionality:
+  # If args.load/args.load_into came from config (not CLI), merge_config_into_args
+  # will have set these flags to True. Otherwise they default to False.
+  load_optional = getattr(args, "_load_optional", False)
+  load_into_optional = getattr(args, "_load_into_optional", False)
+  def build() -> Dict[str, Any]:
+    return apply_context_ops({}, args, load_optional=load_optional, load_into_optional=load_into_optional)
+  save_path, load_path = getattr(args, "save_context", None), getattr(args, "load_context", None)
+  if not (save_path or load_path):
+    return build()
+  from .snapshot import snapshot_context
+  return snapshot_context(args, build, load_path=load_path, save_path=save_path)
+
+
+@contextlib.contextmanager
+def scoped_environ() -> Iterator[None]:
+  """Undo the os.environ changes made inside the block.
+
+  Run settings (--lazy-files, --io-workers, parser backends, cache flags...)
+  travel to lower modules and worker processes through the environment;
+  scoping them keeps one in-process main() call (tests, --serve requests)
+  from leaking its flags into the next.
+  """
+  saved = dict(os.environ)
+  try:
+    yield
+  finally:
+    for key in [k for k in os.environ if k not in saved]:
+      del os.environ[key]
+    for key, value in saved.items():
+      if os.environ.get(key) != value:
+        os.environ[key] = value
+
+
+def export_run_settings(args) -> None:
+  """Export the run settings of args (flags, or config merged into them) to os.environ.
+
+  Like the cache settings, these travel through the environment to worker
+  processes; call it inside scoped_environ(). Attributes args lacks count as
+  unset, so a Renderer session's namespace works too.
+  """
+  from .parsers import select_backends
+  select_backends(getattr(args, "json_backend", None), getattr(args, "yaml_backend", None))
+  for attr, env in (("io_workers", "CODEX_IO_WORKERS"), ("parse_processes", "CODEX_PARSE_PROCESSES"),
+                    ("list_index_limit", "CODEX_LIST_INDEX_LIMIT"), ("dense_list_gap", "CODEX_DENSE_LIST_GAP")):
+    value = getattr(args, attr, None)
+    if value is not None:
+      os.environ[env] = str(value)
+  for attr, env in (("lazy_files", "CODEX_LAZY_FILES"), ("stream_loads", "CODEX_STREAM_LOADS")):
+    if getattr(args, attr, None):
+      os.environ[env] = "1"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+  import sys
+  if argv is None:
+    argv = sys.argv[1:]
   p = build_argparser()
-  args = p.parse_args()
+  args = p.parse_args(argv)
+  with scoped_environ():
+    _main(p, args, argv)
+
 
-  print(EXTENDED_HELP)
-  print(args)
+def _main(p: argparse.ArgumentParser, args: argparse.Namespace, argv: List[str]) -> None:
+  import sys
+  if args.connect:
+    from .server import run_client
+    raise SystemExit(run_client(args.connect, _strip_connect(argv)))
+
+  if args.serve:
+    from .server import serve
+    serve(args.serve); return
 
   if args.help_extended:
-    print(EXTENDED_HELP.strip()); return
+    print(extended_help().strip()); return
+
+  # Cache settings travel through the environment so worker processes see them too.
+  if args.cache_dir:
+    os.environ["CODEX_CACHE_DIR"] = str(Path(args.cache_dir).resolve())
+  if args.no_template_cache:
+    os.environ["CODEX_TEMPLATE_CACHE"] = "0"
+  if args.no_doc_cache:
+    os.environ["CODEX_DOC_CACHE"] = "0"
+  if args.precompiled:
+    os.environ["CODEX_PRECOMPILED"] = str(Path(args.precompiled).resolve())
+  if args.clear_template_cache:
+    from .template_env import clear_bytecode_cache
+    n = clear_bytecode_cache()
+    sys.stderr.write(f"cleared template cache ({n} files)\n")
+    if not args.template_name and not (args.batch or args.pipeline):
+      return
+
+  if args.compile_templates or args.check_templates:
+    # Search paths may come from config/CODEX_TPL_PATH, so merge those first.
+    cfg_path = find_config_path(args.config)
+    if cfg_path:
+      merge_config_into_args(args, load_config(cfg_path), base_dir=cfg_path.parent)
+    from .precompile import run_compile
+    run_compile(args); return
+
+  if not args.template_name and not (args.batch or args.pipeline):
+    p.error("the following arguments are required: --template-name")
+
+  if args.watch:
+    import argparse as _argparse
+    from .structload import enable_document_cache
+    from .template_env import enable_environment_cache
+    from .watch import watch
+    # Unchanged inputs keep their parsed documents and compiled templates.
+    enable_document_cache()
+    enable_environment_cache()
+    watch(lambda: run(_argparse.Namespace(**vars(args)))); return
+
+  run(args)
+
+
+def run(args) -> None:
+  """Everything after argument parsing: config, context, render, output.
+
+  Settings it exports to the environment are undone when it returns.
+  """
+  with scoped_environ():
+    _run(args)
+
+
+def _run(args) -> None:
+  import sys
 
   # Load config file (if any), then merge defaults into args
   cfg_path = find_config_path(args.config)
@@ -122,39 +341,53 @@ def main() -> None:
     cfg = load_config(cfg_path)
     merge_config_into_args(args, cfg, base_dir=cfg_path.parent)
 
-  # Determine optionality:
-  # If args.load/args.load_into came from config (not CLI), merge_config_into_args
-  # will have set these flags to True. Otherwise they default to False.
-  load_optional = getattr(args, "_load_optional", False)
-  load_into_optional = getattr(args, "_load_into_optional", False)
+  # Directory listings are shared by every glob of this run (see tree_index).
+  from .file_cache import file_cache
+  from .tree_index import reset_tree_index
+  from .structload import reset_load_memo
+  export_run_settings(args)
+  index = reset_tree_index(args.exclude, ignore_files=bool(args.respect_ignore) and not args.no_ignore,
+                           exclude_base=getattr(args, "_exclude_base", None))
+  reset_load_memo()
+  file_cache().reset_counters()
+  try:
+    _dispatch(args)
+  finally:
+    if getattr(args, "stats", False):
+      sys.stderr.write(index.report() + "\n" + file_cache().report() + "\n")
+
+def _dispatch(args) -> None:
+  import sys
+
+  if args.batch:
+    from .batch import run_batch
+    run_batch(args); return
+
+  if args.pipeline:
+    from .pipeline import run_pipeline
+    run_pipeline(args); return
+
+  if args.matrix:
+    from .matrix import run_matrix
+    run_matrix(args); return
 
   # Build context
-  ctx: Dict[str, Any] = {}
-  # 1) structured config
-  _apply_load(ctx, args.load, optional=load_optional)
-  _apply_load_into(ctx, args.load_into, optional=load_into_optional)
-  # 2) scalars/files/json
-  apply_set_pairs(ctx, args.set)
-  apply_set_file(ctx, args.set_file)
-  apply_set_json(ctx, args.set_json)
-  apply_set_json_file(ctx, args.set_json_file)
-  # 3) zsh-friendly array ops
-  apply_add(ctx, args.add)
-  apply_add_file(ctx, args.add_file)
-  apply_set_index(ctx, args.set_index)
-  apply_set_file_index(ctx, args.set_file_index)
+  ctx = build_context(args)
 
   if args.print_context:
-    import sys
-    sys.stderr.write(json.dumps(ctx, indent=2, ensure_ascii=False) + "\n")
+    from .lazy_values import context_json
+    sys.stderr.write(context_json(ctx) + "\n")
 
   tpl_path = Path(args.template_name)
   if not tpl_path.exists():
     die(f"Template not found: {tpl_path}")
 
-  rendered = render_template(tpl_path, ctx, args.template_search)
+  # Stream the render so peak memory does not grow with the output size.
+  from .template_env import stream_template, write_chunks, write_rendered
+  chunks = stream_template(tpl_path, ctx, args.template_search)
 
   if args.out:
-    Path(args.out).write_text(rendered, encoding="utf-8")
+    write_rendered(chunks, Path(args.out))
   else:
-    print(rendered, end="")
+    write_chunks(chunks, sys.stdout)
+    sys.stdout.flush()
@@ -102,6 +102,7 @@ def merge_config_into_args(args_ns, cfg: Dict[str, Any], base_dir: Path) -> None
     ("add_file", "add_file"),
     ("set_index", "set_index"),
     ("set_file_index", "set_file_index"),
+    ("exclude", "exclude"),
   ]:
     if key in cfg and getattr(args_ns, dest, None) == []:
       val = cfg[key]
@@ -134,6 +135,8 @@ def merge_config_into_args(args_ns, cfg: Dict[str, Any], base_dir: Path) -> None
           setattr(args_ns, dest, _rewrite_pairs_rhs(list(val)))
         else:
           setattr(args_ns, dest, list(val))
+        if dest == "exclude":
+          setattr(args_ns, "_exclude_base", str(base_dir.resolve()))  # patterns are relative to the config file
       elif isinstance(val, dict) and dest == "load_into":
         pairs = []
         for k, v in val.items():
@@ -154,6 +157,43 @@ def merge_config_into_args(args_ns, cfg: Dict[str, Any], base_dir: Path) -> None
           setattr(args_ns, dest, _rewrite_pairs_rhs([val] if isinstance(val, str) else list(val)))
         else:
           setattr(args_ns, dest, [val])
+        if dest == "exclude":
+          setattr(args_ns, "_exclude_base", str(base_dir.resolve()))
+
+  # Matrix axes: mapping KEY -> [values] or list of "KEY=v1,v2" strings
+  if "matrix" in cfg and getattr(args_ns, "matrix", None) == []:
+    val = cfg["matrix"]
+    setattr(args_ns, "matrix", list(val) if isinstance(val, list) else [val])
+
+  # Per-path --load merge strategies: mapping PATH -> STRATEGY or list of "PATH=STRATEGY"
+  if "merge_strategy" in cfg and getattr(args_ns, "merge_strategy", None) == []:
+    val = cfg["merge_strategy"]
+    if isinstance(val, dict):
+      setattr(args_ns, "merge_strategy", [f"{k}={v}" for k, v in val.items()])
+    else:
+      setattr(args_ns, "merge_strategy", list(val) if isinstance(val, list) else [val])
+
+  # Parser backends (see parsers.py)
+  for key in ("json_backend", "yaml_backend"):
+    if key in cfg and getattr(args_ns, key, None) is None:
+      setattr(args_ns, key, str(cfg[key]))
+
+  # Read/parse concurrency for multi-file loads; list index policy (see sparse_list.py)
+  for key in ("io_workers", "parse_processes", "list_index_limit", "dense_list_gap"):
+    if key in cfg and getattr(args_ns, key, None) is None:
+      try:
+        setattr(args_ns, key, int(cfg[key]))
+      except (TypeError, ValueError):
+        die(f"Config '{key}' must be an integer, got: {cfg[key]!r}")
+
+  # Read file-backed values on first use (see lazy_values.py / structload.DocumentStream)
+  for key in ("lazy_files", "stream_loads"):
+    if key in cfg and getattr(args_ns, key, None) is None:
+      setattr(args_ns, key, bool(cfg[key]))
+
+  # Prune .gitignore/.codexignore matches from globs (see tree_index.py)
+  if "respect_ignore" in cfg and getattr(args_ns, "respect_ignore", None) is None:
+    setattr(args_ns, "respect_ignore", bool(cfg["respect_ignore"]))
 
   # Optional default output path
   if "out" in cfg and getattr(args_ns, "out", None) in (None, ""):
@@ -1,14 +1,18 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .layered import LayeredDict, is_mapping, list_for_write
+from .sparse_list import SparseList, dense_list_gap, is_list, list_index_limit, set_index
 from .utils import (
   die, maybe_file_value, load_pattern_contents,
   _ARRAY_KEY_RE, _COLON_INDEX_RE
 )
 
+# ctx and every mapping below it may be a dict or a LayeredDict (see layered.py).
+
 def _ensure_path_dict(ctx: Dict[str, Any], parts: List[str]) -> Dict[str, Any]:
   cur: Dict[str, Any] = ctx
   for p in parts:
-    if p not in cur or not isinstance(cur[p], dict):
+    if p not in cur or not is_mapping(cur[p]):
       cur[p] = {}
     cur = cur[p]  # type: ignore[assignment]
   return cur
@@ -21,125 +25,373 @@ def _set_nested(ctx: Dict[str, Any], dotted_key: str, value: Any) -> None:
 def _ensure_list_at(ctx: Dict[str, Any], dotted: str) -> List[Any]:
   parts = dotted.split(".")
   parent = _ensure_path_dict(ctx, parts[:-1])
-  key = parts[-1]
-  if key not in parent:
-    parent[key] = []
-  if not isinstance(parent[key], list):
+  value = list_for_write(parent, parts[-1])
+  if not is_list(value):
     die(f"Cannot assign list semantics to non-list key '{dotted}'")
-  return parent[key]  # type: ignore[return-value]
+  return value
 
-def apply_set_pairs(ctx: Dict[str, Any], pairs: List[str]) -> None:
-  for pair in pairs or []:
-    if "=" not in pair:
-      die(f"--set expects KEY=VALUE, got: {pair}")
-    key, raw_value = pair.split("=", 1)
-    value = maybe_file_value(raw_value)
-    parts, last = key.split("."), key.split(".")[-1]
-    m = _ARRAY_KEY_RE.match(last)
-    if not m:
-      _set_nested(ctx, key, value); continue
-    arr_name, idx = m.group("name"), m.group("index")
-    if idx is None:
-      _set_nested(ctx, key, value); continue
-    arr_path = ".".join(parts[:-1] + [arr_name])
-    lst = _ensure_list_at(ctx, arr_path)
-    if idx == "":
-      lst.append(value)
+
+# ---------------------------------------------------------------------------
+# Compiled key operations
+#
+# The --set/--add/... flags are compiled once into a list of operations whose
+# targets are nodes of a trie of dotted key paths. Running the program applies
+# them in flag order (the order apply_context_ops() has always used) with the
+# same semantics as the per-pair helpers above, but each trie node caches the
+# dict or list currently at its path, so a context with thousands of entries
+# under common prefixes is walked once rather than once per pair.
+
+# Operation kinds: what is done with the value at the target node.
+SET, APPEND, EXTEND, SET_INDEX, FAIL = range(5)
+
+_MAPPING_TYPES = frozenset((dict, LayeredDict))
+_LIST_TYPES = frozenset((list, SparseList))
+
+
+class _Node:
+  __slots__ = ("key", "parent", "children", "value")
+
+  def __init__(self, key: Optional[str], parent: Optional["_Node"]) -> None:
+    self.key, self.parent = key, parent
+    self.children: Dict[str, _Node] = {}
+    self.value: Any = None  # cached container at this path while it is known to be current
+
+  def dotted(self) -> str:
+    parts, node = [], self
+    while node.parent is not None:
+      parts.append(node.key); node = node.parent
+    return ".".join(reversed(parts))  # type: ignore[arg-type]
+
+
+# (kind, node, key, list index, value, producer). SET writes node's dict at
+# key; the list kinds work on the list at node (key unused). producer() gives
+# the value when it has to be read or parsed at run time, in operation order.
+_Op = Tuple[int, Optional[_Node], Optional[str], int, Any, Optional[Callable[[], Any]]]
+
+
+class KeyProgram:
+  """Context operations compiled against a trie of their key paths; see run()."""
+
+  def __init__(self) -> None:
+    self.root = _Node(None, None)
+    self.ops: List[_Op] = []
+    self._nodes: Dict[str, _Node] = {}  # dotted path -> node
+
+  def node(self, dotted: str) -> _Node:
+    node = self._nodes.get(dotted)
+    if node is None:
+      head, dot, last = dotted.rpartition(".")
+      parent = self.node(head) if dot else self.root
+      node = self._nodes[dotted] = parent.children[last] = _Node(last, parent)
+    return node
+
+  def add(self, kind: int, dotted: str, value: Any = None, produce: Optional[Callable[[], Any]] = None,
+          index: int = 0) -> None:
+    if kind == SET:
+      # Leaves get no node of their own: only containers are cached.
+      head, dot, last = dotted.rpartition(".")
+      self.ops.append((SET, self.node(head) if dot else self.root, last, 0, value, produce))
     else:
-      i = int(idx)
-      if len(lst) <= i: lst.extend([None] * (i + 1 - len(lst)))
-      lst[i] = value
+      self.ops.append((kind, self.node(dotted), None, index, value, produce))
 
-def apply_set_json(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  def fail(self, message: str) -> None:
+    # Malformed pairs are reported when reached, after the operations before them ran.
+    self.ops.append((FAIL, None, None, 0, None, lambda: die(message)))
+
+  def run(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply every operation to ctx in order and return ctx."""
+    run = _Run(self.root, ctx)
+    try:
+      run.apply(self.ops)
+    finally:
+      run.release()
+    return ctx
+
+
+class _Run:
+  """One application of a KeyProgram.
+
+  Invariant: a node's cached value is the object at its path in ctx, and a
+  cached node's parent is cached too. Every slot written here drops the
+  cache below it. If one container turns up at two paths (YAML aliases),
+  writes through one path would not be seen through the other, so caching
+  stops and every lookup walks from the root, exactly like _ensure_path_dict.
+  """
+
+  def __init__(self, root: _Node, ctx: Dict[str, Any]) -> None:
+    self.root, self.ctx = root, ctx
+    self.cached: List[_Node] = []
+    self.owners: Dict[int, _Node] = {}
+    self.aliased = False
+    self.gap, self.limit = dense_list_gap(), list_index_limit()
+    self._cache(root, ctx)
+
+  def _cache(self, node: _Node, value: Any) -> None:
+    if self.aliased:
+      return
+    owner = self.owners.get(id(value))
+    if owner is not None and owner is not node:
+      self.aliased = True
+      self.release()
+      return
+    node.value = value
+    self.owners[id(value)] = node
+    self.cached.append(node)
+
+  def release(self) -> None:
+    for n in self.cached:
+      n.value = None
+    self.cached, self.owners = [], {}
+
+  def _forget(self, node: _Node) -> None:
+    # The slot at node was rewritten: nothing cached at or below it is current.
+    stack = [node]
+    while stack:
+      n = stack.pop()
+      if n.value is not None:
+        self.owners.pop(id(n.value), None)
+        n.value = None
+        stack.extend(n.children.values())
+
+  def dict_at(self, node: _Node) -> Dict[str, Any]:
+    if node.parent is None:
+      return self.ctx
+    value = node.value
+    if type(value) in _MAPPING_TYPES:
+      return value
+    parent = self.dict_at(node.parent)
+    value = parent.get(node.key)  # type: ignore[arg-type]
+    if not is_mapping(value):
+      self._forget(node)
+      value = parent[node.key] = {}  # type: ignore[index]
+    if node.value is not value:
+      self._cache(node, value)
+    return value
+
+  def list_at(self, node: _Node) -> List[Any]:
+    value = node.value
+    if type(value) in _LIST_TYPES:
+      return value
+    value = list_for_write(self.dict_at(node.parent), node.key)  # type: ignore[arg-type]
+    if not is_list(value):
+      die(f"Cannot assign list semantics to non-list key '{node.dotted()}'")
+    if node.value is not value:
+      self._forget(node)
+      self._cache(node, value)
+    return value
+
+  def apply(self, ops: List[_Op]) -> None:
+    dict_at, list_at = self.dict_at, self.list_at
+    for kind, node, key, index, value, produce in ops:
+      if produce is not None:
+        value = produce()
+      if kind == SET:
+        d = node.value  # type: ignore[union-attr]
+        if type(d) not in _MAPPING_TYPES:
+          d = dict_at(node)  # type: ignore[arg-type]
+        d[key] = value
+        child = node.children.get(key)  # type: ignore[union-attr,arg-type]
+        if child is not None and child.value is not None:
+          self._forget(child)
+        continue
+      lst = node.value  # type: ignore[union-attr]
+      if type(lst) not in _LIST_TYPES:
+        lst = list_at(node)  # type: ignore[arg-type]
+      if kind == APPEND:
+        lst.append(value)
+      elif kind == EXTEND:
+        lst.extend(value)
+      else:
+        self.set_index(node, lst, index, value)  # type: ignore[arg-type]
+
+  def set_index(self, node: _Node, lst: Any, index: int, value: Any) -> None:
+    if self.limit is not None and index > self.limit:
+      die(f"List index {index} for '{node.dotted()}' is above --list-index-limit {self.limit}")
+    out = set_index(lst, index, value, self.gap)
+    if out is not lst:
+      # Went sparse: the new list replaces the old one at node's path.
+      self.dict_at(node.parent)[node.key] = out  # type: ignore[arg-type,index]
+      self._forget(node)
+      self._cache(node, out)
+
+
+def _array_target(key: str) -> Tuple[str, Optional[str]]:
+  """(dotted path, index) for KEY, KEY[] ('') or KEY[n] ('n'); index None means a plain key."""
+  head, dot, last = key.rpartition(".")
+  m = _ARRAY_KEY_RE.match(last)
+  if not m or m.group("index") is None:
+    return key, None
+  return head + dot + m.group("name"), m.group("index")
+
+def _text_value(prog: KeyProgram, kind: int, dotted: str, raw: str, index: int = 0) -> None:
+  # Plain values are stored as-is; '@file' ones are read when the operation runs.
+  if raw[:1] == "@":
+    prog.add(kind, dotted, produce=lambda: maybe_file_value(raw), index=index)
+  else:
+    prog.add(kind, dotted, raw, index=index)
+
+def _one_or_many(contents: List[Any]) -> Any:
+  return contents[0] if len(contents) == 1 else contents
+
+def _exactly_one(contents: List[Any], message: str) -> Any:
+  if len(contents) != 1:
+    die(message)
+  return contents[0]
+
+def _file_values(pattern: str) -> List[Any]:
+  # Contents of every match, or unread references to them with --lazy-files.
+  from .lazy_values import lazy_files_enabled, lazy_pattern_contents
+  if lazy_files_enabled():
+    return lazy_pattern_contents(pattern)
+  return load_pattern_contents(pattern)
+
+def _json_value(raw: str, key: str) -> Any:
+  import json
+  try:
+    return json.loads(raw)
+  except Exception as e:
+    die(f"Invalid JSON for key '{key}': {e}")
+
+def _json_file_value(path_str: str, key: str) -> Any:
+  from .utils import read_text_file, expand_path
   import json
+  raw = read_text_file(expand_path(path_str))
+  try:
+    return json.loads(raw)
+  except Exception as e:
+    die(f"Invalid JSON in file for key '{key}': {e}")
+
+
+def _compile_set(prog: KeyProgram, pairs: List[str]) -> None:
+  # The bulk of generated configs: KeyProgram.add()/_text_value() inlined.
+  nodes, root, ops = prog._nodes, prog.root, prog.ops
   for pair in pairs or []:
-    if "=" not in pair:
-      die(f"--set-json expects KEY=<json>, got: {pair}")
-    key, raw = pair.split("=", 1)
-    try:
-      value = json.loads(raw)
-    except Exception as e:
-      die(f"Invalid JSON for key '{key}': {e}")
-    _set_nested(ctx, key, value)
+    key, eq, raw_value = pair.partition("=")
+    if not eq:
+      prog.fail(f"--set expects KEY=VALUE, got: {pair}"); continue
+    produce = (lambda raw=raw_value: maybe_file_value(raw)) if raw_value[:1] == "@" else None
+    if key[-1:] == "]":
+      path, idx = _array_target(key)
+      if idx is not None:
+        ops.append((APPEND if idx == "" else SET_INDEX, prog.node(path), None, int(idx or 0), raw_value, produce))
+        continue
+    head, dot, last = key.rpartition(".")
+    node = (nodes.get(head) or prog.node(head)) if dot else root
+    ops.append((SET, node, last, 0, raw_value, produce))
 
-def apply_set_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
+def _compile_set_file(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--set-file expects KEY=/path, got: {pair}")
+      prog.fail(f"--set-file expects KEY=/path, got: {pair}"); continue
     key, pattern = pair.split("=", 1)
-    contents = load_pattern_contents(pattern)
-    parts, last = key.split("."), key.split(".")[-1]
-    m = _ARRAY_KEY_RE.match(last)
-    if not m:
-      _set_nested(ctx, key, contents[0] if len(contents) == 1 else contents); continue
-    arr_name, idx = m.group("name"), m.group("index")
+    path, idx = _array_target(key)
     if idx is None:
-      _set_nested(ctx, key, contents[0] if len(contents) == 1 else contents); continue
-    arr_path = ".".join(parts[:-1] + [arr_name])
-    lst = _ensure_list_at(ctx, arr_path)
-    if idx == "":
-      lst.extend(contents)
+      prog.add(SET, key, produce=lambda pat=pattern: _one_or_many(_file_values(pat)))
+    elif idx == "":
+      prog.add(EXTEND, path, produce=lambda pat=pattern: _file_values(pat))
     else:
-      if len(contents) != 1:
-        die(f"--set-file {key}=<glob> matched {len(contents)} files; expected exactly 1.")
-      i = int(idx)
-      if len(lst) <= i: lst.extend([None] * (i + 1 - len(lst)))
-      lst[i] = contents[0]
+      def produce(pat: str = pattern, label: str = key) -> Any:
+        contents = _file_values(pat)
+        return _exactly_one(contents, f"--set-file {label}=<glob> matched {len(contents)} files; expected exactly 1.")
+      prog.add(SET_INDEX, path, produce=produce, index=int(idx))
 
-def apply_set_json_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
-  from .utils import read_text_file, expand_path
-  import json
+def _compile_set_json(prog: KeyProgram, pairs: List[str]) -> None:
+  for pair in pairs or []:
+    if "=" not in pair:
+      prog.fail(f"--set-json expects KEY=<json>, got: {pair}"); continue
+    key, raw = pair.split("=", 1)
+    prog.add(SET, key, produce=lambda raw=raw, key=key: _json_value(raw, key))
+
+def _compile_set_json_file(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--set-json-file expects KEY=/path/to/file.json, got: {pair}")
+      prog.fail(f"--set-json-file expects KEY=/path/to/file.json, got: {pair}"); continue
     key, path_str = pair.split("=", 1)
-    raw = read_text_file(expand_path(path_str))
-    try:
-      value = json.loads(raw)
-    except Exception as e:
-      die(f"Invalid JSON in file for key '{key}': {e}")
-    _set_nested(ctx, key, value)
+    prog.add(SET, key, produce=lambda p=path_str, key=key: _json_file_value(p, key))
 
-def apply_add(ctx: Dict[str, Any], pairs: List[str]) -> None:
+def _compile_add(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--add expects KEY=VALUE, got: {pair}")
+      prog.fail(f"--add expects KEY=VALUE, got: {pair}"); continue
     key, raw_value = pair.split("=", 1)
-    value = maybe_file_value(raw_value)
-    _ensure_list_at(ctx, key).append(value)
+    _text_value(prog, APPEND, key, raw_value)
 
-def apply_add_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
+def _compile_add_file(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--add-file expects KEY=/path, got: {pair}")
+      prog.fail(f"--add-file expects KEY=/path, got: {pair}"); continue
     key, pattern = pair.split("=", 1)
-    _ensure_list_at(ctx, key).extend(load_pattern_contents(pattern))
+    prog.add(EXTEND, key, produce=lambda pat=pattern: _file_values(pat))
 
-def apply_set_index(ctx: Dict[str, Any], pairs: List[str]) -> None:
+def _compile_set_index(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--set-index expects KEY:INDEX=VALUE, got: {pair}")
+      prog.fail(f"--set-index expects KEY:INDEX=VALUE, got: {pair}"); continue
     key_part, raw_value = pair.split("=", 1)
     m = _COLON_INDEX_RE.match(key_part)
-    if not m: die(f"--set-index requires KEY:INDEX form, got: {key_part}")
-    base_key, index = m.group("name"), int(m.group("index"))
-    value = maybe_file_value(raw_value)
-    lst = _ensure_list_at(ctx, base_key)
-    if len(lst) <= index: lst.extend([None] * (index + 1 - len(lst)))
-    lst[index] = value
+    if not m:
+      prog.fail(f"--set-index requires KEY:INDEX form, got: {key_part}"); continue
+    _text_value(prog, SET_INDEX, m.group("name"), raw_value, int(m.group("index")))
 
-def apply_set_file_index(ctx: Dict[str, Any], pairs: List[str]) -> None:
+def _compile_set_file_index(prog: KeyProgram, pairs: List[str]) -> None:
   for pair in pairs or []:
     if "=" not in pair:
-      die(f"--set-file-index expects KEY:INDEX=/path, got: {pair}")
+      prog.fail(f"--set-file-index expects KEY:INDEX=/path, got: {pair}"); continue
     key_part, pattern = pair.split("=", 1)
     m = _COLON_INDEX_RE.match(key_part)
-    if not m: die(f"--set-file-index requires KEY:INDEX form, got: {key_part}")
-    base_key, index = m.group("name"), int(m.group("index"))
-    contents = load_pattern_contents(pattern)
-    if len(contents) != 1:
-      die(f"--set-file-index {key_part}=<glob> matched {len(contents)} files; expected exactly 1.")
-    lst = _ensure_list_at(ctx, base_key)
-    if len(lst) <= index: lst.extend([None] * (index + 1 - len(lst)))
-    lst[index] = contents[0]
+    if not m:
+      prog.fail(f"--set-file-index requires KEY:INDEX form, got: {key_part}"); continue
+    def produce(pat: str = pattern, label: str = key_part) -> Any:
+      contents = _file_values(pat)
+      return _exactly_one(contents, f"--set-file-index {label}=<glob> matched {len(contents)} files; expected exactly 1.")
+    prog.add(SET_INDEX, m.group("name"), produce=produce, index=int(m.group("index")))
+
+
+# Flag attribute -> compiler, in the order apply_context_ops() applies them.
+COMPILERS: List[Tuple[str, Callable[[KeyProgram, List[str]], None]]] = [
+  ("set", _compile_set),
+  ("set_file", _compile_set_file),
+  ("set_json", _compile_set_json),
+  ("set_json_file", _compile_set_json_file),
+  ("add", _compile_add),
+  ("add_file", _compile_add_file),
+  ("set_index", _compile_set_index),
+  ("set_file_index", _compile_set_file_index),
+]
+
+def compile_ops(ops: Any) -> KeyProgram:
+  """Compile the key flags held by `ops` (an argparse namespace or similar) into one KeyProgram."""
+  prog = KeyProgram()
+  for attr, compile_pairs in COMPILERS:
+    compile_pairs(prog, getattr(ops, attr, None) or [])
+  return prog
+
+def _run_one(compile_pairs: Callable[[KeyProgram, List[str]], None], ctx: Dict[str, Any], pairs: List[str]) -> None:
+  prog = KeyProgram()
+  compile_pairs(prog, pairs)
+  prog.run(ctx)
+
 
+def apply_set_pairs(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set, ctx, pairs)
+
+def apply_set_json(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set_json, ctx, pairs)
+
+def apply_set_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set_file, ctx, pairs)
+
+def apply_set_json_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set_json_file, ctx, pairs)
+
+def apply_add(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_add, ctx, pairs)
+
+def apply_add_file(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_add_file, ctx, pairs)
+
+def apply_set_index(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set_index, ctx, pairs)
+
+def apply_set_file_index(ctx: Dict[str, Any], pairs: List[str]) -> None:
+  _run_one(_compile_set_file_index, ctx, pairs)
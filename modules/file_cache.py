@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Cached text is dropped oldest-first once the total exceeds this many characters.
+MAX_CACHED_CHARS = 256 * 1024 * 1024
+
+# Threads used by read_many() (--io-workers / CODEX_IO_WORKERS; 1 reads sequentially).
+DEFAULT_IO_WORKERS = 8
+
+
+class FileCache:
+  """Decoded UTF-8 text of files, keyed by resolved path and (st_mtime_ns, size).
+
+  Every text read in a render (@file values, --set-file/--add-file,
+  $file/$glob macros, structured loads, templates and the include helpers)
+  goes through read_text(), so a file read from several places is opened and
+  decoded once, and later reads return the very same str object while the
+  file's stamp is unchanged. The cache lives for the process, so --watch and
+  --serve reuse unchanged files across renders. It is safe to use from
+  several threads (see read_many()).
+  """
+
+  def __init__(self, max_chars: int = MAX_CACHED_CHARS) -> None:
+    self._entries: Dict[str, Tuple[int, int, str]] = {}
+    self._chars = 0
+    self.max_chars = max_chars
+    self.hits = 0
+    self.misses = 0
+    self.bytes_read = 0
+    self._lock = threading.Lock()
+
+  def reset_counters(self) -> None:
+    self.hits = self.misses = self.bytes_read = 0
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+      self._chars = 0
+
+  def read_text(self, path: Any) -> str:
+    """Text of path, decoded as UTF-8 with universal newlines (like Path.read_text).
+
+    Raises OSError / UnicodeDecodeError like a plain read would.
+    """
+    key = os.path.realpath(os.fspath(path))
+    st = os.stat(key)
+    entry = self._entries.get(key)
+    if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+      with self._lock:
+        self.hits += 1
+      return entry[2]
+    with open(key, "rb") as f:
+      data = f.read()
+      st = os.fstat(f.fileno())  # stamp of what was actually read
+    text = data.decode("utf-8")
+    if "\r" in text:
+      text = text.replace("\r\n", "\n").replace("\r", "\n")
+    with self._lock:
+      self.misses += 1
+      self.bytes_read += len(data)
+      old = self._entries.pop(key, None)
+      if old is not None:
+        self._chars -= len(old[2])
+      self._entries[key] = (st.st_mtime_ns, st.st_size, text)
+      self._chars += len(text)
+      while self._chars > self.max_chars and len(self._entries) > 1:
+        oldest = next(iter(self._entries))
+        self._chars -= len(self._entries.pop(oldest)[2])
+    return text
+
+  def read_many(self, paths: Iterable[Any], workers: Optional[int] = None) -> List[Any]:
+    """read_text() of every path, fetched concurrently, in the order given.
+
+    Each result is the text, or the exception reading that path raised, so
+    callers can report errors exactly as a sequential loop would. Up to
+    `workers` reads (default: io_workers()) are in flight at once, which
+    hides per-file latency on network filesystems.
+    """
+    paths = list(paths)
+    def one(path: Any) -> Any:
+      try:
+        return self.read_text(path)
+      except Exception as e:
+        return e
+    workers = io_workers() if workers is None else workers
+    if workers <= 1 or len(paths) <= 1:
+      return [one(p) for p in paths]
+    return list(_executor(workers).map(one, paths))
+
+  def report(self) -> str:
+    return f"files: {self.hits} hits, {self.misses} misses, {self.bytes_read} bytes read"
+
+
+_CACHE = FileCache()
+_EXECUTOR: Optional[Tuple[int, Any]] = None
+
+
+def io_workers() -> int:
+  try:
+    return max(1, int(os.getenv("CODEX_IO_WORKERS") or DEFAULT_IO_WORKERS))
+  except ValueError:
+    return DEFAULT_IO_WORKERS
+
+
+def _executor(workers: int):
+  """Shared reader thread pool, rebuilt when the worker count changes."""
+  global _EXECUTOR
+  if _EXECUTOR is None or _EXECUTOR[0] != workers:
+    from concurrent.futures import ThreadPoolExecutor
+    if _EXECUTOR is not None:
+      _EXECUTOR[1].shutdown(wait=False)
+    _EXECUTOR = (workers, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codex-read"))
+  return _EXECUTOR[1]
+
+
+def _after_fork_in_child() -> None:
+  # Worker processes (--jobs) start without the parent's reader threads, and a
+  # lock held by one of them at fork time would never be released.
+  global _EXECUTOR
+  _EXECUTOR = None
+  _CACHE._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+  os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def file_cache() -> FileCache:
+  return _CACHE
+
+
+def read_text(path: Any) -> str:
+  """Read path through the process-wide FileCache."""
+  return _CACHE.read_text(path)
+
+
+def read_many(paths: Iterable[Any]) -> List[Any]:
+  """FileCache.read_many() on the process-wide cache."""
+  return _CACHE.read_many(paths)
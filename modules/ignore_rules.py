@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import List, NamedTuple, Optional, Sequence
+
+# Ignore files read in every walked directory (and its ancestors up to the repo root).
+IGNORE_FILES = (".gitignore", ".codexignore")
+
+
+class Rule(NamedTuple):
+  regex: "re.Pattern[str]"   # matched against the '/'-separated path relative to base
+  negate: bool               # '!pattern' re-includes
+  dir_only: bool             # 'pattern/' matches directories only
+  base: str                  # absolute directory the pattern is relative to
+
+
+def _translate_component(part: str) -> str:
+  out, i, n = [], 0, len(part)
+  while i < n:
+    c = part[i]; i += 1
+    if c == "*":
+      out.append("[^/]*")
+    elif c == "?":
+      out.append("[^/]")
+    elif c == "\\" and i < n:
+      out.append(re.escape(part[i])); i += 1
+    elif c == "[":
+      j = part.find("]", i + 1 if i < n and part[i] in "!^" else i)
+      if j < 0:
+        out.append(r"\[")
+      else:
+        body = part[i:j].replace("\\", "\\\\")
+        if body[:1] in ("!", "^"):
+          body = "^" + body[1:]
+        out.append(f"[{body}]"); i = j + 1
+    else:
+      out.append(re.escape(c))
+  return "".join(out)
+
+
+def compile_rule(line: str, base: str) -> Optional[Rule]:
+  """Compile one gitignore-syntax line; None for blanks and comments.
+
+  Supported: '#' comments, '!' negation, trailing '/' (directories only),
+  leading or inner '/' (anchored to base, otherwise the name matches at any
+  depth), '*', '?', '[...]', and '**' as a whole path component.
+  """
+  line = line.rstrip("\n").rstrip("\r")
+  if not line.endswith("\\ "):
+    line = line.rstrip(" ")
+  if not line or line.startswith("#"):
+    return None
+  negate = line.startswith("!")
+  if negate:
+    line = line[1:]
+  elif line.startswith("\\"):
+    line = line[1:]
+  dir_only = line.endswith("/")
+  line = line.rstrip("/")
+  if not line:
+    return None
+  anchored = "/" in line
+  parts = line.lstrip("/").split("/")
+  regex = ""
+  for i, part in enumerate(parts):
+    last = i == len(parts) - 1
+    if part == "**":
+      regex += ".*" if last else "(?:.*/)?"
+    else:
+      regex += _translate_component(part) + ("" if last else "/")
+  if not anchored:
+    regex = "(?:.*/)?" + regex
+  return Rule(re.compile(regex + r"\Z"), negate, dir_only, base)
+
+
+def parse_rules(lines: Sequence[str], base: str) -> List[Rule]:
+  return [r for r in (compile_rule(line, base) for line in lines) if r is not None]
+
+
+def read_ignore_file(path: str, base: str) -> List[Rule]:
+  try:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+      return parse_rules(f.read().splitlines(), base)
+  except OSError:
+    return []
+
+
+def is_ignored(rules: Sequence[Rule], path: str, is_dir: bool) -> bool:
+  """Whether absolute path is excluded by rules (the last matching rule wins)."""
+  ignored = False
+  rel_cache = {}
+  for rule in rules:
+    if rule.dir_only and not is_dir:
+      continue
+    rel = rel_cache.get(rule.base)
+    if rel is None:
+      rel = rel_cache[rule.base] = os.path.relpath(path, rule.base).replace(os.sep, "/")
+    if rule.regex.match(rel):
+      ignored = not rule.negate
+  return ignored
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, Set
+
+from .sparse_list import SparseList
+
+
+class LayeredDict(MutableMapping):
+  """A mapping layered over a base mapping that it never modifies.
+
+  Reads fall through to the base; writes, deletions and in-place changes stay
+  in the layer. Nested mappings read from the base come back as child layers
+  (kept in this layer, so writing into them is copy-on-write too), and
+  list_for_write() copies a base list before it is appended to. Creating a
+  layer is O(1) and it grows only with what is written or walked through,
+  which makes it the cheap way to render many variants off one large context:
+
+      ctx = LayeredDict(base_ctx)
+      apply_context_ops(ctx, variant_ops)   # base_ctx is left untouched
+
+  The context_ops helpers, KeyProgram and utils.deep_merge accept layers
+  wherever they accept dicts. Templates see an ordinary mapping; tojson,
+  to_nice_yaml and --print-context write it out like a dict (to_dict()).
+  """
+
+  __slots__ = ("_base", "_own", "_deleted")
+
+  def __init__(self, base: Mapping) -> None:
+    self._base = base
+    self._own: Dict[Any, Any] = {}
+    self._deleted: Set[Any] = set()
+
+  @property
+  def base(self) -> Mapping:
+    return self._base
+
+  def __getitem__(self, key: Any) -> Any:
+    own = self._own
+    if key in own:
+      return own[key]
+    if key in self._deleted:
+      raise KeyError(key)
+    value = self._base[key]
+    if is_mapping(value):
+      value = own[key] = LayeredDict(value)
+    return value
+
+  def __setitem__(self, key: Any, value: Any) -> None:
+    self._own[key] = value
+    self._deleted.discard(key)
+
+  def __delitem__(self, key: Any) -> None:
+    if key not in self:
+      raise KeyError(key)
+    self._own.pop(key, None)
+    if key in self._base:
+      self._deleted.add(key)
+
+  def __contains__(self, key: Any) -> bool:
+    return key in self._own or (key not in self._deleted and key in self._base)
+
+  def __iter__(self) -> Iterator[Any]:
+    # dict order: base keys where they are (overridden or not), then keys new in this layer.
+    own, deleted, base = self._own, self._deleted, self._base
+    for key in base:
+      if key not in deleted:
+        yield key
+    for key in own:
+      if key not in base:
+        yield key
+
+  def __len__(self) -> int:
+    base = self._base
+    return sum(1 for key in base if key not in self._deleted) + sum(1 for key in self._own if key not in base)
+
+  def __repr__(self) -> str:
+    # Printed like the dict it stands for, so `{{ mapping }}` renders the same with or without a layer.
+    return repr(self.to_dict())
+
+  __str__ = __repr__
+
+  def list_for_write(self, key: Any) -> Any:
+    """The value at key for in-place list changes; see list_for_write()."""
+    own = self._own
+    if key in own:
+      return own[key]
+    if key in self._deleted or key not in self._base:
+      self[key] = []
+      return own[key]
+    value = self._base[key]
+    if isinstance(value, (list, SparseList)):
+      value = own[key] = value.copy()
+      return value
+    return self[key]
+
+  def to_dict(self) -> Dict[Any, Any]:
+    """A plain dict of the merged view; subtrees this layer never touched are shared with the base."""
+    out: Dict[Any, Any] = {}
+    own = self._own
+    for key in self:
+      value = own[key] if key in own else self._base[key]
+      out[key] = value.to_dict() if isinstance(value, LayeredDict) else value
+    return out
+
+
+def is_mapping(value: Any) -> bool:
+  """Whether value is a context mapping (a dict, or a LayeredDict over one)."""
+  return isinstance(value, (dict, LayeredDict))
+
+
+def list_for_write(container: Any, key: Any) -> Any:
+  """container[key] for in-place list changes, created as [] when missing.
+
+  A list a LayeredDict would otherwise share with its base is copied into the
+  layer first. Non-list values are returned as they are (callers report them).
+  """
+  if isinstance(container, LayeredDict):
+    return container.list_for_write(key)
+  if key not in container:
+    container[key] = []
+  return container[key]
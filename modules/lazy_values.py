@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from .tree_index import glob_sorted
+from .utils import die, env_flag, expand_path, record_file, record_glob
+
+
+def lazy_files_enabled() -> bool:
+  """--lazy-files (or CODEX_LAZY_FILES=1): file-backed context values are read on first use."""
+  return env_flag("CODEX_LAZY_FILES", default=False)
+
+
+class LazyText(ABC):
+  """A str-like context value whose text is read on first use.
+
+  Templates can print, compare, concatenate, slice, measure and call str
+  methods on it (those return plain str); the text is read through the file
+  cache the first time any of that happens, so values a template never
+  touches cost no I/O. Two differences from a real str remain: Jinja's
+  `is string` test is false, and json/YAML output needs the hooks in
+  context_json() / the template environment (which are installed).
+  """
+
+  __slots__ = ("_text",)
+
+  def __init__(self) -> None:
+    self._text: Optional[str] = None
+
+  @abstractmethod
+  def _load(self) -> str:
+    """Read the text (called once, on first use)."""
+
+  @abstractmethod
+  def describe(self) -> str:
+    """What --print-context shows instead of the contents."""
+
+  @property
+  def loaded(self) -> bool:
+    return self._text is not None
+
+  @property
+  def data(self) -> str:
+    if self._text is None:
+      self._text = self._load()
+    return self._text
+
+  def __getattr__(self, name: str) -> Any:
+    if name.startswith("__"):  # keep copy/pickle protocol probes from loading the file
+      raise AttributeError(name)
+    return getattr(self.data, name)
+
+  def __str__(self) -> str: return self.data
+  def __repr__(self) -> str: return f"<{self.describe()}>"
+  def __format__(self, spec: str) -> str: return format(self.data, spec)
+  def __len__(self) -> int: return len(self.data)
+  def __bool__(self) -> bool: return bool(self.data)
+  def __iter__(self): return iter(self.data)
+  def __contains__(self, item: Any) -> bool: return str(item) in self.data
+  def __getitem__(self, key: Any) -> str: return self.data[key]
+  def __hash__(self) -> int: return hash(self.data)
+  def __eq__(self, other: Any) -> bool: return self.data == _plain(other)
+  def __ne__(self, other: Any) -> bool: return self.data != _plain(other)
+  def __lt__(self, other: Any) -> bool: return self.data < _plain(other)
+  def __le__(self, other: Any) -> bool: return self.data <= _plain(other)
+  def __gt__(self, other: Any) -> bool: return self.data > _plain(other)
+  def __ge__(self, other: Any) -> bool: return self.data >= _plain(other)
+  def __add__(self, other: Any) -> str: return self.data + _plain(other)
+  def __radd__(self, other: Any) -> str: return _plain(other) + self.data
+  def __mul__(self, n: int) -> str: return self.data * n
+  __rmul__ = __mul__
+  def __mod__(self, args: Any) -> str: return self.data % args
+
+
+def _plain(value: Any) -> Any:
+  return value.data if isinstance(value, LazyText) else value
+
+
+class LazyFile(LazyText):
+  """Contents of one file (what read_text_file() would return)."""
+
+  __slots__ = ("path",)
+
+  def __init__(self, path: str) -> None:
+    super().__init__()
+    self.path = path
+
+  def _load(self) -> str:
+    from .utils import read_text_file
+    return read_text_file(self.path)
+
+  def describe(self) -> str:
+    return f"file {self.path}"
+
+  def __reduce__(self):
+    return (LazyFile, (self.path,))
+
+
+class LazyJoin(LazyText):
+  """Contents of several files joined with a separator ($glob + $join)."""
+
+  __slots__ = ("paths", "sep")
+
+  def __init__(self, paths: Sequence[str], sep: str) -> None:
+    super().__init__()
+    self.paths, self.sep = list(paths), sep
+
+  def _load(self) -> str:
+    from .utils import read_text_files
+    return self.sep.join(read_text_files(self.paths))
+
+  def describe(self) -> str:
+    return f"files {', '.join(self.paths)} joined by {self.sep!r}"
+
+  def __reduce__(self):
+    return (LazyJoin, (self.paths, self.sep))
+
+
+def lazy_file(path: Any) -> LazyFile:
+  """A LazyFile for path, failing now (like read_text_file) if it does not exist."""
+  p = Path(path)
+  record_file(p)
+  if not p.exists():
+    die(f"File not found: {p}")
+  return LazyFile(str(p))
+
+
+def lazy_files(paths: Sequence[Any]) -> List[LazyText]:
+  return [lazy_file(p) for p in paths]
+
+
+def lazy_pattern_contents(pattern: str) -> List[LazyText]:
+  """load_pattern_contents() with every match left unread."""
+  import glob
+  pat = expand_path(pattern)
+  if glob.has_magic(pat):
+    record_glob(pat)
+  matches = glob_sorted(pat)
+  return lazy_files(matches or [pat])
+
+
+def json_default(value: Any) -> Any:
+  """json.dumps default= hook for rendering (tojson): lazy values become their text, streams lists."""
+  from .layered import LayeredDict
+  from .sparse_list import SparseList
+  from .structload import DocumentStream
+  if isinstance(value, LazyText):
+    return value.data
+  if isinstance(value, (DocumentStream, SparseList)):
+    return list(value)
+  if isinstance(value, LayeredDict):
+    return value.to_dict()
+  raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def context_json(ctx: Any) -> str:
+  """--print-context output: lazy values are shown as '<file PATH>' and not read.
+
+  Sparse lists are shown by their assigned slots rather than padded out.
+  """
+  import json
+  from .layered import LayeredDict
+  from .sparse_list import SparseList
+  from .structload import DocumentStream
+
+  def describe(value: Any) -> Any:
+    if isinstance(value, (LazyText, DocumentStream)):
+      return f"<{value.describe()}>"
+    if isinstance(value, LayeredDict):
+      return value.to_dict()
+    if isinstance(value, SparseList):
+      return {"<sparse list>": {"length": len(value), "items": {str(i): v for i, v in value.assigned().items()}}}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+  return json.dumps(ctx, indent=2, ensure_ascii=False, default=describe)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import itertools
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from .utils import die
+
+# {KEY} placeholders in an --out path template (KEY may be dotted, e.g. {meta.model}).
+_PLACEHOLDER_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_.]*)\}")
+
+Axis = Tuple[str, List[Any]]
+
+
+def parse_matrix(specs: List[Any]) -> List[Axis]:
+  """Turn --matrix/config entries into ordered (key, values) axes.
+
+  Accepts 'KEY=v1,v2,...' strings (from the CLI or a config list) and
+  mappings of KEY -> list of values (from a `matrix:` block in config).
+  A key given twice keeps its last definition.
+  """
+  axes: Dict[str, List[Any]] = {}
+  for spec in specs or []:
+    if isinstance(spec, dict):
+      for key, values in spec.items():
+        axes[str(key)] = list(values) if isinstance(values, list) else [values]
+      continue
+    if not isinstance(spec, str) or "=" not in spec:
+      die(f"--matrix expects KEY=v1,v2,..., got: {spec}")
+    key, raw = spec.split("=", 1)
+    if not key:
+      die(f"--matrix expects KEY=v1,v2,..., got: {spec}")
+    axes[key] = raw.split(",")
+  for key, values in axes.items():
+    if not values:
+      die(f"--matrix axis '{key}' has no values")
+  return list(axes.items())
+
+
+def expand_matrix(axes: List[Axis]) -> List[Dict[str, Any]]:
+  """Cartesian product of the axes, as one assignment dict per combination."""
+  keys = [k for k, _ in axes]
+  return [dict(zip(keys, combo)) for combo in itertools.product(*(v for _, v in axes))]
+
+
+def format_out(template: str, assignment: Dict[str, Any]) -> str:
+  """Substitute {KEY} placeholders in an output path template."""
+  def _sub(m: "re.Match[str]") -> str:
+    key = m.group(1)
+    if key not in assignment:
+      die(f"--out placeholder {{{key}}} is not a --matrix key")
+    return str(assignment[key])
+  return _PLACEHOLDER_RE.sub(_sub, template)
+
+
+def matrix_entries(axes: List[Axis], out_template: Any) -> List[Dict[str, Any]]:
+  """Batch entries (see batch.render_entry) for every combination of axes."""
+  combos = expand_matrix(axes)
+  if out_template and len(combos) > 1 and not _PLACEHOLDER_RE.search(str(out_template)):
+    die("--out must contain {KEY} placeholders when --matrix yields more than one combination")
+  entries: List[Dict[str, Any]] = []
+  for assignment in combos:
+    entry: Dict[str, Any] = {"set": [], "set_json": []}
+    for key, value in assignment.items():
+      if isinstance(value, str):
+        entry["set"].append(f"{key}={value}")
+      else:  # typed values from a config `matrix:` block keep their type
+        entry["set_json"].append(f"{key}={json.dumps(value)}")
+    if out_template:
+      entry["out"] = format_out(str(out_template), assignment)
+    entries.append(entry)
+  return entries
+
+
+def run_matrix(args) -> None:
+  """Render the template once per matrix combination, in parallel by default."""
+  from .batch import run_entries
+  entries = matrix_entries(parse_matrix(args.matrix), args.out)
+  run_entries(args, entries, default_jobs=0)
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from .layered import LayeredDict
+from .sparse_list import SparseList
+from .utils import die
+
+# Per-path strategies (--merge-strategy PATH=STRATEGY / config: merge_strategy).
+REPLACE, APPEND, MERGE, KEYED = "replace", "append", "merge", "keyed"
+
+Strategy = Tuple[str, Optional[str]]  # (kind, field for KEYED)
+
+# isinstance() against the ABC-based LayeredDict/SparseList is slow for the
+# many plain values of a large document, so those two are compared by type.
+_OWN_TYPES = frozenset((LayeredDict, SparseList))
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _is_container(value: Any) -> bool:
+  return isinstance(value, (dict, list)) or type(value) in _OWN_TYPES
+
+
+_HERE = object()  # trie slot holding the strategy of the path ending at that node
+
+
+def parse_strategy(text: str) -> Strategy:
+  """'replace' | 'append' | 'merge' | 'keyed:FIELD' -> (kind, field)."""
+  kind, _, field = str(text).strip().partition(":")
+  if kind == KEYED and field:
+    return KEYED, field
+  if kind not in (REPLACE, APPEND, MERGE) or field:
+    die(f"Unknown merge strategy '{text}' (expected replace, append, merge or keyed:FIELD)")
+  return kind, None
+
+
+def parse_strategies(specs: Union[None, Mapping[str, Any], Iterable[Any]]) -> Dict[str, Strategy]:
+  """{PATH: strategy} from 'PATH=STRATEGY' strings or a {PATH: STRATEGY} mapping."""
+  if not specs:
+    return {}
+  if isinstance(specs, Mapping):
+    return {str(path): parse_strategy(text) for path, text in specs.items()}
+  out: Dict[str, Strategy] = {}
+  for spec in specs:
+    if isinstance(spec, Mapping):
+      out.update(parse_strategies(spec))
+      continue
+    path, sep, text = str(spec).partition("=")
+    if not sep or not path:
+      die(f"--merge-strategy expects PATH=STRATEGY, got: {spec}")
+    out[path] = parse_strategy(text)
+  return out
+
+
+def _compile(strategies: Dict[str, Strategy]) -> Dict[Any, Any]:
+  trie: Dict[Any, Any] = {}
+  for path, strategy in strategies.items():
+    node = trie
+    for part in path.split("."):
+      node = node.setdefault(part, {})
+    node[_HERE] = strategy
+  return trie
+
+
+def _step(nodes: List[Dict[Any, Any]], key: Any) -> List[Dict[Any, Any]]:
+  # Trie nodes matching one more path segment; exact keys before '*'.
+  out = []
+  for node in nodes:
+    child = node.get(key) if isinstance(key, str) else node.get(str(key))
+    if child is not None:
+      out.append(child)
+    star = node.get("*")
+    if star is not None:
+      out.append(star)
+  return out
+
+
+class Merger:
+  """Deep-merges mapping documents into a context without recursion.
+
+  Merging walks an explicit stack, so documents nested deeper than Python's
+  recursion limit merge like shallow ones. Nested mappings are merged and
+  everything else is replaced, unless a per-path strategy says otherwise:
+
+      m = Merger({"services": "keyed:name", "build.flags": "append"})
+      for doc in docs:
+        m.merge(ctx, doc)
+
+  - replace: the source value replaces the target (also for mappings).
+  - append: a source list is appended to the target list.
+  - merge: mappings are merged (the default).
+  - keyed:FIELD: lists of mappings are matched on item[FIELD]; matching
+    items are merged, the rest appended.
+
+  Paths are dotted keys with '*' matching any one key; inside keyed lists the
+  items' keys continue the list's path (`services.env`). A strategy whose
+  value types do not fit (appending to a mapping) falls back to replace.
+
+  Values from a source are placed into the context as they are, not copied.
+  The Merger remembers which containers it took over that way, and the first
+  time a later document changes one of them it copies just that container
+  (one level) instead of writing into the earlier document. So documents that
+  are shared elsewhere (the $load memo, other contexts) stay as they were
+  parsed, and unchanged subtrees are never copied at all.
+  """
+
+  __slots__ = ("_trie", "_shared", "_owned")
+
+  def __init__(self, strategies: Union[None, Mapping[str, Any], Iterable[Any]] = None) -> None:
+    self._trie = _compile(parse_strategies(strategies))
+    # id -> container: taken over from a source / copied by this Merger. Both
+    # keep their objects alive so the ids stay unique. The children of a copy
+    # are shared unless they are copies themselves.
+    self._shared: Dict[int, Any] = {}
+    self._owned: Dict[int, Any] = {}
+
+  def merge(self, dst: Any, src: Mapping) -> Any:
+    """Merge src into dst (in place) and return dst."""
+    shared, owned = self._shared, self._owned
+    writable = self._writable
+    stack: List[Tuple[Any, Mapping, List[Dict[Any, Any]]]] = [(dst, src, [self._trie] if self._trie else [])]
+    while stack:
+      target, source, nodes = stack.pop()
+      copied = id(target) in owned
+      if not nodes:
+        # No strategy below here: dict.update() places the plain values, and
+        # only the containers are looked at one by one.
+        merges = []
+        for key, value in [(k, v) for k, v in source.items() if type(v) not in _SCALAR_TYPES and _is_container(v)]:
+          if isinstance(value, dict) or type(value) is LayeredDict:
+            current = target.get(key)
+            if isinstance(current, dict) or type(current) is LayeredDict:
+              merges.append((key, value, current))
+              continue
+          shared[id(value)] = value
+        target.update(source)
+        for key, value, current in merges:
+          target[key] = current
+          stack.append((writable(target, key, current, copied), value, nodes))
+        continue
+      for key, value in source.items():
+        kind = field = None
+        child = _step(nodes, key)
+        for node in child:
+          if _HERE in node:
+            kind, field = node[_HERE]
+            break
+        if kind is None or kind == MERGE:
+          if isinstance(value, dict) or type(value) is LayeredDict:
+            current = target.get(key)
+            if isinstance(current, dict) or type(current) is LayeredDict:
+              stack.append((writable(target, key, current, copied), value, child))
+              continue
+        elif kind != REPLACE and (isinstance(value, list) or type(value) is SparseList):
+          current = target.get(key)
+          if isinstance(current, list) or type(current) is SparseList:
+            lst = writable(target, key, current, copied)
+            if kind == APPEND:
+              lst.extend(value)
+              for item in value:
+                if _is_container(item):
+                  shared[id(item)] = item
+            else:
+              self._merge_keyed(lst, value, field, child, stack)  # type: ignore[arg-type]
+            continue
+        target[key] = value
+        if _is_container(value):
+          shared[id(value)] = value
+    return dst
+
+  def _writable(self, parent: Any, key: Any, value: Any, copied: bool) -> Any:
+    # parent[key] (value), copied into parent first if it still belongs to a
+    # source; `copied` says parent is a copy, whose children all do.
+    owned = self._owned
+    if type(parent) is LayeredDict and (isinstance(value, list) or type(value) is SparseList):
+      layered = parent.list_for_write(key)
+      if layered is not value:  # copied from the layer's base; the items are still the base's
+        owned[id(layered)] = layered
+        return layered
+    vid = id(value)
+    if vid in owned or not (copied or vid in self._shared):
+      return value
+    out = parent[key] = dict(value) if isinstance(value, dict) or type(value) is LayeredDict else value.copy()
+    owned[id(out)] = out
+    return out
+
+  def _merge_keyed(self, lst: Any, items: Iterable[Any], field: str,
+                   nodes: List[Dict[Any, Any]], stack: List[Any]) -> None:
+    shared = self._shared
+    copied = id(lst) in self._owned
+    positions: Dict[Any, int] = {}
+    for i, item in enumerate(lst):
+      if (isinstance(item, dict) or type(item) is LayeredDict) and field in item:
+        try:
+          positions.setdefault(item[field], i)
+        except TypeError:  # unhashable key value: never matches
+          pass
+    for item in items:
+      i = None
+      if (isinstance(item, dict) or type(item) is LayeredDict) and field in item:
+        try:
+          i = positions.get(item[field])
+          if i is None:
+            positions[item[field]] = len(lst)
+        except TypeError:
+          pass
+      if i is None:
+        lst.append(item)
+        if _is_container(item):
+          shared[id(item)] = item
+        continue
+      current = lst[i]
+      if isinstance(current, dict) or type(current) is LayeredDict:
+        stack.append((self._writable(lst, i, current, copied), item, nodes))
+      else:
+        lst[i] = item
+
+
+def merge_documents(dst: Any, docs: Iterable[Mapping],
+                    strategies: Union[None, Mapping[str, Any], Iterable[Any]] = None) -> Any:
+  """Merge each of docs into dst in order (one Merger for all of them)."""
+  merger = Merger(strategies)
+  for doc in docs:
+    merger.merge(dst, doc)
+  return dst
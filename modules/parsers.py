@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .utils import die
+
+# Backend names accepted by --json-backend / --yaml-backend (and config keys json_backend / yaml_backend).
+# "auto" picks the fastest one installed.
+JSON_BACKENDS = ("auto", "stdlib", "orjson")
+YAML_BACKENDS = ("auto", "c", "python")
+
+# Selections travel through the environment so worker processes use them too.
+JSON_ENV, YAML_ENV = "CODEX_JSON_BACKEND", "CODEX_YAML_BACKEND"
+
+_RESOLVED: Dict[Tuple[str, str], Any] = {}
+
+
+def select_backends(json_backend: Optional[str] = None, yaml_backend: Optional[str] = None) -> None:
+  """Choose the JSON/YAML backends for this process and its workers (None keeps the current one)."""
+  for value, choices, env in ((json_backend, JSON_BACKENDS, JSON_ENV), (yaml_backend, YAML_BACKENDS, YAML_ENV)):
+    if value is None:
+      continue
+    if value not in choices:
+      die(f"Unknown parser backend '{value}' (choose from: {', '.join(choices)})")
+    os.environ[env] = value
+
+
+def _requested(env: str) -> str:
+  return os.getenv(env) or "auto"
+
+
+def _require_yaml() -> Any:
+  # Imported on first use: PyYAML dominates start-up time when loaded eagerly.
+  try:
+    import yaml  # type: ignore
+  except Exception:
+    die("YAML support requires PyYAML. Install with: pip install PyYAML")
+  return yaml
+
+
+def yaml_backend() -> Tuple[str, Any, Any]:
+  """(name, SafeLoader class, Dumper class) for the selected YAML backend.
+
+  "c" needs PyYAML built against libyaml; "auto" uses it when present.
+  The backend only changes parsing: dumping always uses yaml.dump()'s
+  pure-Python Dumper, because CDumper writes some values differently (it
+  escapes characters outside the BMP even with allow_unicode, and drops the
+  '...' after a bare scalar). The dumper also writes lazy file values,
+  document streams, sparse lists and layered contexts as the plain strings,
+  lists and mappings they stand for.
+  """
+  requested = _requested(YAML_ENV)
+  key = ("yaml", requested)
+  hit = _RESOLVED.get(key)
+  if hit is None:
+    yaml = _require_yaml()
+    has_c = getattr(yaml, "__with_libyaml__", False)
+    if requested == "c" and not has_c:
+      die("--yaml-backend c requires PyYAML built with libyaml")
+    if has_c and requested in ("auto", "c"):
+      hit = ("c", yaml.CSafeLoader, _context_aware(yaml.Dumper))
+    else:
+      hit = ("python", yaml.SafeLoader, _context_aware(yaml.Dumper))
+    _RESOLVED[key] = hit
+  return hit
+
+
+def _context_aware(dumper: Any) -> Any:
+  from .lazy_values import LazyText
+  cls = type(dumper.__name__, (dumper,), {})
+  cls.add_multi_representer(LazyText, lambda d, v: d.represent_str(v.data))
+  from .layered import LayeredDict
+  from .sparse_list import SparseList
+  from .structload import DocumentStream
+  cls.add_representer(DocumentStream, lambda d, v: d.represent_list(list(v)))
+  cls.add_representer(SparseList, lambda d, v: d.represent_list(list(v)))
+  cls.add_representer(LayeredDict, lambda d, v: d.represent_dict(v.to_dict()))
+  return cls
+
+
+def json_backend() -> Tuple[str, Callable[[str], Any]]:
+  """(name, loads) for the selected JSON backend.
+
+  orjson is strict where json is lenient (NaN/Infinity, lone surrogates),
+  so its loads falls back to json.loads whenever it rejects a document, and
+  documents with 19+ digit runs go to json.loads directly because orjson
+  turns integers beyond 64 bits into floats. Results and error messages
+  match the stdlib either way.
+  """
+  requested = _requested(JSON_ENV)
+  key = ("json", requested)
+  hit = _RESOLVED.get(key)
+  if hit is None:
+    import json
+    orjson = None
+    if requested in ("auto", "orjson"):
+      try:
+        import orjson  # type: ignore
+      except Exception:
+        if requested == "orjson":
+          die("--json-backend orjson requires the orjson package: pip install orjson")
+    if orjson is not None:
+      fast_loads, slow_loads, decode_error = orjson.loads, json.loads, orjson.JSONDecodeError
+      # Digit runs are found by mapping digits to '0' and everything else to ' '
+      # (bytes.translate + a substring search run at memory speed; a regex does not).
+      digits_only = bytes(0x30 if 0x30 <= i <= 0x39 else 0x20 for i in range(256))
+      long_run = b"0" * 19
+
+      def loads(text: str) -> Any:
+        data = text.encode("utf-8", "surrogatepass")
+        if long_run in data.translate(digits_only):
+          return slow_loads(text)
+        try:
+          return fast_loads(data)
+        except decode_error:
+          return slow_loads(text)
+      hit = ("orjson", loads)
+    else:
+      hit = ("stdlib", json.loads)
+    _RESOLVED[key] = hit
+  return hit
+
+
+def json_loads(text: str) -> Any:
+  return json_backend()[1](text)
+
+
+def yaml_load_all(text: str) -> List[Any]:
+  yaml = _require_yaml()
+  return list(yaml.load_all(text, Loader=yaml_backend()[1]))
+
+
+def yaml_iter(stream: Any) -> Iterator[Any]:
+  """Documents of a YAML text or file object, parsed one at a time as they are consumed."""
+  yaml = _require_yaml()
+  return yaml.load_all(stream, Loader=yaml_backend()[1])
+
+
+def yaml_dump(value: Any, **kwargs: Any) -> str:
+  yaml = _require_yaml()
+  return yaml.dump(value, Dumper=yaml_backend()[2], **kwargs)
+
+
+def backend_names() -> Dict[str, str]:
+  return {"json": json_backend()[0], "yaml": yaml_backend()[0]}
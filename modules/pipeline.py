@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from .tree_index import glob_sorted, tree_index
+from .utils import die, expand_path, file_digest, file_stamp
+
+# Keys of a phase that are not batch-entry operations.
+_PHASE_ONLY_KEYS = ("name", "inputs", "after")
+
+# Phase keys holding paths, resolved against the pipeline file's directory.
+_PHASE_PATH_KEYS = ("template", "out")
+
+# Operations whose values (all of it / after KEY= / '@path' values after KEY=)
+# name files, resolved against the pipeline file's directory as well.
+_PATH_OPS = ("load", "template_search")
+_PAIR_PATH_OPS = ("load_into", "set_file", "add_file", "set_json_file", "set_file_index")
+_AT_FILE_OPS = ("set", "add", "set_index")
+
+
+def _join(base: Path, path: Any) -> Any:
+  if not isinstance(path, str) or not path:
+    return path
+  path = expand_path(path)
+  return path if os.path.isabs(path) else os.path.normpath(os.path.join(str(base), path))
+
+
+def _resolve_op(kind: str, item: Any, base: Path) -> Any:
+  if isinstance(item, dict):  # {KEY: PATH} form of load_into
+    return {k: _join(base, v) for k, v in item.items()} if kind == "load_into" else item
+  if not isinstance(item, str):
+    return item
+  if kind in _PATH_OPS:
+    return _join(base, item)
+  key, sep, value = item.partition("=")
+  if not sep:
+    return item
+  if kind in _PAIR_PATH_OPS:
+    return f"{key}={_join(base, value)}"
+  if value[:1] == "@" and value[:2] != "@@":
+    return f"{key}=@{_join(base, value[1:])}"
+  return item
+
+
+def _resolve_ops(ops: Dict[str, Any], base: Path) -> None:
+  """Rewrite the relative paths in ops (a `context:` block or a phase) in place."""
+  for kind in _PATH_OPS + _PAIR_PATH_OPS + _AT_FILE_OPS:
+    value = ops.get(kind)
+    if value is None:
+      continue
+    if isinstance(value, list):
+      ops[kind] = [_resolve_op(kind, item, base) for item in value]
+    else:
+      ops[kind] = _resolve_op(kind, value, base)
+
+
+def _sha1(text: str) -> str:
+  return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_pipeline(path_str: str) -> Dict[str, Any]:
+  """Read and validate a pipeline definition (YAML/JSON).
+
+  Shape:
+    context:  {load: [...], set: [...], ...}   # optional, shared by all phases
+    state:    path/to/state.json               # optional (default: .<name>.state.json)
+    phases:
+      - name: compare
+        template: tpl/01.j2
+        out: out/01.md
+        set: [...]                              # any batch-entry operation
+        inputs: {PHASE0: phase0}                # KEY <- output text of another phase
+        after: [other]                          # extra ordering without passing output
+
+  Relative paths are resolved against the directory of the pipeline file, so
+  it runs the same from any cwd: `template`, `out` and `state`, and the files
+  named by the operations of `context:` and of each phase (load, load_into,
+  the *_file ones, template_search and '@path' values of set/add/set_index).
+  """
+  from .structload import load_structured_file
+  p = Path(expand_path(path_str))
+  docs = load_structured_file(str(p))
+  doc = docs[0] if docs else None
+  if not isinstance(doc, dict) or not isinstance(doc.get("phases"), list):
+    die(f"Pipeline must be a mapping with a 'phases' list: {p}")
+
+  base = p.resolve().parent
+  if isinstance(doc.get("context"), dict):
+    _resolve_ops(doc["context"], base)
+  names: Set[str] = set()
+  for i, phase in enumerate(doc["phases"]):
+    if not isinstance(phase, dict):
+      die(f"Pipeline phase {i} must be a mapping")
+    name = phase.get("name")
+    if not isinstance(name, str) or not name:
+      die(f"Pipeline phase {i} needs a 'name'")
+    if name in names:
+      die(f"Duplicate pipeline phase name: {name}")
+    if not phase.get("template"):
+      die(f"Pipeline phase '{name}' needs a 'template'")
+    if not isinstance(phase.get("inputs") or {}, dict):
+      die(f"Pipeline phase '{name}': 'inputs' must map KEY -> phase name")
+    names.add(name)
+    for key in _PHASE_PATH_KEYS:
+      if phase.get(key):
+        phase[key] = str(base / expand_path(str(phase[key])))
+    _resolve_ops(phase, base)
+
+  doc["state"] = str(base / expand_path(str(doc.get("state") or f".{p.stem}.state.json")))
+  return doc
+
+
+def _requires(phase: Dict[str, Any]) -> List[str]:
+  after = phase.get("after") or []
+  return list((phase.get("inputs") or {}).values()) + (after if isinstance(after, list) else [after])
+
+
+def phase_levels(phases: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+  """Group phases into dependency levels; phases in one level are independent."""
+  by_name = {ph["name"]: ph for ph in phases}
+  pending: Dict[str, Set[str]] = {}
+  for ph in phases:
+    reqs = set(_requires(ph))
+    unknown = reqs - by_name.keys()
+    if unknown:
+      die(f"Pipeline phase '{ph['name']}' depends on unknown phase(s): {', '.join(sorted(unknown))}")
+    pending[ph["name"]] = reqs
+
+  levels: List[List[Dict[str, Any]]] = []
+  done: Set[str] = set()
+  while pending:
+    ready = [n for n, reqs in pending.items() if reqs <= done]
+    if not ready:
+      die(f"Pipeline has a dependency cycle among: {', '.join(sorted(pending))}")
+    levels.append([by_name[n] for n in ready])
+    done.update(ready)
+    for n in ready:
+      del pending[n]
+  return levels
+
+
+def _run_phase(item: Tuple[str, Dict[str, Any]]) -> Tuple[str, bool, str, Dict[str, Any]]:
+  """Worker: render one phase, recording the files it read."""
+  from .batch import _run_item
+  from .utils import Dependencies, track_dependencies
+
+  name, entry = item
+  tree_index().invalidate()  # earlier phases may have written files this one globs
+  deps = Dependencies()
+  with track_dependencies(deps):
+    _, ok, payload = _run_item((0, entry, None))
+  if ok and entry.get("out"):
+    payload = Path(payload).read_text(encoding="utf-8")
+  record = {
+    "files": {p: [file_stamp(p), file_digest(p)] for p in sorted(deps.files)},
+    "globs": {g: glob_sorted(g) for g in sorted(deps.globs)},
+  }
+  return name, ok, payload, record
+
+
+def _deps_unchanged(record: Dict[str, Any]) -> bool:
+  for path, (stamp, digest) in (record.get("files") or {}).items():
+    now = file_stamp(path)
+    if now is None and stamp is None:
+      continue
+    if (list(now) if now else None) != stamp and file_digest(path) != digest:
+      return False
+  for pattern, matches in (record.get("globs") or {}).items():
+    if glob_sorted(pattern) != matches:
+      return False
+  return True
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      state = json.load(f)
+    return state if isinstance(state, dict) else {}
+  except (OSError, ValueError):
+    return {}
+
+
+def _save_state(path: str, state: Dict[str, Any]) -> None:
+  tmp = f"{path}.tmp"
+  with open(tmp, "w", encoding="utf-8") as f:
+    json.dump(state, f, indent=1, sort_keys=True)
+  os.replace(tmp, path)
+
+
+def run_pipeline(args) -> None:
+  """Execute a pipeline DAG in one process (or a worker pool), skipping up-to-date phases.
+
+  A phase is skipped when its definition, base context, input texts and every
+  file it read last time (templates, includes, loaded data) are unchanged and
+  its output file still exists. Phases in the same dependency level run
+  concurrently when --jobs allows it.
+  """
+  from .batch import OP_KEYS, _init_worker
+  from .cli import apply_context_ops, build_context
+  from types import SimpleNamespace
+
+  doc = load_pipeline(args.pipeline)
+  levels = phase_levels(doc["phases"])
+
+  base_ctx = build_context(args)
+  shared = doc.get("context") or {}
+  if shared:
+    ops = SimpleNamespace(**{k: (shared.get(k) if isinstance(shared.get(k), list) else
+                                 ([shared[k]] if shared.get(k) is not None else [])) for k in OP_KEYS})
+    apply_context_ops(base_ctx, ops)
+  if args.print_context:
+    from .lazy_values import context_json
+    sys.stderr.write(context_json(base_ctx) + "\n")
+  base_digest = _sha1(json.dumps(base_ctx, sort_keys=True, ensure_ascii=False, default=str))
+
+  state_path = expand_path(str(doc["state"]))
+  state = {} if args.force else _load_state(state_path)
+  outputs: Dict[str, str] = {}
+  counts = {"rendered": 0, "skipped": 0, "failed": 0, "blocked": 0}
+  failed: Set[str] = set()
+
+  jobs = 1 if args.jobs is None else args.jobs
+  if jobs <= 0:
+    jobs = os.cpu_count() or 1
+  search = list(args.template_search)
+  pool = None
+  if jobs > 1 and max(len(level) for level in levels) > 1:
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(base_ctx, search, False))
+  else:
+    _init_worker(base_ctx, search, False)
+
+  start = time.perf_counter()
+  try:
+    for level in levels:
+      tree_index().invalidate()  # earlier levels may have written files the up-to-date checks glob
+      todo: List[Tuple[str, Dict[str, Any]]] = []
+      keys: Dict[str, str] = {}
+      for phase in level:
+        name = phase["name"]
+        if set(_requires(phase)) & failed:
+          failed.add(name); counts["blocked"] += 1
+          sys.stderr.write(f"BLOCKED {name}: an upstream phase failed\n")
+          continue
+        entry = {k: v for k, v in phase.items() if k not in _PHASE_ONLY_KEYS}
+        entry["values"] = dict(entry.get("values") or {})
+        for key, upstream in (phase.get("inputs") or {}).items():
+          entry["values"][key] = outputs[upstream]
+        keys[name] = _sha1(json.dumps({"entry": entry, "base": base_digest}, sort_keys=True, default=str))
+
+        prev = state.get(name) or {}
+        out = entry.get("out")
+        if (out and prev.get("key") == keys[name] and os.path.exists(expand_path(str(out)))
+            and _deps_unchanged(prev.get("deps") or {})):
+          outputs[name] = Path(expand_path(str(out))).read_text(encoding="utf-8")
+          counts["skipped"] += 1
+          sys.stderr.write(f"skip {name} (up to date)\n")
+          continue
+        todo.append((name, entry))
+
+      results = list(pool.map(_run_phase, todo)) if pool is not None else [_run_phase(it) for it in todo]
+      for name, ok, payload, record in results:
+        if not ok:
+          failed.add(name); counts["failed"] += 1
+          state.pop(name, None)
+          sys.stderr.write(f"FAILED {name}: {payload}\n")
+          continue
+        outputs[name] = payload
+        counts["rendered"] += 1
+        state[name] = {"key": keys[name], "deps": record}
+        sys.stderr.write(f"done {name}\n")
+  finally:
+    if pool is not None:
+      pool.shutdown()
+    _save_state(state_path, state)
+  elapsed = time.perf_counter() - start
+
+  # Phases without an out path print their output, in definition order.
+  for phase in doc["phases"]:
+    if not phase.get("out") and phase["name"] in outputs:
+      print(outputs[phase["name"]], end="")
+
+  sys.stderr.write("pipeline: " + ", ".join(f"{v} {k}" for k, v in counts.items()) + f", {elapsed:.2f}s\n")
+  if failed:
+    raise SystemExit(1)
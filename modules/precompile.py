@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import die
+
+# (template name as the loader sees it, absolute path)
+TemplateRef = Tuple[str, str]
+
+# Per-process Environment used by compile workers (built by _init_worker).
+_ENV: Any = None
+
+# A file is a template when one of the extensions in its name is one of these
+# (main.tpl, prompt.j2.tpl.md, codex.yaml.tpl).
+TEMPLATE_EXTENSIONS = frozenset(("tpl", "j2", "jinja", "jinja2"))
+
+
+def is_template_name(filename: str) -> bool:
+  return any(ext in TEMPLATE_EXTENSIONS for ext in filename.lower().split(".")[1:])
+
+
+def list_templates(roots: List[str]) -> List[TemplateRef]:
+  """Every template under roots as a loader name, first root winning (FileSystemLoader order).
+
+  Hidden files and directories (leading '.') are skipped, and so are files
+  without a template extension (TEMPLATE_EXTENSIONS), such as JSON schemas.
+  """
+  seen: Dict[str, str] = {}
+  for root in roots:
+    root_path = Path(root)
+    if not root_path.is_dir():
+      continue
+    for dirpath, dirnames, filenames in os.walk(root_path):
+      dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+      for fn in sorted(filenames):
+        if fn.startswith(".") or not is_template_name(fn):
+          continue
+        full = Path(dirpath) / fn
+        name = full.relative_to(root_path).as_posix()
+        seen.setdefault(name, str(full))
+  return sorted(seen.items())
+
+
+def _init_worker(roots: List[str]) -> None:
+  from .template_env import build_environment
+  global _ENV
+  _ENV = build_environment(roots)
+
+
+def _compile_one(ref: TemplateRef) -> Tuple[str, str, Optional[str], Optional[str]]:
+  """Compile one template to module source; returns (name, path, code, error)."""
+  from jinja2 import TemplateSyntaxError, TemplateAssertionError  # type: ignore
+  name, path = ref
+  try:
+    source = Path(path).read_text(encoding="utf-8")
+  except (OSError, UnicodeDecodeError) as e:
+    return name, path, None, f"{path}: cannot read: {e}"
+  try:
+    code = _ENV.compile(source, name, path, raw=True, defer_init=True)
+  except (TemplateSyntaxError, TemplateAssertionError) as e:
+    return name, path, None, f"{path}:{e.lineno}: {e.message}"
+  return name, path, code, None
+
+
+def compile_tree(roots: List[str], target: Optional[str], *, jobs: int = 0) -> Tuple[int, List[str]]:
+  """Compile every template under roots in parallel.
+
+  With a target, write the compiled modules to it (a .zip archive or a
+  directory) in the layout jinja2.ModuleLoader reads. Returns the number of
+  templates compiled and the list of error messages.
+  """
+  from jinja2 import ModuleLoader  # type: ignore
+
+  refs = list_templates(roots)
+  if jobs <= 0:
+    jobs = os.cpu_count() or 1
+  if jobs == 1 or len(refs) <= 1:
+    _init_worker(roots)
+    results = [_compile_one(r) for r in refs]
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(roots,)) as pool:
+      results = list(pool.map(_compile_one, refs, chunksize=max(1, len(refs) // (jobs * 4))))
+
+  errors = [err for _, _, _, err in results if err]
+  compiled = [(name, code) for name, _, code, _ in results if code is not None]
+  if target:
+    if target.endswith(".zip"):
+      import zipfile
+      tmp = f"{target}.tmp"
+      with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, code in compiled:
+          zf.writestr(ModuleLoader.get_module_filename(name), code)
+      os.replace(tmp, target)
+    else:
+      os.makedirs(target, exist_ok=True)
+      for name, code in compiled:
+        with open(os.path.join(target, ModuleLoader.get_module_filename(name)), "w", encoding="utf-8") as f:
+          f.write(code)
+  return len(compiled), errors
+
+
+def run_compile(args) -> None:
+  """--compile-templates / --check-templates entry point."""
+  from .utils import ensure_jinja2
+  ensure_jinja2()
+  roots = [str(Path(p).resolve()) for p in args.template_search]
+  if not roots:
+    die("--compile-templates/--check-templates need at least one --template-search directory")
+  start = time.perf_counter()
+  count, errors = compile_tree(roots, args.compile_templates, jobs=0 if args.jobs is None else args.jobs)
+  elapsed = time.perf_counter() - start
+  for err in errors:
+    sys.stderr.write(f"TEMPLATE ERROR {err}\n")
+  where = f" -> {args.compile_templates}" if args.compile_templates else ""
+  sys.stderr.write(f"templates: {count} compiled, {len(errors)} failed, {elapsed:.2f}s{where}\n")
+  if errors:
+    raise SystemExit(1)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .utils import die, expand_path
+
+PathLike = Union[str, Path]
+
+# Namespace attributes holding context operations (same names as the CLI flags).
+_OP_ATTRS = [
+  "load", "load_into",
+  "set", "set_json", "set_json_file", "set_file",
+  "add", "add_file", "set_index", "set_file_index",
+  "merge_strategy",
+]
+
+
+class Renderer:
+  """In-process equivalent of the codex_prompt_builder CLI.
+
+  A Renderer resolves the config file once and keeps one Jinja Environment
+  per search-path set, so many sessions can be rendered without paying for
+  process start-up or template compilation again::
+
+      r = Renderer(template_search=["resources/templates"])
+      text = r.session().load("config/base.yaml").set("owner", "pfahlr").render("prompt.j2")
+
+  Pass config=False to skip config discovery; by default the same files as the
+  CLI are searched (relative to the current directory at construction time).
+
+  Directory listings used by globs and the parsed documents of loaded files
+  are kept across sessions too. Each session re-lists only directories whose
+  mtime changed and re-parses only files whose mtime/size changed; call
+  invalidate() to drop both anyway.
+  """
+
+  def __init__(self, template_search: Optional[Sequence[PathLike]] = None, *,
+               config: Union[None, bool, PathLike] = None) -> None:
+    from .config import find_config_path, load_config
+
+    self.template_search: List[str] = [str(p) for p in (template_search or [])]
+    self.config_path: Optional[Path] = None
+    self._config: Optional[Dict[str, Any]] = None
+    if config is not False:
+      explicit = None if config in (None, True) else str(config)
+      self.config_path = find_config_path(explicit)
+      if self.config_path:
+        self._config = load_config(self.config_path)
+    self._envs: Dict[Tuple[Any, ...], Any] = {}
+    self._tree_index: Any = None
+    self._tree_key: Any = None
+
+  def session(self) -> "RenderSession":
+    """Start a new, empty set of context operations (one CLI invocation's worth)."""
+    return RenderSession(self)
+
+  def invalidate(self) -> None:
+    """Forget cached directory listings and parsed documents (e.g. after bulk file changes)."""
+    from .structload import reset_load_memo
+    if self._tree_index is not None:
+      self._tree_index.invalidate()
+    reset_load_memo()
+
+  def tree_index(self, excludes: Sequence[str] = (), ignore_files: bool = False,
+                 exclude_base: Optional[str] = None):
+    """The TreeIndex shared by this Renderer's sessions, revalidated for a new run."""
+    from .tree_index import TreeIndex, use_tree_index
+    key = (tuple(excludes), ignore_files, exclude_base)
+    if self._tree_index is None or key != self._tree_key:
+      self._tree_index, self._tree_key = TreeIndex(excludes, ignore_files, exclude_base), key
+    else:
+      self._tree_index.begin_run()
+    return use_tree_index(self._tree_index)
+
+  def environment(self, template_path: PathLike, extra_search: Optional[Sequence[str]] = None):
+    """Return the (cached) Environment used to render template_path."""
+    from .template_env import build_environment, environment_key, template_search_paths
+    if extra_search is None:
+      extra_search = self.template_search
+    search_paths = template_search_paths(Path(template_path), list(extra_search))
+    key = environment_key(search_paths)
+    env = self._envs.get(key)
+    if env is None:
+      env = self._envs[key] = build_environment(search_paths)
+    return env
+
+  def _template_path(self, template_path: PathLike) -> Path:
+    tpl_path = Path(expand_path(str(template_path)))
+    if not tpl_path.exists():
+      die(f"Template not found: {tpl_path}")
+    return tpl_path
+
+  def render(self, template_path: PathLike, context: Dict[str, Any],
+             extra_search: Optional[Sequence[str]] = None) -> str:
+    """Render template_path with an already-built context."""
+    from .template_env import render_template
+    tpl_path = self._template_path(template_path)
+    return render_template(tpl_path, context, [], env=self.environment(tpl_path, extra_search))
+
+  def stream(self, template_path: PathLike, context: Dict[str, Any],
+             extra_search: Optional[Sequence[str]] = None) -> Iterator[str]:
+    """Like render(), but yield the output in chunks as Jinja produces them."""
+    from .template_env import stream_template
+    tpl_path = self._template_path(template_path)
+    return stream_template(tpl_path, context, [], env=self.environment(tpl_path, extra_search))
+
+  def render_to(self, template_path: PathLike, context: Dict[str, Any], out: PathLike,
+                extra_search: Optional[Sequence[str]] = None) -> int:
+    """Stream the render into the file out (bounded memory); returns characters written."""
+    from .template_env import write_rendered
+    return write_rendered(self.stream(template_path, context, extra_search), Path(out))
+
+
+class RenderSession:
+  """Context operations for one render, applied in the same order as the CLI.
+
+  Each method mirrors a CLI flag and returns the session, so calls chain.
+  Operations are recorded and applied when the context is built, which keeps
+  the CLI's fixed ordering (loads, then sets/files/json, then array ops) and
+  its config-file defaults.
+  """
+
+  def __init__(self, renderer: Renderer) -> None:
+    self.renderer = renderer
+    self._ops: Dict[str, List[Any]] = {name: [] for name in _OP_ATTRS}
+
+  # structured config
+  def load(self, pattern: PathLike) -> "RenderSession":
+    self._ops["load"].append(str(pattern)); return self
+
+  def load_into(self, key: str, pattern: PathLike) -> "RenderSession":
+    self._ops["load_into"].append(f"{key}={pattern}"); return self
+
+  # scalars / json / files
+  def set(self, key: str, value: Any) -> "RenderSession":
+    """--set KEY=VALUE (VALUE may be '@path'; KEY may use A.B and LIST[]/LIST[n])."""
+    self._ops["set"].append(f"{key}={value}"); return self
+
+  def set_json(self, key: str, value: Any) -> "RenderSession":
+    """--set-json; value is JSON text, or any JSON-serialisable Python object."""
+    if not isinstance(value, str):
+      import json
+      value = json.dumps(value)
+    self._ops["set_json"].append(f"{key}={value}"); return self
+
+  def set_json_file(self, key: str, path: PathLike) -> "RenderSession":
+    self._ops["set_json_file"].append(f"{key}={path}"); return self
+
+  def set_file(self, key: str, pattern: PathLike) -> "RenderSession":
+    self._ops["set_file"].append(f"{key}={pattern}"); return self
+
+  # array ops
+  def add(self, key: str, value: Any) -> "RenderSession":
+    self._ops["add"].append(f"{key}={value}"); return self
+
+  def add_file(self, key: str, pattern: PathLike) -> "RenderSession":
+    self._ops["add_file"].append(f"{key}={pattern}"); return self
+
+  def set_index(self, key: str, index: int, value: Any) -> "RenderSession":
+    self._ops["set_index"].append(f"{key}:{index}={value}"); return self
+
+  def set_file_index(self, key: str, index: int, path: PathLike) -> "RenderSession":
+    self._ops["set_file_index"].append(f"{key}:{index}={path}"); return self
+
+  # how --load documents merge
+  def merge_strategy(self, path: str, strategy: str) -> "RenderSession":
+    """--merge-strategy PATH=STRATEGY (replace, append, merge or keyed:FIELD)."""
+    self._ops["merge_strategy"].append(f"{path}={strategy}"); return self
+
+  def _namespace(self):
+    import argparse
+    from .config import merge_config_into_args
+
+    # Only the attributes build_context()/merge_config_into_args() look at.
+    ns = argparse.Namespace(out=None, exclude=[], template_search=list(self.renderer.template_search),
+                            **{name: list(values) for name, values in self._ops.items()})
+    if self.renderer._config is not None:
+      merge_config_into_args(ns, self.renderer._config, base_dir=self.renderer.config_path.parent)
+    return ns
+
+  @contextlib.contextmanager
+  def _settings(self, ns) -> Iterator[None]:
+    # Config run settings (list_index_limit, lazy_files, parser backends...)
+    # apply as they do for the CLI, and are undone afterwards.
+    from .cli import export_run_settings, scoped_environ
+    with scoped_environ():
+      export_run_settings(ns)
+      yield
+
+  def _build(self, ns):
+    from .cli import build_context
+    # Globs see the tree as of this call; unchanged directories are not re-read.
+    self.renderer.tree_index(ns.exclude or [],
+                             ignore_files=bool(getattr(ns, "respect_ignore", None)) and not getattr(ns, "no_ignore", None),
+                             exclude_base=getattr(ns, "_exclude_base", None))
+    return build_context(ns)
+
+  def context(self) -> Dict[str, Any]:
+    """Build and return the merged context (what --print-context shows)."""
+    ns = self._namespace()
+    with self._settings(ns):
+      return self._build(ns)
+
+  def render(self, template_path: PathLike) -> str:
+    ns = self._namespace()
+    with self._settings(ns):
+      return self.renderer.render(template_path, self._build(ns), ns.template_search)
+
+  def stream(self, template_path: PathLike) -> Iterator[str]:
+    ns = self._namespace()
+    with self._settings(ns):
+      chunks = self.renderer.stream(template_path, self._build(ns), ns.template_search)
+    def scoped() -> Iterator[str]:
+      # The settings are in effect while each chunk renders, never between them.
+      while True:
+        with self._settings(ns):
+          chunk = next(chunks, None)
+        if chunk is None:
+          return
+        yield chunk
+    return scoped()
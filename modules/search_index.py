@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+# Cached directory listing: (generation it was validated in, dir mtime_ns, file names).
+# A None listing means the directory does not exist (negative entry).
+_Listing = Tuple[int, Optional[int], Optional[FrozenSet[str]]]
+
+
+class SearchIndex:
+  """Name -> file index over a list of search roots, shared by the Jinja loader
+  and the include helpers.
+
+  Directories are listed once with os.scandir and remembered, including
+  directories and names that do not exist, so probing a dozen roots for each
+  include costs dictionary lookups instead of stat calls. Listings are
+  revalidated against the directory mtime once per render (see
+  begin_render()), which picks up added and removed files in long-lived
+  processes.
+  """
+
+  def __init__(self, roots: Sequence[str]) -> None:
+    self.roots: List[str] = [os.path.abspath(r) for r in roots]
+    self._listings: Dict[str, _Listing] = {}
+    self._generation = 0
+    self.scans = 0   # directories listed
+    self.stats = 0   # directory stat calls made for revalidation
+
+  def begin_render(self) -> None:
+    """Mark every cached listing as needing one mtime check before reuse."""
+    self._generation += 1
+
+  def _files_in(self, directory: str) -> Optional[FrozenSet[str]]:
+    cached = self._listings.get(directory)
+    if cached is not None:
+      generation, mtime, names = cached
+      if generation == self._generation:
+        return names
+      self.stats += 1
+      try:
+        now = os.stat(directory).st_mtime_ns
+      except OSError:
+        now = None
+      if now == mtime:
+        self._listings[directory] = (self._generation, mtime, names)
+        return names
+    return self._scan(directory)
+
+  def _scan(self, directory: str) -> Optional[FrozenSet[str]]:
+    self.scans += 1
+    try:
+      mtime: Optional[int] = os.stat(directory).st_mtime_ns
+      with os.scandir(directory) as it:
+        names: Optional[FrozenSet[str]] = frozenset(e.name for e in it if e.is_file())
+    except OSError:
+      mtime, names = None, None
+    self._listings[directory] = (self._generation, mtime, names)
+    return names
+
+  def is_file(self, path: str) -> bool:
+    """Whether path (absolute, or relative to cwd) names an existing file, via the listing cache."""
+    directory, base = os.path.split(os.path.normpath(os.path.abspath(path)))
+    names = self._files_in(directory)
+    return names is not None and base in names
+
+  def find(self, name: str) -> Optional[str]:
+    """First root containing the relative name as a file, or None."""
+    for root in self.roots:
+      candidate = os.path.normpath(os.path.join(root, name))
+      if self.is_file(candidate):
+        return candidate
+    return None
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List
+
+from .utils import die, expand_path
+
+# Wire protocol (newline-delimited JSON over a Unix stream socket):
+#   client -> server: {"argv": [...], "cwd": "...", "env": {...}}
+#   server -> client: {"stdout": "..."} / {"stderr": "..."} chunks, then {"exit": N}
+CHUNK_SIZE = 64 * 1024
+
+# Flags that would keep the (single-threaded) server busy forever: a nested
+# server, or a watch loop that never returns and would block every later client.
+_UNFORWARDABLE = ("--serve", "--watch")
+
+
+def _require_unix_sockets() -> None:
+  if not hasattr(socket, "AF_UNIX"):
+    die("--serve/--connect require Unix-domain sockets, which this platform lacks.")
+
+
+def _names_flag(argv: List[str], flag: str) -> bool:
+  # argparse also accepts unambiguous prefixes (--wat for --watch).
+  for arg in argv:
+    name = arg.partition("=")[0]
+    if len(name) > 2 and name.startswith("--") and flag.startswith(name):
+      return True
+  return False
+
+
+def _send(sock: socket.socket, msg: Dict[str, Any]) -> None:
+  sock.sendall((json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def _send_stream(sock: socket.socket, name: str, text: str) -> None:
+  for i in range(0, len(text), CHUNK_SIZE):
+    _send(sock, {name: text[i:i + CHUNK_SIZE]})
+
+
+class _SocketWriter(io.TextIOBase):
+  """Text stream that forwards every write to the client as {name: text} chunks.
+
+  write_chunks() already coalesces the render into large writes, so each one
+  goes out as soon as the render produces it instead of after it finishes.
+  """
+
+  def __init__(self, sock: socket.socket, name: str) -> None:
+    super().__init__()
+    self._sock, self._name = sock, name
+
+  def writable(self) -> bool:
+    return True
+
+  def write(self, text: str) -> int:
+    _send_stream(self._sock, self._name, text)
+    return len(text)
+
+
+def _run_request(sock: socket.socket, argv: List[str], cwd: str, env: Dict[str, str]) -> int:
+  """Run cli.main(argv) as the client would have, streaming its output to sock; returns the exit status."""
+  import contextlib
+  from .cli import main
+
+  out, err = _SocketWriter(sock, "stdout"), _SocketWriter(sock, "stderr")
+  old_cwd, old_env = os.getcwd(), dict(os.environ)
+  code = 0
+  try:
+    os.chdir(cwd)
+    os.environ.clear(); os.environ.update(env)
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+      try:
+        main(argv)
+      except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if e.code is not None and not isinstance(e.code, int):
+          err.write(f"{e.code}\n")
+      except ConnectionError:
+        raise  # the client went away: nothing left to report to
+      except Exception as e:  # keep the daemon alive on unexpected errors
+        err.write(f"ERROR: {type(e).__name__}: {e}\n")
+        code = 1
+  finally:
+    os.environ.clear(); os.environ.update(old_env)
+    os.chdir(old_cwd)
+  return code
+
+
+def serve(socket_path: str) -> None:
+  """Serve render requests on socket_path until interrupted.
+
+  Requests are handled one at a time (each one switches cwd/env to the
+  client's), while Environments, compiled templates and parsed structured
+  documents stay warm between requests; files are re-read when their mtime
+  changes.
+  """
+  _require_unix_sockets()
+  import socketserver
+  from .structload import enable_document_cache
+  from .template_env import enable_environment_cache
+
+  enable_environment_cache()
+  enable_document_cache()
+
+  path = expand_path(socket_path)
+  if os.path.exists(path):
+    os.unlink(path)  # stale socket from a previous run
+
+  class Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+      line = self.rfile.readline()
+      if not line:
+        return
+      try:
+        req = json.loads(line.decode("utf-8"))
+        argv = [str(a) for a in req["argv"]]
+        for flag in _UNFORWARDABLE:
+          if _names_flag(argv, flag):
+            raise ValueError(f"{flag} cannot be forwarded to a running server")
+      except Exception as e:
+        _send(self.connection, {"stderr": f"ERROR: bad request: {e}\n"})
+        _send(self.connection, {"exit": 2})
+        return
+      try:
+        code = _run_request(self.connection, argv, req.get("cwd") or os.getcwd(), req.get("env") or dict(os.environ))
+        _send(self.connection, {"exit": code})
+      except ConnectionError:
+        pass  # the client disconnected mid-render
+
+  with socketserver.UnixStreamServer(path, Handler) as server:
+    sys.stderr.write(f"codex-assistant: serving on {path}\n")
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      if os.path.exists(path):
+        os.unlink(path)
+
+
+def run_client(socket_path: str, argv: List[str]) -> int:
+  """Send argv to a running server and stream its output back; returns the exit status."""
+  _require_unix_sockets()
+  path = expand_path(socket_path)
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(path)
+  except OSError as e:
+    die(f"Cannot connect to render server at {path}: {e}")
+  code = 1
+  with sock, sock.makefile("rb") as stream:
+    _send(sock, {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)})
+    for raw in stream:
+      msg = json.loads(raw.decode("utf-8"))
+      if "stdout" in msg:
+        sys.stdout.write(msg["stdout"])
+      elif "stderr" in msg:
+        sys.stderr.write(msg["stderr"])
+      elif "exit" in msg:
+        code = msg["exit"]
+        break
+  sys.stdout.flush()
+  return code
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Optional
+
+from .tree_index import glob_sorted
+from .utils import Dependencies, die, file_stamp, record_file, record_glob, track_dependencies
+
+# Bump when the snapshot layout or the context-building rules change.
+SNAPSHOT_FORMAT = 1
+
+# File layout: magic, header length (8 bytes, little-endian), marshalled header
+# (format, key, manifest), then one tag byte and the context payload. The
+# header is read on its own, so a stale snapshot is rejected without decoding
+# the context.
+#
+# Unlike the shared document cache (marshal only, see structload), a snapshot
+# falls back to pickle for values marshal cannot store (lazy file values, YAML
+# dates). Loading a pickled snapshot can run code, so a snapshot is trusted
+# like a script: --load-context only files this user wrote with --save-context.
+_MAGIC = b"CXCTX"
+_TAG_MARSHAL, _TAG_PICKLE = b"M", b"P"
+
+# Namespace attributes (and environment settings) that change the context the
+# flags build; a snapshot made with other values is never reused.
+_KEY_ATTRS = (
+  "load", "load_into", "set", "set_json", "set_json_file", "set_file",
+  "add", "add_file", "set_index", "set_file_index", "merge_strategy",
+  "exclude", "_exclude_base", "respect_ignore", "no_ignore", "_load_optional", "_load_into_optional",
+)
+_KEY_ENV = ("CODEX_LAZY_FILES", "CODEX_STREAM_LOADS", "CODEX_DENSE_LIST_GAP", "CODEX_LIST_INDEX_LIMIT")
+
+
+def snapshot_key(args: Any) -> str:
+  """Digest of everything besides input files that shapes the context built from args."""
+  import hashlib
+  import json
+  import sys
+  parts = {
+    "format": SNAPSHOT_FORMAT,
+    "python": list(sys.version_info[:2]),
+    "cwd": os.getcwd(),
+    "args": {name: getattr(args, name, None) for name in _KEY_ATTRS},
+    "env": {name: os.getenv(name) or "" for name in _KEY_ENV},
+  }
+  return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _manifest(deps: Dependencies) -> Dict[str, Any]:
+  return {
+    "files": {p: file_stamp(p) for p in sorted(deps.files)},
+    "globs": {g: glob_sorted(g) for g in sorted(deps.globs)},
+  }
+
+
+def _manifest_unchanged(manifest: Dict[str, Any]) -> bool:
+  for path, stamp in manifest["files"].items():
+    if file_stamp(path) != stamp:
+      return False
+  # Globs are matched like the run matches them (tree_index: --exclude and
+  # ignore files prune the walk), through the run's shared listings.
+  for pattern, matches in manifest["globs"].items():
+    if glob_sorted(pattern) != matches:
+      return False
+  return True
+
+
+def load_snapshot(path: str, key: str) -> Optional[Any]:
+  """The context stored in the snapshot at path, or None when it is missing,
+  unreadable, made from other flags or any input changed since.
+
+  A pickled context is unpickled, so only load snapshots from a trusted source.
+  """
+  try:
+    with open(path, "rb") as f:
+      if f.read(len(_MAGIC)) != _MAGIC:
+        return None
+      import marshal
+      size = int.from_bytes(f.read(8), "little")
+      fmt, saved_key, manifest = marshal.loads(f.read(size))
+      if fmt != SNAPSHOT_FORMAT or saved_key != key or not _manifest_unchanged(manifest):
+        return None
+      tag, body = f.read(1), f.read()
+    if tag == _TAG_MARSHAL:
+      ctx = marshal.loads(body)
+    elif tag == _TAG_PICKLE:
+      import pickle
+      ctx = pickle.loads(body)
+    else:
+      return None
+  except Exception:
+    return None
+  # Inputs are unchanged, so they are what this run depends on (--watch, pipelines).
+  for p in manifest["files"]:
+    record_file(p)
+  for g in manifest["globs"]:
+    record_glob(g)
+  return ctx
+
+
+def save_snapshot(path: str, key: str, deps: Dependencies, ctx: Any) -> None:
+  """Write ctx with the manifest of deps (marshal when the values allow it,
+  pickle otherwise, e.g. lazy file values or YAML dates)."""
+  import marshal
+  import tempfile
+  header = marshal.dumps((SNAPSHOT_FORMAT, key, _manifest(deps)))
+  try:
+    body = _TAG_MARSHAL + marshal.dumps(ctx)
+  except ValueError:
+    import pickle
+    try:
+      body = _TAG_PICKLE + pickle.dumps(ctx, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+      die(f"Cannot snapshot the context: {e}")
+  target = os.path.abspath(path)
+  try:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+      f.write(_MAGIC + len(header).to_bytes(8, "little") + header + body)
+    os.replace(tmp, target)
+  except OSError as e:
+    die(f"Cannot write context snapshot '{path}': {e}")
+
+
+def snapshot_context(args: Any, build: Callable[[], Any], *, load_path: Optional[str] = None,
+                     save_path: Optional[str] = None) -> Any:
+  """build() the context, or reuse the snapshot at load_path while its inputs are unchanged.
+
+  A freshly built context is written to save_path, or back to load_path when
+  that snapshot was stale, so the next run can reuse it.
+  """
+  key = snapshot_key(args)
+  if load_path:
+    ctx = load_snapshot(load_path, key)
+    if ctx is not None:
+      return ctx
+  deps = Dependencies()
+  with track_dependencies(deps):
+    ctx = build()
+  # Hand the inputs on to an enclosing tracker as well.
+  for p in deps.files:
+    record_file(p)
+  for g in deps.globs:
+    record_glob(g)
+  save_snapshot(save_path or load_path, key, deps, ctx)  # type: ignore[arg-type]
+  return ctx
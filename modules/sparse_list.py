@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+from collections.abc import MutableSequence
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# An index assignment that would pad a list with more than this many None
+# slots turns it into a SparseList (--dense-list-gap / CODEX_DENSE_LIST_GAP;
+# -1 always pads, like older versions).
+DEFAULT_DENSE_LIST_GAP = 65536
+
+
+class SparseList(MutableSequence):
+  """A list that stores only its assigned slots; the others read as None.
+
+  Made by context_ops when KEY[n] / KEY:n assignments land far past the end
+  of a list, so `--set-index ITEMS:50000000=x` costs one entry instead of
+  hundreds of MB of padding. It behaves like the padded list would: len(),
+  indexing, slicing and iteration are dense (gaps yield None), and append()
+  / extend() continue after the last slot. Templates can loop over it as
+  usual; tojson / to_nice_yaml write the dense list.
+  """
+
+  __slots__ = ("_items", "_len")
+
+  def __init__(self, values: Iterable[Any] = ()) -> None:
+    # None slots (padding from a list that was dense so far) are left unstored.
+    self._items: Dict[int, Any] = {}
+    self._len = 0
+    for i, value in enumerate(values):
+      if value is not None:
+        self._items[i] = value
+      self._len = i + 1
+
+  def _index(self, i: int) -> int:
+    if i < 0:
+      i += self._len
+    if not 0 <= i < self._len:
+      raise IndexError("list index out of range")
+    return i
+
+  def __len__(self) -> int:
+    return self._len
+
+  def __getitem__(self, i: Any) -> Any:
+    if isinstance(i, slice):
+      get = self._items.get
+      return [get(j) for j in range(*i.indices(self._len))]
+    return self._items.get(self._index(i))
+
+  def __setitem__(self, i: Any, value: Any) -> None:
+    if isinstance(i, slice):
+      raise TypeError("SparseList does not support slice assignment")
+    self._items[self._index(i)] = value
+
+  def __delitem__(self, i: Any) -> None:
+    if isinstance(i, slice):
+      raise TypeError("SparseList does not support slice deletion")
+    i = self._index(i)
+    self._items = {(j - 1 if j > i else j): v for j, v in self._items.items() if j != i}
+    self._len -= 1
+
+  def insert(self, i: int, value: Any) -> None:
+    i = max(0, min(i + self._len if i < 0 else i, self._len))
+    self._items = {(j + 1 if j >= i else j): v for j, v in self._items.items()}
+    self._items[i] = value
+    self._len += 1
+
+  def append(self, value: Any) -> None:
+    self._items[self._len] = value
+    self._len += 1
+
+  def set_at(self, i: int, value: Any) -> None:
+    """self[i] = value, growing the list (with unstored None slots) when i is past the end."""
+    if i >= self._len:
+      self._len = i + 1
+    self[i] = value
+
+  def __iter__(self) -> Iterator[Any]:
+    get = self._items.get
+    for i in range(self._len):
+      yield get(i)
+
+  def __eq__(self, other: Any) -> bool:
+    if isinstance(other, SparseList):
+      return self._len == other._len and {i: v for i, v in self._items.items() if v is not None} == \
+        {i: v for i, v in other._items.items() if v is not None}
+    if isinstance(other, list):
+      return self._len == len(other) and all(a == b for a, b in zip(self, other))
+    return NotImplemented
+
+  def __repr__(self) -> str:
+    return f"SparseList(length={self._len}, items={dict(sorted(self._items.items()))!r})"
+
+  def clear(self) -> None:
+    self._items, self._len = {}, 0
+
+  def copy(self) -> "SparseList":
+    out = SparseList()
+    out._items, out._len = dict(self._items), self._len
+    return out
+
+  def assigned(self) -> Dict[int, Any]:
+    """The stored slots, by index."""
+    return dict(sorted(self._items.items()))
+
+
+def is_list(value: Any) -> bool:
+  """Whether value is a context list (a list or a SparseList)."""
+  return isinstance(value, (list, SparseList))
+
+
+def _int_env(name: str) -> Optional[int]:
+  try:
+    raw = os.getenv(name)
+    return int(raw) if raw else None
+  except ValueError:
+    return None
+
+
+def dense_list_gap() -> int:
+  """Most None slots an index assignment may pad before the list goes sparse (-1: no limit)."""
+  gap = _int_env("CODEX_DENSE_LIST_GAP")
+  return DEFAULT_DENSE_LIST_GAP if gap is None else gap
+
+
+def list_index_limit() -> Optional[int]:
+  """Highest index KEY[n] / KEY:n may assign (--list-index-limit), or None for no limit."""
+  return _int_env("CODEX_LIST_INDEX_LIMIT")
+
+
+def set_index(lst: Any, index: int, value: Any, gap: Optional[int] = None) -> Any:
+  """lst[index] = value, padding like `lst.extend([None] * ...)` did.
+
+  Returns the list holding the value: lst itself, or a new SparseList with
+  lst's items when the padding would exceed `gap` (default: dense_list_gap()).
+  The caller stores a new list in place of the old one.
+  """
+  n = len(lst)
+  if index < n:
+    lst[index] = value
+    return lst
+  if isinstance(lst, SparseList):
+    lst.set_at(index, value)
+    return lst
+  if gap is None:
+    gap = dense_list_gap()
+  if gap < 0 or index - n <= gap:
+    lst.extend([None] * (index - n))
+    lst.append(value)
+    return lst
+  sparse = SparseList(lst)
+  sparse.set_at(index, value)
+  return sparse
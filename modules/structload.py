@@ -1,65 +1,155 @@
 from __future__ import annotations
 
 import glob
-import json
 import os
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .utils import die, expand_path, read_text_file
+from .file_cache import read_many, read_text
+from .lazy_values import LazyJoin, lazy_file, lazy_files, lazy_files_enabled
+from .parsers import _require_yaml, json_loads, yaml_backend, yaml_iter, yaml_load_all
+from .tree_index import glob_sorted
+from .utils import cache_dir, die, env_flag, expand_path, file_stamp, read_text_file, read_text_files, record_file, record_glob
 
 
 def _parse_json(text: str) -> Any:
   try:
-    return json.loads(text)
+    return json_loads(text)
   except Exception as e:
     die(f"Invalid JSON: {e}")
   return None  # unreachable
 
 
+def _parse_json_lines(lines: Iterable[Any], where: str = "") -> Iterator[Any]:
+  """One JSON document per non-blank line (JSON Lines / NDJSON)."""
+  for n, line in enumerate(lines, 1):
+    if isinstance(line, bytes):
+      line = line.decode("utf-8")
+    if not line.strip():
+      continue
+    try:
+      yield json_loads(line)
+    except Exception as e:
+      die(f"Invalid JSON{where} on line {n}: {e}")
+
+
 def _parse_yaml(text: str) -> List[Any]:
+  _require_yaml()
   try:
-    import yaml  # type: ignore
-  except Exception:
-    die("YAML support requires PyYAML. Install with: pip install PyYAML")
-  try:
-    docs = list(yaml.safe_load_all(text))  # type: ignore[attr-defined]
+    docs = yaml_load_all(text)
   except Exception as e:
     die(f"Invalid YAML: {e}")
   return docs
 
 
-def _read_file_text_resolve(base_dir: Path, path_str: str) -> str:
+def _resolve_file(base_dir: Path, path_str: str) -> str:
   p = Path(expand_path(path_str))
   if not p.is_absolute():
     p = (base_dir / p).resolve()
-  return read_text_file(str(p))
+  return str(p)
+
+
+def _read_file_text_resolve(base_dir: Path, path_str: str) -> str:
+  return read_text_file(_resolve_file(base_dir, path_str))
 
 
 def _glob_matches_resolve(base_dir: Path, pattern: str) -> List[Path]:
   pat = expand_path(pattern)
   if not os.path.isabs(pat):
     pat = str((base_dir / pat).resolve())
-  matches = sorted(glob.glob(pat, recursive=True))
+  record_glob(pat)
+  matches = glob_sorted(pat)
   return [Path(m) for m in matches]
 
 
+# Parsed (pre-macro) documents of every file loaded this run, by real path ->
+# ((mtime_ns, size), docs), so a file reached through several $load paths is
+# parsed once. See reset_load_memo().
+_LOAD_MEMO: Dict[str, Tuple[Any, List[Any]]] = {}
+
+# Files whose documents are being expanded right now (an ordered set), for $load cycle detection.
+_EXPANDING: Dict[str, None] = {}
+
+
+def reset_load_memo() -> None:
+  """Start a new run: files loaded from now on are parsed again (once)."""
+  _LOAD_MEMO.clear()
+
+
+def _memo_documents(p: Path, docs: Optional[List[Any]] = None) -> List[Any]:
+  """Parsed documents of p from this run's memo (docs, when given, were just parsed)."""
+  key, stamp = os.path.realpath(p), file_stamp(str(p))
+  hit = _LOAD_MEMO.get(key)
+  if hit is not None and hit[0] == stamp:
+    return hit[1]
+  if docs is None:
+    docs = _parse_structured_file(p)
+  _LOAD_MEMO[key] = (stamp, docs)
+  return docs
+
+
+def _expand_documents(p: Path, docs: List[Any]) -> List[Any]:
+  """Apply macros to the documents of file p, failing on a $load cycle back to p."""
+  key = os.path.realpath(p)
+  if key in _EXPANDING:
+    chain = list(_EXPANDING)
+    die("$load cycle: " + " -> ".join(chain[chain.index(key):] + [key]))
+  _EXPANDING[key] = None
+  try:
+    return [_apply_macros(doc, p.parent) for doc in docs]
+  finally:
+    del _EXPANDING[key]
+
+
+def _load_nested(p: Path) -> List[Any]:
+  record_file(p)
+  if not p.is_file():
+    die(f"$load file not found: {p}")
+  return _expand_documents(p, _memo_documents(p))
+
+
 def _apply_macros(node: Any, base_dir: Path) -> Any:
-  """Recursively apply $file/$files/$glob/$glob_one (and optional $join)."""
+  """Recursively apply $file/$files/$glob/$glob_one (and optional $join) and $load/$load_glob.
+
+  With --lazy-files the files are found (and missing ones reported) now but
+  read on first use; see lazy_values. $load targets are parsed once per run
+  and expanded relative to their own directory.
+  """
   if isinstance(node, dict):
     keys = set(node.keys())
+    lazy = lazy_files_enabled()
+
+    if "$load" in keys:
+      path = node["$load"]
+      if not isinstance(path, str):
+        die("$load expects a string path")
+      docs = _load_nested(Path(_resolve_file(base_dir, path)))
+      return docs[0] if len(docs) == 1 else docs
+
+    if "$load_glob" in keys:
+      pattern = node["$load_glob"]
+      if not isinstance(pattern, str):
+        die("$load_glob expects a string pattern")
+      out: List[Any] = []
+      for m in _glob_matches_resolve(base_dir, pattern):
+        out.extend(_load_nested(m))
+      return out
 
     if "$file" in keys:
       path = node["$file"]
       if not isinstance(path, str):
         die("$file expects a string path")
+      if lazy:
+        return lazy_file(_resolve_file(base_dir, path))
       return _read_file_text_resolve(base_dir, path)
 
     if "$files" in keys:
       arr = node["$files"]
       if not isinstance(arr, list):
         die("$files expects a list of paths")
-      return [_read_file_text_resolve(base_dir, p) for p in arr]
+      if lazy:
+        return lazy_files([_resolve_file(base_dir, p) for p in arr])
+      return read_text_files([_resolve_file(base_dir, p) for p in arr])
 
     if "$glob_one" in keys:
       pattern = node["$glob_one"]
@@ -70,18 +160,24 @@ def _apply_macros(node: Any, base_dir: Path) -> Any:
         die(f"$glob_one found no matches for: {pattern}")
       if len(matches) > 1:
         die(f"$glob_one expected exactly 1 match, found {len(matches)} for: {pattern}")
-      return matches[0].read_text(encoding="utf-8")
+      if lazy:
+        return lazy_file(matches[0])
+      record_file(matches[0])
+      return read_text(matches[0])
 
     if "$glob" in keys:
       pattern = node["$glob"]
       if not isinstance(pattern, str):
         die("$glob expects a string pattern")
       matches = _glob_matches_resolve(base_dir, pattern)
-      texts = [m.read_text(encoding="utf-8") for m in matches]
+      sep = node.get("$join")
+      if "$join" in keys and not isinstance(sep, str):
+        die("$join expects a string separator")
+      if lazy:
+        refs = lazy_files(matches)
+        return LazyJoin([r.path for r in refs], sep) if "$join" in keys else refs
+      texts = read_text_files([str(m) for m in matches])
       if "$join" in keys:
-        sep = node["$join"]
-        if not isinstance(sep, str):
-          die("$join expects a string separator")
         return sep.join(texts)
       return texts
 
@@ -94,27 +190,254 @@ def _apply_macros(node: Any, base_dir: Path) -> Any:
   return node
 
 
-def load_structured_file(path_str: str) -> List[Any]:
-  """Load a .json/.yaml/.yml file and return a list of documents (1 for JSON)."""
-  p = Path(expand_path(path_str))
-  if not p.exists():
-    die(f"Structured file not found: {p}")
-  text = p.read_text(encoding="utf-8")
-  suffix = p.suffix.lower()
+# Parsed (pre-macro) documents keyed by resolved path -> ((mtime_ns, size), docs), across runs.
+# None until a long-lived caller opts in via enable_document_cache().
+_DOC_CACHE: Optional[Dict[str, Tuple[Tuple[int, int], List[Any]]]] = None
 
-  if suffix == ".json":
-    docs = [_parse_json(text)]
-  elif suffix in (".yaml", ".yml"):
-    docs = _parse_yaml(text)
+
+def enable_document_cache() -> None:
+  """Keep parsed documents in memory, re-parsing a file only when its mtime/size change.
+
+  Macros are still expanded on every load, so $file/$glob targets stay fresh.
+  """
+  global _DOC_CACHE
+  if _DOC_CACHE is None:
+    _DOC_CACHE = {}
+
+
+# Bump when the parsing rules change; part of every on-disk cache key.
+DOC_CACHE_FORMAT = 2
+
+# On-disk entry layout: one tag byte, then the marshalled payload. Only
+# marshal is used: unlike pickle, loading a file from the cache directory
+# cannot run code. Documents marshal cannot store (e.g. YAML dates) are not
+# cached.
+_TAG_MARSHAL = b"M"
+
+# Entries kept on disk; the least recently written are removed beyond this.
+DOC_CACHE_MAX_ENTRIES = 1024
+
+# Entries tolerated beyond DOC_CACHE_MAX_ENTRIES before pruning, so a full
+# cache directory is listed once per this many writes rather than on each one.
+DOC_CACHE_PRUNE_MARGIN = 128
+
+# Entries per cache directory as of its last listing, plus the writes since
+# (an overestimate: rewriting an entry counts too). See _note_disk_write().
+_DISK_CACHE_COUNTS: Dict[str, int] = {}
+
+# Only YAML is worth caching: the C JSON parser is as fast as reading an entry back.
+_DISK_CACHE_SUFFIXES = (".yaml", ".yml")
+
+
+def document_cache_dir() -> Path:
+  return cache_dir() / "documents"
+
+
+def _parser_version() -> str:
+  import sys
+  try:
+    import yaml  # type: ignore
+    yaml_version = getattr(yaml, "__version__", "?")
+  except Exception:
+    yaml_version = "none"
+  return f"{DOC_CACHE_FORMAT}/py{sys.version_info[0]}.{sys.version_info[1]}/yaml-{yaml_version}-{yaml_backend()[0]}"
+
+
+def _disk_entry(key: str) -> Path:
+  import hashlib
+  return document_cache_dir() / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".docs")
+
+
+def _read_disk_cache(key: str, stamp: Tuple[int, int]) -> Optional[List[Any]]:
+  """Parsed documents from the on-disk cache, or None on a miss/stale/corrupt entry."""
+  try:
+    with open(_disk_entry(key), "rb") as f:
+      data = f.read()
+  except OSError:
+    return None
+  if data[:1] != _TAG_MARSHAL:
+    return None
+  try:
+    import marshal
+    path, mtime_ns, size, version, docs = marshal.loads(data[1:])
+  except Exception:
+    return None
+  if (path, mtime_ns, size, version) != (key, stamp[0], stamp[1], _parser_version()):
+    return None
+  return docs
+
+
+def _write_disk_cache(key: str, stamp: Tuple[int, int], docs: List[Any]) -> None:
+  """Store docs when marshal can hold their values, then prune old entries."""
+  import marshal
+  import tempfile
+  try:
+    data = _TAG_MARSHAL + marshal.dumps((key, stamp[0], stamp[1], _parser_version(), docs))
+  except ValueError:
+    return  # e.g. YAML dates: parsed again next time
+  target = _disk_entry(key)
+  try:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(target.parent), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+      f.write(data)
+    os.replace(tmp, target)
+  except OSError:
+    return  # unwritable cache location: just parse next time
+  _note_disk_write(target.parent)
+
+
+def _note_disk_write(directory: Path) -> None:
+  # The first write of the process lists the directory; later ones only count,
+  # until the count runs DOC_CACHE_PRUNE_MARGIN past the limit.
+  key = str(directory)
+  count = _DISK_CACHE_COUNTS.get(key)
+  if count is None or count + 1 > DOC_CACHE_MAX_ENTRIES + DOC_CACHE_PRUNE_MARGIN:
+    count = _prune_disk_cache(directory)
   else:
-    # Fallback heuristic: try JSON then YAML
+    count += 1
+  _DISK_CACHE_COUNTS[key] = count
+
+
+def _prune_disk_cache(directory: Path, max_entries: Optional[int] = None) -> int:
+  """Remove the least recently written entries beyond max_entries (default
+  DOC_CACHE_MAX_ENTRIES); returns the number of entries left."""
+  limit = DOC_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+  try:
+    entries = [e for e in os.scandir(directory) if e.name.endswith(".docs")]
+  except OSError:
+    return 0
+  if len(entries) <= limit:
+    return len(entries)
+  def mtime(e: "os.DirEntry[str]") -> int:
+    try:
+      return e.stat().st_mtime_ns
+    except OSError:
+      return 0
+  entries.sort(key=mtime)
+  for e in entries[:len(entries) - limit]:
     try:
-      docs = [_parse_json(text)]
-    except SystemExit:
-      docs = _parse_yaml(text)
+      os.unlink(e.path)
+    except OSError:
+      pass
+  return limit
+
+
+# A cache lookup: (resolved path, (mtime_ns, size), cached docs or None); key is None
+# when no cache is in use.
+_Lookup = Tuple[Optional[str], Optional[Tuple[int, int]], Optional[List[Any]]]
+
+
+def _cached_documents(p: Path) -> _Lookup:
+  """Look p up in the in-memory and on-disk document caches.
+
+  The on-disk cache (CODEX_DOC_CACHE=0 disables it) only holds .yaml/.yml
+  files; it is not even looked at for others. Entries are keyed by resolved
+  path, mtime, size and parser version.
+  """
+  use_disk = _disk_cacheable(p)
+  if _DOC_CACHE is None and not use_disk:
+    return None, None, None
+  st = p.stat()
+  key, stamp = str(p.resolve()), (st.st_mtime_ns, st.st_size)
+  if _DOC_CACHE is not None:
+    hit = _DOC_CACHE.get(key)
+    if hit is not None and hit[0] == stamp:
+      return key, stamp, hit[1]
+  docs = _read_disk_cache(key, stamp) if use_disk else None
+  if docs is not None and _DOC_CACHE is not None:
+    _DOC_CACHE[key] = (stamp, docs)
+  return key, stamp, docs
+
+
+def _disk_cacheable(p: Path) -> bool:
+  return p.suffix.lower() in _DISK_CACHE_SUFFIXES and env_flag("CODEX_DOC_CACHE")
+
+
+def _store_documents(lookup: _Lookup, docs: List[Any], was_yaml: bool) -> None:
+  key, stamp, _ = lookup
+  if key is None or stamp is None:
+    return
+  if was_yaml and _disk_cacheable(Path(key)):
+    _write_disk_cache(key, stamp, docs)
+  if _DOC_CACHE is not None:
+    _DOC_CACHE[key] = (stamp, docs)
+
+
+def _parse_structured_file(p: Path) -> List[Any]:
+  """Parsed (pre-macro) documents of p, via the document caches."""
+  lookup = _cached_documents(p)
+  if lookup[2] is not None:
+    return lookup[2]
+  docs, was_yaml = _parse_structured_text(p)
+  _store_documents(lookup, docs, was_yaml)
+  return docs
+
+
+def parse_processes() -> int:
+  """Worker processes for parsing multi-file loads (--parse-processes; 0/1 = in-process)."""
+  try:
+    return int(os.getenv("CODEX_PARSE_PROCESSES") or 0)
+  except ValueError:
+    return 0
+
+
+def _parse_in_worker(item: Tuple[str, str]) -> Tuple[List[Any], bool]:
+  return _parse_text(item[1], Path(item[0]).suffix.lower())
+
+
+def _parse_structured_files(paths: List[Path]) -> List[List[Any]]:
+  """_parse_structured_file() of every path, in order, reading them concurrently.
+
+  Reads overlap on the I/O thread pool (see file_cache.read_many). Neither
+  PyYAML (C or Python) nor the JSON parsers release the GIL, so parsing only
+  runs in parallel with --parse-processes; cache hits never leave this process.
+  """
+  read_many(paths)  # warm the file cache; errors resurface when each file is parsed
+  procs = parse_processes()
+  if procs <= 1 or len(paths) < 2:
+    return [_parse_structured_file(p) for p in paths]
+
+  lookups = [_cached_documents(p) for p in paths]
+  todo = [i for i, lk in enumerate(lookups) if lk[2] is None]
+  results: List[Optional[List[Any]]] = [lk[2] for lk in lookups]
+  if todo:
+    from concurrent.futures import ProcessPoolExecutor
+    items = [(str(paths[i]), read_text(paths[i])) for i in todo]
+    with ProcessPoolExecutor(max_workers=min(procs, len(todo))) as pool:
+      parsed = list(pool.map(_parse_in_worker, items))
+    for i, (docs, was_yaml) in zip(todo, parsed):
+      _store_documents(lookups[i], docs, was_yaml)
+      results[i] = docs
+  return results  # type: ignore[return-value]
+
+
+def _parse_structured_text(p: Path) -> Tuple[List[Any], bool]:
+  """Parse p; returns (documents, whether YAML was used)."""
+  return _parse_text(read_text(p), p.suffix.lower())
+
+
+def _parse_text(text: str, suffix: str) -> Tuple[List[Any], bool]:
+  if suffix in JSON_LINES_SUFFIXES:
+    return list(_parse_json_lines(text.splitlines())), False
+  if suffix == ".json":
+    return [_parse_json(text)], False
+  if suffix in (".yaml", ".yml"):
+    return _parse_yaml(text), True
+  # Fallback heuristic: try JSON then YAML
+  try:
+    return [_parse_json(text)], False
+  except SystemExit:
+    return _parse_yaml(text), True
+
 
-  base_dir = p.parent
-  return [_apply_macros(doc, base_dir) for doc in docs]
+def load_structured_file(path_str: str) -> List[Any]:
+  """Load a .json/.yaml/.yml/.jsonl file and return a list of documents (1 for JSON)."""
+  p = Path(expand_path(path_str))
+  record_file(p)
+  if not p.exists():
+    die(f"Structured file not found: {p}")
+  return _expand_documents(p, _memo_documents(p))
 
 
 def load_structured_glob(pattern: str, *, optional: bool = False) -> List[Any]:
@@ -135,20 +458,120 @@ def load_structured_glob(pattern: str, *, optional: bool = False) -> List[Any]:
   has_magic = glob.has_magic(pat)
 
   if has_magic:
-    matches = sorted(glob.glob(pat, recursive=True))
+    record_glob(pat)
+    matches = glob_sorted(pat)
     if not matches:
       if optional:
         return []
       die(f"Structured file not found: {pat}")
+    paths = [Path(m) for m in matches]
+    for p in paths:
+      record_file(p)
+    todo = [p for p in paths if os.path.realpath(p) not in _LOAD_MEMO]
+    for p, docs in zip(todo, _parse_structured_files(todo)):
+      _memo_documents(p, docs)
     out: List[Any] = []
-    for m in matches:
-      out.extend(load_structured_file(m))
+    for p in paths:
+      out.extend(_expand_documents(p, _memo_documents(p)))
     return out
 
   # Single file path
   p = Path(pat)
+  record_file(p)
   if not p.exists():
     if optional:
       return []
     die(f"Structured file not found: {p}")
   return load_structured_file(pat)
+
+
+# Files with one JSON document per line; --load-into always binds them as a DocumentStream.
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def stream_loads_enabled() -> bool:
+  """--stream-loads (or CODEX_STREAM_LOADS=1): --load-into binds every match set as a DocumentStream."""
+  return env_flag("CODEX_STREAM_LOADS", default=False)
+
+
+def _iter_documents(p: Path) -> Iterator[Any]:
+  """Parsed (pre-macro) documents of p, read from the open file as they are consumed."""
+  suffix = p.suffix.lower()
+  if suffix == ".json":
+    yield _parse_json(read_text(p))
+    return
+  if suffix in JSON_LINES_SUFFIXES:
+    with open(p, "rb") as fh:
+      yield from _parse_json_lines(fh, f" in {p}")
+    return
+  with open(p, "r", encoding="utf-8") as fh:
+    docs = yaml_iter(fh)
+    while True:
+      try:
+        doc = next(docs)
+      except StopIteration:
+        return
+      except Exception as e:
+        die(f"Invalid YAML in {p}: {e}")
+      yield doc
+
+
+class DocumentStream:
+  """The documents of one or more structured files, parsed while being iterated.
+
+  Bound by --load-into for JSON Lines files (and for everything with
+  --stream-loads), so a template `for` loop over a large export keeps only
+  the current record in memory. Each iteration re-opens the files; nothing is
+  cached. Use `|list` where random access or a length is needed.
+  """
+
+  __slots__ = ("paths",)
+
+  def __init__(self, paths: Sequence[Any]) -> None:
+    self.paths = [str(p) for p in paths]
+
+  def __iter__(self) -> Iterator[Any]:
+    for path in self.paths:
+      p = Path(path)
+      record_file(p)
+      for doc in _iter_documents(p):
+        yield _expand_documents(p, [doc])[0]
+
+  def describe(self) -> str:
+    return f"documents of {', '.join(self.paths)}"
+
+  def __repr__(self) -> str:
+    return f"<{self.describe()}>"
+
+  # Immutable (it only names files), so copies share it; pickles carry the paths.
+  def __copy__(self) -> "DocumentStream":
+    return self
+
+  def __deepcopy__(self, memo: Dict[int, Any]) -> "DocumentStream":
+    return self
+
+  def __reduce__(self):
+    return (DocumentStream, (self.paths,))
+
+
+def open_document_stream(pattern: str, *, optional: bool = False) -> Optional[DocumentStream]:
+  """A DocumentStream over the files pattern matches, or None when they are to be loaded eagerly.
+
+  Matches are found (and missing files reported) like load_structured_glob();
+  optional patterns without matches also give None, which then loads as [].
+  """
+  pat = expand_path(pattern)
+  if glob.has_magic(pat):
+    record_glob(pat)
+    matches = [Path(m) for m in glob_sorted(pat)]
+  else:
+    matches = [Path(pat)] if Path(pat).exists() else []
+  if not matches:
+    if optional:
+      return None
+    die(f"Structured file not found: {pat}")
+  if stream_loads_enabled() or all(m.suffix.lower() in JSON_LINES_SUFFIXES for m in matches):
+    for m in matches:
+      record_file(m)
+    return DocumentStream(matches)
+  return None
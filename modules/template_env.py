@@ -1,9 +1,13 @@
 from __future__ import annotations
 import os, glob, json
 from pathlib import Path
-from typing import Any, List, Sequence
-from .utils import ensure_jinja2, expand_path, die
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .utils import cache_dir, ensure_jinja2, env_flag, expand_path, die, read_text_files, record_file, record_glob
 from .jinja_filters import register_filters
+from .file_cache import read_text
+from .parsers import json_loads
+from .search_index import SearchIndex
+from .tree_index import glob_sorted
 
 def _dedupe_keep_order(items: Sequence[str]) -> List[str]:
   seen, out = set(), []
@@ -12,55 +16,166 @@ def _dedupe_keep_order(items: Sequence[str]) -> List[str]:
       seen.add(it); out.append(it)
   return out
 
-def _resolve_path_for_include(base_dirs: List[str], path_str: str) -> Path:
+def _resolve_path_for_include(base_dirs: List[str], path_str: str, index: Optional[SearchIndex] = None) -> Path:
+  if index is None:
+    index = SearchIndex(base_dirs)
   p = Path(expand_path(path_str))
-  if p.is_absolute() and p.exists(): return p
-  if p.exists(): return p
-  for base in base_dirs:
-    cand = Path(base) / path_str
-    if cand.exists(): return cand
+  if index.is_file(str(p)): record_file(p); return p
+  found = index.find(path_str)
+  if found is not None: record_file(found); return Path(found)
+  record_file(p)
   die(f"Include path not found: {path_str} (searched: {', '.join(base_dirs)})")
   return p
 
-def _make_include_helpers(base_dirs: List[str]):
+def _make_include_helpers(base_dirs: List[str], index: Optional[SearchIndex] = None):
+  if index is None:
+    index = SearchIndex(base_dirs)
   def include_text(path: str) -> str:
-    return _resolve_path_for_include(base_dirs, path).read_text(encoding="utf-8")
+    return read_text(_resolve_path_for_include(base_dirs, path, index))
   def read_file(path: str) -> str: return include_text(path)
   def include_text_glob(pattern: str, sep: str = "\n") -> str:
     pat = expand_path(pattern)
-    matches = sorted(glob.glob(pat, recursive=True))
+    record_glob(pat)
+    matches = glob_sorted(pat)
     if not matches:
       for base in base_dirs:
-        matches = sorted(glob.glob(str(Path(base) / pattern), recursive=True))
+        record_glob(str(Path(base) / pattern))
+        matches = glob_sorted(str(Path(base) / pattern))
         if matches: break
     if not matches: die(f"include_text_glob found no matches for pattern: {pattern}")
-    return sep.join(Path(m).read_text(encoding="utf-8") for m in matches)
+    for m in matches: record_file(m)
+    return sep.join(read_text_files(matches))
   def glob_paths(pattern: str) -> List[str]:
     pat = expand_path(pattern)
-    matches = sorted(glob.glob(pat, recursive=True))
+    record_glob(pat)
+    matches = glob_sorted(pat)
     if not matches:
       all_matches: List[str] = []
       for base in base_dirs:
-        all_matches.extend(glob.glob(str(Path(base) / pattern), recursive=True))
+        record_glob(str(Path(base) / pattern))
+        all_matches.extend(glob_sorted(str(Path(base) / pattern)))
       matches = sorted(set(all_matches))
     return matches
   def read_json(path: str) -> Any:
-    p = _resolve_path_for_include(base_dirs, path)
-    try: return json.loads(p.read_text(encoding="utf-8"))
+    p = _resolve_path_for_include(base_dirs, path, index)
+    try: return json_loads(read_text(p))
     except Exception as e: die(f"Failed to parse JSON include '{path}': {e}")
     return None
   return include_text, read_file, include_text_glob, glob_paths, read_json
 
-def render_template(template_path: Path, context: dict, extra_search: List[str]) -> str:
+def template_search_paths(template_path: Path, extra_search: List[str]) -> List[str]:
+  base_dir = str(template_path.parent.resolve())
+  return _dedupe_keep_order([base_dir] + [str(Path(p).resolve()) for p in extra_search] + [os.getcwd()])
+
+# One bytecode cache object per directory (they are stateless apart from the path).
+_BYTECODE_CACHES: Dict[str, Any] = {}
+
+def template_cache_dir() -> Path:
+  import jinja2  # type: ignore
+  return cache_dir() / f"jinja2-{jinja2.__version__}"
+
+def bytecode_cache():
+  """On-disk Jinja bytecode cache, or None when disabled (CODEX_TEMPLATE_CACHE=0).
+
+  Buckets are keyed by template name and path under a directory per Jinja
+  version; Jinja itself rejects a bucket whose source checksum or Python
+  bytecode magic no longer matches, and writes buckets via an atomic rename,
+  so concurrent invocations can share the directory.
+  """
+  if not env_flag("CODEX_TEMPLATE_CACHE"):
+    return None
+  from jinja2 import FileSystemBytecodeCache
+  directory = str(template_cache_dir())
+  bcc = _BYTECODE_CACHES.get(directory)
+  if bcc is None:
+    try:
+      os.makedirs(directory, exist_ok=True)
+    except OSError:
+      return None  # unwritable cache location: just compile in memory
+    bcc = _BYTECODE_CACHES[directory] = FileSystemBytecodeCache(directory, "%s.jinja.cache")
+  return bcc
+
+def clear_bytecode_cache() -> int:
+  """Delete the bytecode caches of every Jinja version; returns the number of files removed."""
+  import shutil
+  removed = 0
+  for d in glob.glob(str(cache_dir() / "jinja2-*")):
+    removed += sum(len(files) for _, _, files in os.walk(d))
+    shutil.rmtree(d, ignore_errors=True)
+  _BYTECODE_CACHES.clear()
+  return removed
+
+def build_environment(search_paths: List[str]):
+  """Create a Jinja2 Environment (filters + include helpers) over search_paths."""
   ensure_jinja2()
   import jinja2  # type: ignore
-  from jinja2 import FileSystemLoader, ChoiceLoader
-  base_dir = str(template_path.parent.resolve())
-  search_paths = _dedupe_keep_order([base_dir] + [str(Path(p).resolve()) for p in extra_search] + [os.getcwd()])
-  loader = ChoiceLoader([FileSystemLoader(search_paths)])
-  env = jinja2.Environment(loader=loader, autoescape=False, trim_blocks=True, lstrip_blocks=True)
+  from jinja2 import BaseLoader, ChoiceLoader, FileSystemLoader, TemplateNotFound
+  from jinja2.loaders import split_template_path
+  index = SearchIndex(search_paths)
+
+  class _IndexedLoader(BaseLoader):
+    # FileSystemLoader semantics over the shared SearchIndex; also reports each
+    # template/include it loads (for --watch).
+    def get_source(self, environment, template):
+      filename = index.find("/".join(split_template_path(template)))
+      if filename is None:
+        raise TemplateNotFound(template)
+      source = read_text(filename)
+      record_file(filename)
+      mtime = os.path.getmtime(filename)
+      def uptodate() -> bool:
+        try: return os.path.getmtime(filename) == mtime
+        except OSError: return False
+      return source, os.path.normpath(filename), uptodate
+
+    def list_templates(self):
+      return FileSystemLoader(search_paths).list_templates()
+
+  loaders: List[Any] = [_IndexedLoader()]
+  precompiled = os.getenv("CODEX_PRECOMPILED")
+  if precompiled:
+    from jinja2 import ModuleLoader
+
+    class _FreshModuleLoader(ModuleLoader):
+      # Ahead-of-time compiled templates (see --compile-templates), used only
+      # while the compiled module is newer than its source; a template edited
+      # since (or missing from the archive) falls through to _IndexedLoader.
+      def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._path = path
+
+      def _compiled_mtime(self, name: str) -> Optional[float]:
+        # Directory targets stamp each module; a .zip is written in one go.
+        path = self._path
+        if os.path.isdir(path):
+          path = os.path.join(path, self.get_module_filename(name))
+        try: return os.path.getmtime(path)
+        except OSError: return None
+
+      def load(self, environment, name, globals=None):
+        filename = index.find("/".join(split_template_path(name)))
+        compiled = self._compiled_mtime(name)
+        try: mtime = os.path.getmtime(filename) if filename is not None else None
+        except OSError: mtime = None
+        if compiled is None or mtime is None or mtime >= compiled:
+          raise TemplateNotFound(name)
+        template = super().load(environment, name, globals)
+        record_file(filename)
+        def uptodate() -> bool:
+          try: return os.path.getmtime(filename) == mtime
+          except OSError: return False
+        template._uptodate = uptodate
+        return template
+
+    loaders.insert(0, _FreshModuleLoader(expand_path(precompiled)))
+  loader = ChoiceLoader(loaders)
+  env = jinja2.Environment(loader=loader, autoescape=False, trim_blocks=True, lstrip_blocks=True,
+                           bytecode_cache=bytecode_cache())
   register_filters(env)
-  include_text, read_file, include_text_glob, glob_paths, read_json = _make_include_helpers(search_paths)
+  # tojson renders --lazy-files values as their text.
+  from .lazy_values import json_default
+  env.policies["json.dumps_kwargs"] = {"sort_keys": True, "default": json_default}
+  include_text, read_file, include_text_glob, glob_paths, read_json = _make_include_helpers(search_paths, index)
   env.globals.update({
     'include_text': include_text,
     'read_file': read_file,
@@ -68,6 +183,106 @@ def render_template(template_path: Path, context: dict, extra_search: List[str])
     'glob_paths': glob_paths,
     'read_json': read_json,
   })
+  env.search_index = index  # type: ignore[attr-defined]
+  return env
+
+# Environments keyed by environment_key(); None until a long-lived caller opts in.
+_ENV_CACHE: Optional[Dict[Tuple[Any, ...], Any]] = None
+
+def environment_key(search_paths: List[str]) -> Tuple[Any, ...]:
+  """Everything build_environment() reads: the search paths plus the settings
+  fixed when the Environment is built (--precompiled, and the bytecode cache
+  toggle and directory), so a changed setting gets its own Environment."""
+  precompiled = os.getenv("CODEX_PRECOMPILED")
+  bytecode_dir = str(cache_dir()) if env_flag("CODEX_TEMPLATE_CACHE") else None
+  return (tuple(search_paths), expand_path(precompiled) if precompiled else None, bytecode_dir)
+
+def enable_environment_cache() -> None:
+  """Reuse one Environment (and its compiled templates) per search-path set.
+
+  Jinja's loader re-checks template mtimes, so edits are still picked up,
+  and changing a setting the Environment was built with builds another one.
+  """
+  global _ENV_CACHE
+  if _ENV_CACHE is None:
+    _ENV_CACHE = {}
+
+def get_environment(search_paths: List[str]):
+  if _ENV_CACHE is None:
+    return build_environment(search_paths)
+  key = environment_key(search_paths)
+  env = _ENV_CACHE.get(key)
+  if env is None:
+    env = _ENV_CACHE[key] = build_environment(search_paths)
+  return env
+
+def _begin_render(env) -> None:
+  # Directory listings are revalidated (one mtime check each) once per render.
+  index = getattr(env, "search_index", None)
+  if index is not None:
+    index.begin_render()
+
+def render_template(template_path: Path, context: dict, extra_search: List[str], env=None) -> str:
+  """Render template_path with context.
+
+  Pass an env from build_environment() (built over the same search paths) to
+  reuse it, and its compiled templates, across renders.
+  """
+  if env is None:
+    env = get_environment(template_search_paths(template_path, extra_search))
+  _begin_render(env)
   template = env.get_template(template_path.name)
   return template.render(**context)
 
+def stream_template(template_path: Path, context: dict, extra_search: List[str], env=None) -> Iterator[str]:
+  """Like render_template(), but yield output chunks via Template.generate()."""
+  if env is None:
+    env = get_environment(template_search_paths(template_path, extra_search))
+  _begin_render(env)
+  template = env.get_template(template_path.name)
+  return template.generate(**context)
+
+# Largest amount of rendered text (in characters) held before it is written out.
+STREAM_BUFFER_CHARS = 64 * 1024
+
+def write_chunks(chunks: Iterable[str], fp: IO[str], buffer_chars: int = STREAM_BUFFER_CHARS) -> int:
+  """Write chunks to fp, coalescing small ones up to buffer_chars; returns characters written."""
+  buf: List[str] = []
+  pending = total = 0
+  for chunk in chunks:
+    buf.append(chunk)
+    pending += len(chunk)
+    if pending >= buffer_chars:
+      fp.write("".join(buf))
+      total += pending
+      buf, pending = [], 0
+  if buf:
+    fp.write("".join(buf))
+    total += pending
+  return total
+
+def _new_file_mode(path: Path) -> int:
+  # mkstemp creates 0600 files; keep the mode a plain write_text() would give.
+  try:
+    return path.stat().st_mode & 0o7777
+  except OSError:
+    mask = os.umask(0); os.umask(mask)
+    return 0o666 & ~mask
+
+def write_rendered(chunks: Iterable[str], out_path: Path, buffer_chars: int = STREAM_BUFFER_CHARS) -> int:
+  """Stream chunks into out_path through a sibling temp file, replaced atomically at the end.
+
+  A render that fails half-way leaves any existing out_path untouched.
+  """
+  import tempfile
+  out_path.parent.mkdir(parents=True, exist_ok=True)
+  fd, tmp = tempfile.mkstemp(dir=str(out_path.parent), prefix=f".{out_path.name}.", suffix=".tmp")
+  try:
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+      total = write_chunks(chunks, fp, buffer_chars)
+    os.chmod(tmp, _new_file_mode(out_path))
+    os.replace(tmp, out_path)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+  return total
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .ignore_rules import IGNORE_FILES, Rule, is_ignored, parse_rules, read_ignore_file
+
+# One cached directory listing: (name, is_dir, ignored) triples, or None when it
+# cannot be listed. Ignored entries are kept so literal path components still resolve.
+_Listing = Optional[Tuple[Tuple[str, bool, bool], ...]]
+
+_MAGIC_RE = re.compile(r"[*?[]")
+
+
+def _has_magic(s: str) -> bool:
+  return _MAGIC_RE.search(s) is not None
+
+
+def _is_hidden(name: str) -> bool:
+  return name[:1] == "."
+
+
+class TreeIndex:
+  """Directory listings shared by every glob pattern of one run.
+
+  glob() returns exactly what sorted(glob.glob(pattern, recursive=True))
+  would, but each directory is read with os.scandir at most once per index
+  and pattern components are compiled to regexes once, so N patterns over
+  the same tree cost one walk instead of N. The index is a snapshot: call
+  reset_tree_index() or invalidate() when files may have been created since
+  (every CLI run and every pipeline phase starts with fresh listings), or
+  begin_run() to keep the listings of directories whose mtime is unchanged
+  (a Renderer does this between sessions).
+
+  Entries excluded by explicit exclude patterns (relative to exclude_base,
+  default the working directory) or, with ignore_files, by .gitignore/
+  .codexignore files (of the directory and its ancestors up to the
+  repository root) are marked while listing, and wildcard components never descend into them, so
+  ignored trees such as node_modules are pruned rather than filtered
+  afterwards. Literal components ('build/*.txt') still enter ignored
+  directories.
+  """
+
+  def __init__(self, excludes: Sequence[str] = (), ignore_files: bool = False,
+               exclude_base: Optional[str] = None) -> None:
+    self._excludes: List[Rule] = parse_rules(list(excludes), os.path.abspath(exclude_base or os.getcwd()))
+    self._ignore_files = ignore_files
+    self._file_rules: Dict[str, List[Rule]] = {}
+    # abspath -> (generation, st_mtime_ns, listing); see begin_run().
+    self._listings: Dict[str, Tuple[int, Optional[int], _Listing]] = {}
+    self._generation = 0
+    self._matchers: Dict[str, Callable[[str], Optional["re.Match[str]"]]] = {}
+    self.patterns = 0  # glob() calls
+    self.matches = 0   # paths returned
+    self.scans = 0     # directories read from disk
+    self.reused = 0    # listings served from the index
+    self.pruned = 0    # entries excluded by ignore rules
+
+  def invalidate(self) -> None:
+    """Forget cached listings (keeps the counters); used between pipeline phases."""
+    self._listings.clear()
+    self._file_rules.clear()
+
+  def begin_run(self) -> None:
+    """Start another run over the same tree.
+
+    Each cached listing is checked once more (one stat of its directory) and
+    read again only if the directory's mtime changed, i.e. entries were
+    created, removed or renamed in it. Edits to ignore files do not change
+    directory mtimes, so with ignore_files everything is forgotten instead.
+    """
+    if self._ignore_files:
+      self.invalidate()
+    self._generation += 1
+
+  # -- ignore rules ------------------------------------------------------------
+
+  def _rules_from_files(self, directory: str, names: Optional[Sequence[str]] = None) -> List[Rule]:
+    """Ignore-file rules in effect inside directory (ancestors first, so deeper files win)."""
+    rules = self._file_rules.get(directory)
+    if rules is not None:
+      return rules
+    def has(name: str) -> bool:
+      return name in names if names is not None else os.path.lexists(os.path.join(directory, name))
+    parent = os.path.dirname(directory)
+    rules = [] if parent == directory or has(".git") else list(self._rules_from_files(parent))
+    for fn in IGNORE_FILES:
+      if has(fn):
+        rules += read_ignore_file(os.path.join(directory, fn), directory)
+    self._file_rules[directory] = rules
+    return rules
+
+  def _rules(self, directory: str, names: Sequence[str]) -> List[Rule]:
+    rules = self._rules_from_files(directory, names) if self._ignore_files else []
+    return rules + self._excludes if self._excludes else rules
+
+  # -- listings --------------------------------------------------------------
+
+  def _listing(self, dirname: str) -> _Listing:
+    key = os.path.abspath(dirname or os.curdir)
+    cached = self._listings.get(key)
+    if cached is not None:
+      generation, mtime, listing = cached
+      if generation != self._generation:
+        try: now: Optional[int] = os.stat(key).st_mtime_ns
+        except OSError: now = None
+        if now == mtime:
+          self._listings[key] = (self._generation, mtime, listing)
+        else:
+          cached = None
+      if cached is not None:
+        self.reused += 1
+        return listing
+    self.scans += 1
+    try:
+      mtime = os.stat(key).st_mtime_ns
+      with os.scandir(key) as it:
+        entries = []
+        for e in it:
+          try:
+            is_dir = e.is_dir()
+          except OSError:
+            is_dir = False
+          entries.append((e.name, is_dir))
+    except OSError:
+      self._listings[key] = (self._generation, None, None)
+      return None
+    rules = self._rules(key, [name for name, _ in entries])
+    if rules:
+      flagged = [(name, is_dir, is_ignored(rules, os.path.join(key, name), is_dir)) for name, is_dir in entries]
+      self.pruned += sum(1 for _, _, ignored in flagged if ignored)
+    else:
+      flagged = [(name, is_dir, False) for name, is_dir in entries]
+    listing = tuple(flagged)
+    self._listings[key] = (self._generation, mtime, listing)
+    return listing
+
+  def _names(self, dirname: str, dironly: bool) -> List[str]:
+    listing = self._listing(dirname)
+    if not listing:
+      return []
+    return [name for name, is_dir, ignored in listing if not ignored and (is_dir or not dironly)]
+
+  def _exists(self, path: str) -> bool:
+    dirname, basename = os.path.split(path)
+    listing = self._listing(dirname)
+    return bool(listing) and any(entry[0] == basename for entry in listing)  # type: ignore[union-attr]
+
+  def _matcher(self, pattern: str) -> Callable[[str], Optional["re.Match[str]"]]:
+    m = self._matchers.get(pattern)
+    if m is None:
+      m = self._matchers[pattern] = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+    return m
+
+  # -- glob semantics (mirrors glob._iglob with recursive=True) --------------
+
+  def _glob1(self, dirname: str, pattern: str, dironly: bool) -> List[str]:
+    names = self._names(dirname, dironly)
+    if not _is_hidden(pattern):
+      names = [n for n in names if not _is_hidden(n)]
+    match = self._matcher(pattern)
+    return [n for n in names if match(os.path.normcase(n))]
+
+  def _rlist(self, dirname: str, dironly: bool) -> Iterator[str]:
+    for name, is_dir, ignored in self._listing(dirname) or ():
+      if ignored or _is_hidden(name) or not (is_dir or not dironly):
+        continue
+      yield name
+      if is_dir:  # glob also tries to list files; that always fails, so skip it
+        path = os.path.join(dirname, name) if dirname else name
+        for sub in self._rlist(path, dironly):
+          yield os.path.join(name, sub)
+
+  def _glob2(self, dirname: str, dironly: bool) -> Iterator[str]:
+    yield ""
+    yield from self._rlist(dirname, dironly)
+
+  def _glob0(self, dirname: str, basename: str) -> List[str]:
+    if basename:
+      return [basename] if self._exists(os.path.join(dirname, basename)) else []
+    return [basename] if os.path.isdir(dirname) else []
+
+  def _iglob(self, pathname: str, dironly: bool) -> Iterator[str]:
+    dirname, basename = os.path.split(pathname)
+    if not _has_magic(pathname):
+      if basename:
+        if os.path.lexists(pathname):
+          yield pathname
+      elif os.path.isdir(dirname):
+        yield pathname
+      return
+    if not dirname:
+      if basename == "**":
+        yield from self._glob2("", dironly)
+      else:
+        yield from self._glob1("", basename, dironly)
+      return
+    if dirname != pathname and _has_magic(dirname):
+      dirs: Iterator[str] = self._iglob(dirname, True)
+    else:
+      dirs = iter([dirname])
+    for d in dirs:
+      if basename == "**":
+        names: Iterator[str] = self._glob2(d, dironly)
+      elif _has_magic(basename):
+        names = iter(self._glob1(d, basename, dironly))
+      else:
+        names = iter(self._glob0(d, basename))
+      for name in names:
+        yield os.path.join(d, name)
+
+  def glob(self, pattern: str) -> List[str]:
+    """Sorted matches of pattern, as sorted(glob.glob(pattern, recursive=True)) minus ignored entries."""
+    self.patterns += 1
+    found = list(self._iglob(pattern, False))
+    if pattern[:2] == "**" and found and not found[0]:
+      found = found[1:]  # glob drops the empty self-match of a leading '**'
+    self.matches += len(found)
+    return sorted(found)
+
+  def report(self) -> str:
+    return (f"glob: {self.patterns} patterns, {self.matches} matches, "
+            f"{self.scans} directories scanned, {self.reused} listings reused, {self.pruned} entries ignored")
+
+
+_INDEX = TreeIndex()
+
+
+def tree_index() -> TreeIndex:
+  return _INDEX
+
+
+def reset_tree_index(excludes: Sequence[str] = (), ignore_files: bool = False,
+                     exclude_base: Optional[str] = None) -> TreeIndex:
+  """Start a fresh snapshot (drops cached listings and counters)."""
+  global _INDEX
+  _INDEX = TreeIndex(excludes, ignore_files, exclude_base)
+  return _INDEX
+
+
+def use_tree_index(index: TreeIndex) -> TreeIndex:
+  """Make index the one glob_sorted() serves from (e.g. a Renderer's, kept across sessions)."""
+  global _INDEX
+  _INDEX = index
+  return _INDEX
+
+
+def glob_sorted(pattern: str) -> List[str]:
+  """sorted(glob.glob(pattern, recursive=True)) served from the run's TreeIndex."""
+  return _INDEX.glob(pattern)
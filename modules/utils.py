@@ -1,7 +1,9 @@
 from __future__ import annotations
-import os, sys, glob, json, re
+import os, sys, glob, re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from .file_cache import read_many, read_text
+from .tree_index import glob_sorted
 
 def die(msg: str, exit_code: int = 2) -> None:
   sys.stderr.write(f"ERROR: {msg}\n")
@@ -16,21 +18,106 @@ def ensure_jinja2() -> None:
 def expand_path(p: str) -> str:
   return os.path.expandvars(os.path.expanduser(p))
 
+def cache_dir() -> Path:
+  """Root for on-disk caches: $CODEX_CACHE_DIR, else $XDG_CACHE_HOME/codex-assistant (~/.cache)."""
+  explicit = os.getenv("CODEX_CACHE_DIR")
+  if explicit:
+    return Path(expand_path(explicit))
+  base = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+  return Path(base) / "codex-assistant"
+
+def env_flag(name: str, default: bool = True) -> bool:
+  val = os.getenv(name)
+  if val is None or val == "":
+    return default
+  return val.strip().lower() not in ("0", "false", "no", "off")
+
+class Dependencies:
+  """Files and glob patterns read while rendering (collected for --watch)."""
+
+  def __init__(self) -> None:
+    self.files: Set[str] = set()
+    self.globs: Set[str] = set()
+
+
+_TRACKER: Optional[Dependencies] = None
+
+
+def track_dependencies(deps: Dependencies):
+  """Context manager: record every file/glob touched inside the block into deps."""
+  import contextlib
+
+  @contextlib.contextmanager
+  def _tracking() -> Iterator[Dependencies]:
+    global _TRACKER
+    prev, _TRACKER = _TRACKER, deps
+    try:
+      yield deps
+    finally:
+      _TRACKER = prev
+  return _tracking()
+
+
+def record_file(path: Any) -> None:
+  if _TRACKER is not None:
+    _TRACKER.files.add(os.path.abspath(str(path)))
+
+
+def record_glob(pattern: str) -> None:
+  if _TRACKER is not None:
+    _TRACKER.globs.add(os.path.abspath(pattern))
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+  """(mtime_ns, size) of path, or None when it does not exist."""
+  try:
+    st = os.stat(path)
+  except OSError:
+    return None
+  return st.st_mtime_ns, st.st_size
+
+
+def file_digest(path: str) -> Optional[str]:
+  """SHA-1 of the file's bytes, or None when it cannot be read."""
+  import hashlib
+  try:
+    with open(path, "rb") as f:
+      return hashlib.sha1(f.read()).hexdigest()
+  except OSError:
+    return None
+
+
 def read_text_file(path_str: str) -> str:
   p = Path(expand_path(path_str))
+  record_file(p)
   if not p.exists():
     die(f"File not found: {p}")
   try:
-    return p.read_text(encoding="utf-8")
+    return read_text(p)
   except Exception as e:
     die(f"Failed to read text file '{p}': {e}")
   return ""  # unreachable
 
+def read_text_files(paths: List[str]) -> List[str]:
+  """read_text_file() of every path, in order, with the reads done concurrently."""
+  ps = [Path(expand_path(p)) for p in paths]
+  out: List[str] = []
+  for p, res in zip(ps, read_many(ps)):
+    record_file(p)
+    if isinstance(res, BaseException):
+      if not p.exists():
+        die(f"File not found: {p}")
+      die(f"Failed to read text file '{p}': {res}")
+    out.append(res)
+  return out
+
 def load_pattern_contents(pattern: str) -> List[str]:
   pat = expand_path(pattern)
-  matches = sorted(glob.glob(pat, recursive=True))
+  if glob.has_magic(pat):
+    record_glob(pat)
+  matches = glob_sorted(pat)
   if matches:
-    return [read_text_file(m) for m in matches]
+    return read_text_files(matches)
   return [read_text_file(pat)]
 
 def maybe_file_value(raw_value: str) -> str:
@@ -44,12 +131,13 @@ def maybe_file_value(raw_value: str) -> str:
   return raw_value
 
 def deep_merge(dst: Dict[str, Any], src: Dict[str, Any]) -> Dict[str, Any]:
-  for k, v in src.items():
-    if isinstance(v, dict) and isinstance(dst.get(k), dict):
-      deep_merge(dst[k], v)  # type: ignore[index]
-    else:
-      dst[k] = v
-  return dst
+  """Merge src into dst in place (nested mappings merged, everything else replaced).
+
+  dst may be a LayeredDict, in which case its base is left untouched. To merge
+  several documents, or with per-path strategies, use merge.Merger.
+  """
+  from .merge import Merger
+  return Merger().merge(dst, src)
 
 _ARRAY_KEY_RE = re.compile(r"^(?P<name>[A-Za-z_][A-Za-z0-9_]*)(?:\[(?P<index>\d*)\])?$")
 _COLON_INDEX_RE = re.compile(r"^(?P<name>[A-Za-z_][A-Za-z0-9_.]*):(?P<index>\d+)$")
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import glob
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .tree_index import TreeIndex, tree_index
+from .utils import Dependencies, file_digest, file_stamp, track_dependencies
+
+# Stamp of a file: (mtime_ns, size), or None when it does not exist.
+Stamp = Optional[Tuple[int, int]]
+
+# inotify event bits (see inotify(7)): content writes, metadata, and directory entries.
+_IN_MODIFY, _IN_ATTRIB, _IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+_IN_MOVED_FROM, _IN_MOVED_TO, _IN_CREATE, _IN_DELETE = 0x40, 0x80, 0x100, 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+            | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+
+
+class _Snapshot:
+  """Stamps, content digests and glob results for a set of dependencies.
+
+  Globs are matched through index (by default the last run's, which carries
+  its --exclude/ignore-file rules), so pruned trees are not walked on every
+  check; its listings are dropped before each re-check.
+  """
+
+  def __init__(self, deps: Dependencies, index: Optional[TreeIndex] = None) -> None:
+    self.index = index or tree_index()
+    self.stamps: Dict[str, Stamp] = {p: file_stamp(p) for p in deps.files}
+    self.digests: Dict[str, Optional[str]] = {p: file_digest(p) for p in deps.files}
+    self.globs: Dict[str, Tuple[str, ...]] = {g: tuple(self.index.glob(g)) for g in deps.globs}
+
+  def changed(self) -> List[str]:
+    """Dependencies whose content or glob matches really changed.
+
+    A file whose stamp moved but whose bytes are identical (e.g. `touch`) is
+    re-stamped and not reported.
+    """
+    out: List[str] = []
+    for path, old in self.stamps.items():
+      new = file_stamp(path)
+      if new == old:
+        continue
+      self.stamps[path] = new
+      digest = file_digest(path)
+      if digest != self.digests[path]:
+        self.digests[path] = digest
+        out.append(path)
+    if self.globs:
+      self.index.invalidate()
+    for pattern, old_matches in self.globs.items():
+      if tuple(self.index.glob(pattern)) != old_matches:
+        out.append(pattern)
+    return out
+
+  def directories(self) -> List[str]:
+    dirs = {os.path.dirname(p) for p in self.stamps}
+    for pattern in self.globs:
+      root = pattern
+      while glob.has_magic(root):
+        root = os.path.dirname(root)
+      dirs.add(root)
+    return sorted(d for d in dirs if os.path.isdir(d))
+
+
+class _Inotify:
+  """Minimal Linux inotify wrapper (ctypes) used to sleep until a watched directory changes."""
+
+  def __init__(self) -> None:
+    import ctypes
+    import ctypes.util
+    self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+    self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    self._watched: Dict[str, int] = {}
+
+  def watch(self, directories: List[str]) -> None:
+    for d in directories:
+      if d not in self._watched:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), _IN_MASK)
+        if wd >= 0:
+          self._watched[d] = wd
+
+  def wait(self, timeout: float) -> bool:
+    """Block until an event arrives or timeout passes; drains pending events."""
+    import select
+    ready, _, _ = select.select([self.fd], [], [], timeout)
+    if not ready:
+      return False
+    try:
+      while os.read(self.fd, 64 * 1024):
+        pass
+    except BlockingIOError:
+      pass
+    return True
+
+  def close(self) -> None:
+    os.close(self.fd)
+
+
+def _make_inotify() -> Optional[_Inotify]:
+  if not sys.platform.startswith("linux"):
+    return None
+  try:
+    return _Inotify()
+  except (OSError, AttributeError):
+    return None
+
+
+def watch(render_once: Callable[[], None], *, interval: float = 0.5,
+          max_renders: Optional[int] = None) -> None:
+  """Call render_once(), then again whenever one of the files it read changes.
+
+  Dependencies (templates, includes, structured loads, macro and --set-file
+  targets, glob patterns) are collected while rendering. Changes are detected
+  with inotify on Linux and by polling stamps everywhere else; a stamp change
+  only triggers a re-render if the content (or the set of glob matches)
+  differs. Render errors are reported and watching continues.
+  """
+  deps = Dependencies()
+  notifier = _make_inotify()
+  renders = 0
+  try:
+    while True:
+      # Each render starts from scratch, so files it stopped using are dropped.
+      previous, deps = deps, Dependencies()
+      failed = False
+      with track_dependencies(deps):
+        try:
+          render_once()
+        except SystemExit as e:
+          failed = e.code not in (None, 0)
+        except Exception as e:  # e.g. a TemplateSyntaxError while a template is half-edited
+          sys.stderr.write(f"ERROR: {type(e).__name__}: {e}\n")
+          failed = True
+      if failed:
+        sys.stderr.write("watch: render failed; waiting for changes\n")
+        # A render that failed early may not have reached every input yet.
+        deps.files |= previous.files
+        deps.globs |= previous.globs
+      renders += 1
+      if max_renders is not None and renders >= max_renders:
+        return
+      snapshot = _Snapshot(deps)
+      sys.stderr.write(f"watch: {len(deps.files)} files, {len(deps.globs)} globs\n")
+      sys.stderr.flush()
+      while True:
+        if notifier is not None:
+          notifier.watch(snapshot.directories())
+          # Events only shorten the wait; stamps are re-checked either way,
+          # which also covers directories inotify is not watching.
+          if notifier.wait(max(interval, 5.0)):
+            time.sleep(0.05)  # let editors finish writing (debounce)
+        else:
+          time.sleep(interval)
+        changed = snapshot.changed()
+        if changed:
+          sys.stderr.write(f"watch: changed: {', '.join(changed[:5])}{' ...' if len(changed) > 5 else ''}\n")
+          break
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if notifier is not None:
+      notifier.close()
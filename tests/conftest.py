@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path_factory, monkeypatch):
+    # The document and template caches default to ~/.cache; keep every test's writes in a fresh temp dir.
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
@@ -0,0 +1,86 @@
+import json
+import sys
+
+import pytest
+
+from modules import cli
+
+
+pytest.importorskip("jinja2")
+
+
+def _write_manifest(path, entries):
+    path.write_text("\n".join(json.dumps(e) for e in entries) + "\n", encoding="utf-8")
+
+
+def test_batch_renders_entries_on_shared_base(tmp_path, monkeypatch, capsys):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ owner }}/{{ branch }}", encoding="utf-8")
+    manifest = tmp_path / "m.jsonl"
+    _write_manifest(manifest, [
+        {"template": str(tfile), "set": ["branch=a"], "out": str(tmp_path / "out" / "a.txt")},
+        {"template": str(tfile), "set": "branch=b", "out": str(tmp_path / "out" / "b.txt")},
+    ])
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "--batch", str(manifest), "--set", "owner=me"])
+    cli.main()
+
+    assert (tmp_path / "out" / "a.txt").read_text(encoding="utf-8") == "me/a"
+    assert (tmp_path / "out" / "b.txt").read_text(encoding="utf-8") == "me/b"
+    assert "2 rendered, 0 failed" in capsys.readouterr().err
+
+
+def test_batch_reports_failures_without_aborting(tmp_path, monkeypatch, capsys):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("X={{ x }}", encoding="utf-8")
+    manifest = tmp_path / "m.yaml"
+    manifest.write_text(
+        f"""\
+- {{template: {tmp_path / 'missing.tpl'}, out: {tmp_path / 'bad.txt'}}}
+- {{set: [x=1], out: {tmp_path / 'ok.txt'}}}
+""",
+        encoding="utf-8",
+    )
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "--batch", str(manifest), "--template-name", str(tfile)])
+    with pytest.raises(SystemExit) as exc:
+        cli.main()
+    assert exc.value.code == 1
+
+    assert (tmp_path / "ok.txt").read_text(encoding="utf-8") == "X=1"
+    err = capsys.readouterr().err
+    assert "FAILED [0]" in err and "Template not found" in err
+    assert "1 rendered, 1 failed" in err
+
+
+def test_batch_process_pool_matches_in_process(tmp_path, monkeypatch):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ n }}", encoding="utf-8")
+    manifest = tmp_path / "m.jsonl"
+    _write_manifest(manifest, [
+        {"template": str(tfile), "set": [f"n={i}"], "out": str(tmp_path / f"{i}.txt")} for i in range(4)
+    ])
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "--batch", str(manifest), "--jobs", "2"])
+    cli.main()
+
+    assert [(tmp_path / f"{i}.txt").read_text(encoding="utf-8") for i in range(4)] == ["0", "1", "2", "3"]
+
+
+def test_batch_prints_nested_mappings_like_the_cli(tmp_path, monkeypatch, capsys):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ cfg }} {{ cfg.inner }}", encoding="utf-8")
+    flags = ["--set-json", 'cfg={"a": 1, "inner": {"b": [2]}}']
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tfile), *flags])
+    cli.main()
+    plain = capsys.readouterr().out
+    manifest = tmp_path / "m.jsonl"
+    _write_manifest(manifest, [{"template": str(tfile), "set": ["x=1"], "out": str(tmp_path / "b.txt")}])
+    monkeypatch.setattr(sys, "argv", ["prog", "--batch", str(manifest), *flags])
+    cli.main()
+    assert plain == "{'a': 1, 'inner': {'b': [2]}} {'b': [2]}"
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == plain
@@ -1,3 +1,4 @@
+import os
 import sys
 from pathlib import Path
 import pytest
@@ -36,3 +37,24 @@ def test_cli_load_non_mapping_in_load_errors(tmp_path, monkeypatch):
     ])
     with pytest.raises(SystemExit):
         cli.main()
+
+
+def test_run_settings_do_not_leak_into_the_next_main_call(tmp_path, monkeypatch, capsys):
+    from modules import lazy_values
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    for name in ("CODEX_LAZY_FILES", "CODEX_IO_WORKERS", "CODEX_DENSE_LIST_GAP", "CODEX_JSON_BACKEND"):
+        monkeypatch.delenv(name, raising=False)
+    (tmp_path / "a.md").write_text("A", encoding="utf-8")
+    (tmp_path / "t.tpl").write_text("{{ a }}", encoding="utf-8")
+    seen = []
+    orig = lazy_values.lazy_file
+    monkeypatch.setattr(lazy_values, "lazy_file", lambda p: seen.append(p) or orig(p))
+    cli.main(["--template-name", "t.tpl", "--set-file", "a=a.md", "--lazy-files",
+              "--io-workers", "2", "--dense-list-gap", "5", "--json-backend", "stdlib"])
+    assert len(seen) == 1
+    for name in ("CODEX_LAZY_FILES", "CODEX_IO_WORKERS", "CODEX_DENSE_LIST_GAP", "CODEX_JSON_BACKEND"):
+        assert name not in os.environ
+    cli.main(["--template-name", "t.tpl", "--set-file", "a=a.md"])
+    assert len(seen) == 1
+    assert capsys.readouterr().out == "AA"
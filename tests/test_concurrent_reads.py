@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from modules import file_cache as fc_mod
+from modules.file_cache import FileCache
+from modules.structload import load_structured_file, load_structured_glob
+from modules.tree_index import reset_tree_index
+from modules.utils import load_pattern_contents
+
+
+class _SlowCache(FileCache):
+    """Simulates a network filesystem: every read waits, and concurrency is recorded."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay, self.active, self.peak = delay, 0, 0
+        self._track = threading.Lock()
+
+    def read_text(self, path):
+        with self._track:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            return super().read_text(path)
+        finally:
+            with self._track:
+                self.active -= 1
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+    (tmp_path / "specs" / "sub").mkdir(parents=True)
+    for i in range(24):
+        d = tmp_path / "specs" / ("sub" if i % 2 else "")
+        (d / f"{i:02d}.md").write_text(f"spec {i}", encoding="utf-8")
+    return tmp_path
+
+
+def test_read_many_is_concurrent_bounded_and_ordered(files):
+    cache = _SlowCache(0.02)
+    paths = sorted(files.glob("specs/**/*.md")) + [files / "missing.md"]
+    start = time.perf_counter()
+    results = cache.read_many(paths, workers=6)
+    elapsed = time.perf_counter() - start
+    assert [r for r in results[:-1]] == [p.read_text(encoding="utf-8") for p in paths[:-1]]
+    assert isinstance(results[-1], FileNotFoundError)
+    assert cache.peak == 6
+    assert elapsed < 24 * 0.02 / 2
+
+
+def test_workers_setting_one_reads_sequentially(files, monkeypatch):
+    monkeypatch.setenv("CODEX_IO_WORKERS", "1")
+    cache = _SlowCache(0)
+    cache.read_many(sorted(files.glob("specs/**/*.md")))
+    assert cache.peak == 1
+
+
+def test_pattern_contents_keep_sorted_order_and_errors(files, monkeypatch, capsys):
+    monkeypatch.setenv("CODEX_IO_WORKERS", "4")
+    monkeypatch.setattr(fc_mod, "_CACHE", _SlowCache(0.005))
+    texts = load_pattern_contents("specs/**/*.md")
+    assert texts == [f"spec {i}" for i in sorted(range(24), key=lambda i: f"{'sub/' if i % 2 else ''}{i:02d}.md")]
+    assert fc_mod._CACHE.peak > 1
+
+    (files / "specs" / "bad.md").write_bytes(b"\xff")
+    reset_tree_index()
+    with pytest.raises(SystemExit):
+        load_pattern_contents("specs/*.md")
+    assert "Failed to read text file" in capsys.readouterr().err
+
+
+def test_macros_read_concurrently_in_order(files, monkeypatch):
+    monkeypatch.setenv("CODEX_IO_WORKERS", "4")
+    (files / "doc.json").write_text(
+        '{"g": {"$glob": "specs/*.md"}, "f": {"$files": ["specs/sub/03.md", "specs/00.md"]}}', encoding="utf-8")
+    (doc,) = load_structured_file("doc.json")
+    assert doc["g"] == [f"spec {i}" for i in range(0, 24, 2)]
+    assert doc["f"] == ["spec 3", "spec 0"]
+
+
+def test_parse_processes_match_in_process_results(files, monkeypatch):
+    pytest.importorskip("yaml")
+    (files / "data").mkdir()
+    for i in range(6):
+        (files / "data" / f"{i}.yaml").write_text(f"n: {i}\nnote: {{$file: ../specs/00.md}}\n---\nx: [{i}]\n",
+                                                  encoding="utf-8")
+    (files / "data" / "j.json").write_text('{"j": true}', encoding="utf-8")
+    sequential = load_structured_glob("data/*")
+    monkeypatch.setenv("CODEX_PARSE_PROCESSES", "3")
+    assert load_structured_glob("data/*") == sequential
+    assert sequential[0] == {"n": 0, "note": "spec 0"} and sequential[-1] == {"j": True}
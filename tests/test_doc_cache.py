@@ -0,0 +1,124 @@
+import datetime
+import os
+import pickle
+
+import pytest
+
+from modules import structload
+from modules.structload import document_cache_dir, load_structured_file
+
+
+pytest.importorskip("yaml")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("CODEX_DOC_CACHE", "")
+    return tmp_path
+
+
+def _no_yaml(monkeypatch):
+    def boom(text):
+        raise AssertionError("YAML parsed on a warm run")
+    monkeypatch.setattr(structload, "_parse_yaml", boom)
+
+
+def test_warm_load_skips_yaml_parsing(cache, monkeypatch):
+    f = cache / "spec.yaml"
+    f.write_text("a: 1\nitems: [x, y]\n---\nb: two\n", encoding="utf-8")
+    cold = load_structured_file(str(f))
+    assert len(list(document_cache_dir().glob("*.docs"))) == 1
+
+    _no_yaml(monkeypatch)
+    assert load_structured_file(str(f)) == cold == [{"a": 1, "items": ["x", "y"]}, {"b": "two"}]
+
+
+def test_edit_invalidates_entry(cache):
+    f = cache / "spec.yaml"
+    f.write_text("v: 1\n", encoding="utf-8")
+    assert load_structured_file(str(f)) == [{"v": 1}]
+    f.write_text("v: 22\n", encoding="utf-8")
+    assert load_structured_file(str(f)) == [{"v": 22}]
+    assert len(list(document_cache_dir().glob("*.docs"))) == 1
+
+
+def test_macros_expand_against_current_targets(cache, monkeypatch):
+    (cache / "note.md").write_text("old", encoding="utf-8")
+    (cache / "parts").mkdir()
+    (cache / "parts" / "1.md").write_text("p1", encoding="utf-8")
+    f = cache / "spec.yaml"
+    f.write_text("note: {$file: note.md}\nparts: {$glob: 'parts/*.md'}\n", encoding="utf-8")
+    assert load_structured_file(str(f)) == [{"note": "old", "parts": ["p1"]}]
+
+    _no_yaml(monkeypatch)
+    (cache / "note.md").write_text("new!", encoding="utf-8")
+    (cache / "parts" / "2.md").write_text("p2", encoding="utf-8")
+    from modules.tree_index import reset_tree_index
+    reset_tree_index()
+    assert load_structured_file(str(f)) == [{"note": "new!", "parts": ["p1", "p2"]}]
+
+
+def test_non_marshal_values_are_not_cached(cache):
+    f = cache / "dates.yml"
+    f.write_text("when: 2024-05-01\n", encoding="utf-8")
+    assert load_structured_file(str(f)) == [{"when": datetime.date(2024, 5, 1)}]
+    assert load_structured_file(str(f)) == [{"when": datetime.date(2024, 5, 1)}]
+    assert not list(document_cache_dir().glob("*.docs"))
+
+
+def test_pickled_entries_are_ignored(cache, monkeypatch):
+    f = cache / "spec.yaml"
+    f.write_text("v: 1\n", encoding="utf-8")
+    load_structured_file(str(f))
+    (entry,) = document_cache_dir().glob("*.docs")
+    entry.write_bytes(b"P" + pickle.dumps(("x",)))
+    monkeypatch.setattr(pickle, "loads", lambda *a, **k: pytest.fail("pickle.loads called"))
+    assert load_structured_file(str(f)) == [{"v": 1}]
+
+
+def test_old_entries_are_pruned(cache, monkeypatch):
+    monkeypatch.setattr(structload, "DOC_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(structload, "DOC_CACHE_PRUNE_MARGIN", 0)
+    for i in range(4):
+        f = cache / f"s{i}.yaml"
+        f.write_text(f"v: {i}\n", encoding="utf-8")
+        load_structured_file(str(f))
+        os.utime(structload._disk_entry(str(f.resolve())), ns=(i * 10**9, i * 10**9))
+    kept = sorted(p.name for p in document_cache_dir().glob("*.docs"))
+    assert kept == sorted(structload._disk_entry(str((cache / f"s{i}.yaml").resolve())).name for i in (2, 3))
+
+
+def test_disabled_and_json_files_are_not_cached(cache, monkeypatch):
+    (cache / "d.json").write_text('{"j": 1}', encoding="utf-8")
+    monkeypatch.setattr(structload, "_read_disk_cache", lambda *a: pytest.fail("disk cache read for JSON"))
+    assert load_structured_file(str(cache / "d.json")) == [{"j": 1}]
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+    (cache / "d.yaml").write_text("y: 1\n", encoding="utf-8")
+    assert load_structured_file(str(cache / "d.yaml")) == [{"y": 1}]
+    assert not os.path.exists(document_cache_dir())
+
+
+def test_corrupt_entry_is_reparsed(cache):
+    f = cache / "spec.yaml"
+    f.write_text("v: 1\n", encoding="utf-8")
+    load_structured_file(str(f))
+    (entry,) = document_cache_dir().glob("*.docs")
+    entry.write_bytes(b"Mgarbage")
+    assert load_structured_file(str(f)) == [{"v": 1}]
+
+
+def test_full_cache_is_listed_once_per_margin(cache, monkeypatch):
+    monkeypatch.setattr(structload, "DOC_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(structload, "DOC_CACHE_PRUNE_MARGIN", 3)
+    listings = []
+    monkeypatch.setattr(structload, "_prune_disk_cache",
+                        lambda d, real=structload._prune_disk_cache: listings.append(d) or real(d))
+    for i in range(12):
+        f = cache / f"s{i}.yaml"
+        f.write_text(f"v: {i}\n", encoding="utf-8")
+        load_structured_file(str(f))
+    # The first write lists the directory; after that only writes 6 and 10 do
+    # (the count would pass 2 + 3), each pruning back to 2.
+    assert len(listings) == 3
+    assert len(list(document_cache_dir().glob("*.docs"))) <= 2 + 3
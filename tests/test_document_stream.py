@@ -0,0 +1,65 @@
+import copy
+import json
+import pickle
+import sys
+
+import pytest
+
+from modules import cli
+from modules.structload import DocumentStream, load_structured_file, open_document_stream
+
+
+@pytest.fixture
+def records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+    monkeypatch.setenv("CODEX_STREAM_LOADS", "")
+    lines = [json.dumps({"id": i, "title": f"task {i}"}) for i in range(5)]
+    (tmp_path / "tasks.jsonl").write_text("\n".join(lines[:3]) + "\n\n" + "\n".join(lines[3:]) + "\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_jsonl_is_streamed_lazily(records):
+    stream = open_document_stream("tasks.jsonl")
+    assert isinstance(stream, DocumentStream)
+    it = iter(stream)
+    assert next(it) == {"id": 0, "title": "task 0"}
+    assert [d["id"] for d in it] == [1, 2, 3, 4]
+    assert [d["id"] for d in stream] == [0, 1, 2, 3, 4]  # re-iterable
+
+
+def test_bad_line_reports_path_and_line(records):
+    (records / "bad.ndjson").write_text('{"id": 1}\n{oops}\n', encoding="utf-8")
+    it = iter(open_document_stream("bad.ndjson"))
+    assert next(it) == {"id": 1}
+    with pytest.raises(SystemExit):
+        next(it)
+
+
+def test_yaml_streams_only_when_enabled(records, monkeypatch):
+    pytest.importorskip("yaml")
+    (records / "multi.yaml").write_text("a: 1\n---\na: 2\n", encoding="utf-8")
+    assert open_document_stream("multi.yaml") is None
+    monkeypatch.setenv("CODEX_STREAM_LOADS", "1")
+    assert list(open_document_stream("multi.yaml")) == [{"a": 1}, {"a": 2}]
+
+
+def test_eager_load_and_copies(records):
+    assert [d["id"] for d in load_structured_file("tasks.jsonl")] == [0, 1, 2, 3, 4]
+    stream = open_document_stream("tasks.jsonl")
+    assert copy.deepcopy(stream) is stream
+    assert list(pickle.loads(pickle.dumps(stream))) == list(stream)
+    assert open_document_stream("missing*.jsonl", optional=True) is None
+
+
+def test_template_loops_over_stream(records, monkeypatch, capsys):
+    pytest.importorskip("jinja2")
+    tpl = records / "main.tpl"
+    tpl.write_text("{% for t in TASKS %}{{ t.id }};{% endfor %}|{{ TASKS|tojson }}", encoding="utf-8")
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl),
+                                      "--load-into", "TASKS=tasks.jsonl", "--print-context"])
+    cli.main()
+    captured = capsys.readouterr()
+    assert captured.out.startswith('0;1;2;3;4;|[{"id": 0, "title": "task 0"}')
+    assert '"TASKS": "<documents of tasks.jsonl>"' in captured.err
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from modules import cli
+from modules.file_cache import FileCache, file_cache
+
+
+def test_repeated_reads_return_the_same_object(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("hello", encoding="utf-8")
+    fc = FileCache()
+    first = fc.read_text(f)
+    assert fc.read_text(str(f)) is first
+    assert (fc.hits, fc.misses, fc.bytes_read) == (1, 1, 5)
+
+
+def test_symlinks_share_an_entry_and_stamp_changes_reread(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("one", encoding="utf-8")
+    os.symlink(f, tmp_path / "link.txt")
+    fc = FileCache()
+    assert fc.read_text(tmp_path / "link.txt") is fc.read_text(f)
+    f.write_text("two!", encoding="utf-8")
+    assert fc.read_text(f) == "two!"
+    assert fc.misses == 2
+
+
+def test_newlines_and_errors_match_path_read_text(tmp_path):
+    f = tmp_path / "crlf.txt"
+    f.write_bytes(b"a\r\nb\rc\n")
+    fc = FileCache()
+    assert fc.read_text(f) == f.read_text(encoding="utf-8")
+    (tmp_path / "bad.txt").write_bytes(b"\xff\xfe")
+    with pytest.raises(UnicodeDecodeError):
+        fc.read_text(tmp_path / "bad.txt")
+    with pytest.raises(OSError):
+        fc.read_text(tmp_path / "missing.txt")
+
+
+def test_eviction_keeps_total_under_limit(tmp_path):
+    fc = FileCache(max_chars=10)
+    for i in range(4):
+        (tmp_path / f"{i}.txt").write_text("x" * 4, encoding="utf-8")
+        fc.read_text(tmp_path / f"{i}.txt")
+    fc.read_text(tmp_path / "3.txt")
+    fc.read_text(tmp_path / "0.txt")
+    assert (fc.hits, fc.misses) == (1, 5)
+
+
+def test_one_render_reads_each_file_once(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("jinja2")
+    monkeypatch.chdir(tmp_path)
+    file_cache().clear()
+    (tmp_path / "note.md").write_text("N", encoding="utf-8")
+    (tmp_path / "data.json").write_text('{"n": {"$file": "note.md"}}', encoding="utf-8")
+    (tmp_path / "t.tpl").write_text(
+        "{{ n }}{{ A }}{{ B[0] }}{{ include_text('note.md') }}{{ read_file('note.md') }}", encoding="utf-8")
+    cli.main(["--template-name", "t.tpl", "--load", "data.json", "--set", "A=@note.md",
+              "--add-file", "B=note.md", "--stats"])
+    out, err = capsys.readouterr()
+    assert out == "NNNNN"
+    # note.md five times, data.json and t.tpl once each
+    assert "files: 4 hits, 3 misses" in err
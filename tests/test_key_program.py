@@ -0,0 +1,79 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from modules.context_ops import _ensure_list_at, _set_nested, compile_ops
+
+
+def _reference(ctx, set_pairs, add_pairs, index_pairs):
+    # The per-pair semantics the compiled program must reproduce.
+    for pair in set_pairs:
+        key, value = pair.split("=", 1)
+        head, _, last = key.rpartition(".")
+        if last.endswith("[]"):
+            _ensure_list_at(ctx, key[:-2]).append(value)
+        elif last.endswith("]"):
+            name, idx = key[:-1].split("[")
+            lst = _ensure_list_at(ctx, name)
+            i = int(idx)
+            if len(lst) <= i: lst.extend([None] * (i + 1 - len(lst)))
+            lst[i] = value
+        else:
+            _set_nested(ctx, key, value)
+    for pair in add_pairs:
+        key, value = pair.split("=", 1)
+        _ensure_list_at(ctx, key).append(value)
+    for pair in index_pairs:
+        key, value = pair.split("=", 1)
+        name, idx = key.split(":")
+        lst = _ensure_list_at(ctx, name)
+        i = int(idx)
+        if len(lst) <= i: lst.extend([None] * (i + 1 - len(lst)))
+        lst[i] = value
+    return ctx
+
+
+def _ops(**kw):
+    base = {k: [] for k in ("set", "set_file", "set_json", "set_json_file", "add", "add_file",
+                            "set_index", "set_file_index")}
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def test_matches_per_pair_semantics_on_random_programs():
+    rng = random.Random(7)
+    names = ["a", "b", "c"]
+    for _ in range(300):
+        def key(depth):
+            return ".".join(rng.choice(names) for _ in range(depth))
+        sets = []
+        for i in range(rng.randint(1, 12)):
+            k = key(rng.randint(1, 3))
+            form = rng.random()
+            sets.append(f"{k}[]={i}" if form < 0.2 else f"{k}[{rng.randint(0, 3)}]={i}" if form < 0.35 else f"{k}={i}")
+        adds = [f"{key(rng.randint(1, 3))}=x{i}" for i in range(rng.randint(0, 4))]
+        idxs = [f"{key(rng.randint(1, 2))}:{rng.randint(0, 2)}=y{i}" for i in range(rng.randint(0, 3))]
+        try:
+            expected = _reference({}, sets, adds, idxs)
+        except SystemExit:
+            with pytest.raises(SystemExit):
+                compile_ops(_ops(set=sets, add=adds, set_index=idxs)).run({})
+            continue
+        assert compile_ops(_ops(set=sets, add=adds, set_index=idxs)).run({}) == expected
+
+
+def test_program_is_reusable_and_keeps_shared_containers_exact():
+    prog = compile_ops(_ops(set=["cfg.mode=fast", "cfg.list[]=1"], add=["other.list=2"]))
+    shared = {"list": []}
+    ctx = prog.run({"cfg": shared, "other": shared})  # one dict at two paths (YAML alias)
+    assert ctx["cfg"] is ctx["other"] and shared == {"mode": "fast", "list": ["1", "2"]}
+    assert prog.run({}) == {"cfg": {"mode": "fast", "list": ["1"]}, "other": {"list": ["2"]}}
+
+
+def test_errors_are_reported_in_order(capsys):
+    ctx = {}
+    with pytest.raises(SystemExit):
+        compile_ops(_ops(set=["a=1", "missing-equals"], add=["a=2"])).run(ctx)
+    assert ctx == {"a": "1"}
+    assert "--set expects KEY=VALUE" in capsys.readouterr().err
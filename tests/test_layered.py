@@ -0,0 +1,67 @@
+import copy
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from modules.cli import apply_context_ops
+from modules.context_ops import apply_add, apply_set_index, apply_set_pairs
+from modules.layered import LayeredDict
+from modules.lazy_values import context_json
+from modules.utils import deep_merge
+
+
+def _base():
+    return {"project": {"name": "base", "meta": {"tags": ["a", "b"], "owner": "ops"}},
+            "tasks": ["t1"], "title": "Base"}
+
+
+def _ops(**kw):
+    base = {k: [] for k in ("load", "load_into", "set", "set_file", "set_json", "set_json_file",
+                            "add", "add_file", "set_index", "set_file_index")}
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def test_writes_stay_in_the_layer():
+    base = _base()
+    before = copy.deepcopy(base)
+    ctx = LayeredDict(base)
+    apply_set_pairs(ctx, ["project.name=variant", "project.meta.tags[]=c", "extra.deep.key=1"])
+    apply_add(ctx, ["tasks=t2"])
+    apply_set_index(ctx, ["project.meta.tags:0=A"])
+    deep_merge(ctx, {"project": {"meta": {"owner": "dev"}}, "title": "V"})
+    del ctx["title"]
+    assert base == before
+    assert ctx.to_dict() == {"project": {"name": "variant", "meta": {"tags": ["A", "b", "c"], "owner": "dev"}},
+                             "tasks": ["t1", "t2"], "extra": {"deep": {"key": "1"}}}
+    assert "title" not in ctx and len(ctx) == 3 and list(ctx) == ["project", "tasks", "extra"]
+
+
+def test_layer_matches_deepcopy_and_shares_untouched_subtrees():
+    base = _base()
+    ops = _ops(set=["project.meta.owner=x", "tasks[]=t9"], set_json=['project.cfg={"n": 1}'])
+    layered = apply_context_ops(LayeredDict(base), ops)
+    assert layered == apply_context_ops(copy.deepcopy(base), ops)
+    ctx = LayeredDict(base)
+    assert ctx.to_dict()["project"] is base["project"]  # nothing written: nothing copied
+    assert ctx["project"]["meta"]["tags"] is base["project"]["meta"]["tags"]  # reads do not copy lists
+
+
+def test_output_hooks_see_a_mapping():
+    ctx = LayeredDict(_base())
+    ctx["project"]["name"] = "v"
+    assert json.loads(context_json(ctx))["project"]["name"] == "v"
+
+
+def test_templates_render_layers(tmp_path):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("yaml")
+    from modules.template_env import render_template
+    tpl = tmp_path / "t.j2"
+    tpl.write_text("{{ project.name }}:{% for t in project.meta.tags %}{{ t }}{% endfor %}:"
+                   "{{ project.meta|tojson }}:{{ project.meta|to_nice_yaml }}", encoding="utf-8")
+    ctx = LayeredDict(_base())
+    apply_set_pairs(ctx, ["project.meta.owner=me"])
+    out = render_template(tpl, ctx, [])
+    assert out == 'base:ab:{"owner": "me", "tags": ["a", "b"]}:tags:\n- a\n- b\nowner: me\n'
@@ -0,0 +1,104 @@
+import copy
+import json
+import pickle
+import sys
+
+import pytest
+
+from modules import cli
+from modules.context_ops import apply_add_file, apply_set_file
+from modules.file_cache import file_cache
+from modules.lazy_values import LazyFile, LazyJoin, context_json, lazy_file
+from modules.structload import load_structured_file
+from modules.tree_index import reset_tree_index
+
+
+@pytest.fixture
+def lazy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_LAZY_FILES", "1")
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "notes" / "a.md").write_text("alpha", encoding="utf-8")
+    (tmp_path / "notes" / "b.md").write_text("beta", encoding="utf-8")
+    (tmp_path / "intro.md").write_text("Hello", encoding="utf-8")
+    reset_tree_index()
+    return tmp_path
+
+
+def test_lazy_file_behaves_like_its_text(lazy):
+    v = lazy_file(lazy / "intro.md")
+    assert not v.loaded
+    assert str(v) == "Hello" and v.loaded
+    assert v == "Hello" and "Hello" == v and v != "x"
+    assert len(v) == 5 and v[1:3] == "el" and "ell" in v
+    assert v.upper() == "HELLO" and v + "!" == "Hello!" and "> " + v == "> Hello"
+    assert f"{v:>6}" == " Hello" and hash(v) == hash("Hello")
+    assert sorted([lazy_file(lazy / "notes" / "b.md"), lazy_file(lazy / "notes" / "a.md")]) == ["alpha", "beta"]
+
+
+def test_copy_and_pickle_do_not_read(lazy):
+    v = lazy_file(lazy / "intro.md")
+    for clone in (copy.deepcopy(v), pickle.loads(pickle.dumps(v))):
+        assert isinstance(clone, LazyFile) and clone.path == v.path
+    assert not v.loaded
+    j = pickle.loads(pickle.dumps(LazyJoin([str(lazy / "notes" / "a.md"), str(lazy / "notes" / "b.md")], "+")))
+    assert j == "alpha+beta"
+
+
+def test_missing_file_fails_up_front(lazy):
+    with pytest.raises(SystemExit):
+        apply_set_file({}, ["x=missing.md"])
+
+
+def test_set_and_add_file_defer_reads(lazy):
+    ctx = {}
+    apply_set_file(ctx, ["intro=intro.md"])
+    apply_add_file(ctx, ["notes=notes/*.md"])
+    assert [type(v) for v in ctx["notes"]] == [LazyFile, LazyFile]
+    assert not ctx["intro"].loaded
+    out = json.loads(context_json(ctx))
+    assert out["intro"] == "<file intro.md>"
+    assert not any(v.loaded for v in ctx["notes"])
+    assert ctx["notes"] == ["alpha", "beta"]
+
+
+def test_macros_in_lazy_mode(lazy):
+    (lazy / "doc.yaml").write_text(
+        "one: {$file: intro.md}\n"
+        "many: {$files: [notes/a.md, notes/b.md]}\n"
+        "single: {$glob_one: notes/a*.md}\n"
+        "all: {$glob: notes/*.md}\n"
+        "joined: {$glob: notes/*.md, $join: ', '}\n",
+        encoding="utf-8",
+    )
+    pytest.importorskip("yaml")
+    [data] = load_structured_file(str(lazy / "doc.yaml"))
+    assert isinstance(data["one"], LazyFile) and isinstance(data["joined"], LazyJoin)
+    assert not data["joined"].loaded
+    assert data == {"one": "Hello", "many": ["alpha", "beta"], "single": "alpha",
+                    "all": ["alpha", "beta"], "joined": "alpha, beta"}
+
+
+def test_render_reads_only_used_values(lazy, monkeypatch, capsys):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("yaml")
+    tpl = lazy / "main.tpl"
+    tpl.write_text("{{ intro }}|{{ data|tojson }}|{{ data|to_nice_yaml }}", encoding="utf-8")
+    monkeypatch.setenv("CODEX_LAZY_FILES", "")
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl), "--lazy-files", "--stats",
+                                      "--set-file", "intro=intro.md", "--add-file", "data=notes/a.md",
+                                      "--add-file", "unused=notes/b.md", "--print-context"])
+    cli.main()
+    captured = capsys.readouterr()
+    assert captured.out.startswith('Hello|["alpha"]|- alpha')
+    assert '"<file notes/b.md>"' in captured.err
+    assert "files: 0 hits, 3 misses" in captured.err  # intro, a.md and the template; not b.md
+    file_cache().clear()
+
+
+def test_lazy_text_is_abstract():
+    from modules.lazy_values import LazyText
+    with pytest.raises(TypeError):
+        LazyText()
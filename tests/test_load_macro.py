@@ -0,0 +1,62 @@
+import pytest
+
+from modules import structload
+from modules.structload import load_structured_file, reset_load_memo
+
+
+pytest.importorskip("yaml")
+
+
+@pytest.fixture
+def specs(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+    reset_load_memo()
+    parsed = []
+    real = structload._parse_structured_file
+    monkeypatch.setattr(structload, "_parse_structured_file", lambda p: parsed.append(p.name) or real(p))
+    (tmp_path / "shared").mkdir()
+    (tmp_path / "shared" / "base.yaml").write_text("name: base\nnote: {$file: note.md}\n", encoding="utf-8")
+    (tmp_path / "shared" / "note.md").write_text("from shared/", encoding="utf-8")
+    (tmp_path / "left.yaml").write_text("base: {$load: shared/base.yaml}\n", encoding="utf-8")
+    (tmp_path / "right.yaml").write_text("base: {$load: ./shared/../shared/base.yaml}\n", encoding="utf-8")
+    yield tmp_path, parsed
+    reset_load_memo()
+
+
+def test_diamond_parses_each_file_once(specs):
+    root, parsed = specs
+    (root / "top.yaml").write_text("l: {$load: left.yaml}\nr: {$load: right.yaml}\n", encoding="utf-8")
+    [doc] = load_structured_file(str(root / "top.yaml"))
+    base = {"name": "base", "note": "from shared/"}
+    assert doc == {"l": {"base": base}, "r": {"base": base}}
+    assert sorted(parsed) == ["base.yaml", "left.yaml", "right.yaml", "top.yaml"]
+    doc["l"]["base"]["name"] = "changed"  # expansions are independent copies
+    assert doc["r"]["base"]["name"] == "base"
+
+
+def test_load_glob_and_multi_doc(specs):
+    root, _ = specs
+    (root / "multi.yaml").write_text("a: 1\n---\na: 2\n", encoding="utf-8")
+    (root / "top.yaml").write_text("all: {$load_glob: '*t.yaml'}\nmulti: {$load: multi.yaml}\n", encoding="utf-8")
+    [doc] = load_structured_file(str(root / "top.yaml"))
+    assert doc["multi"] == [{"a": 1}, {"a": 2}]
+    assert [d["base"]["name"] for d in doc["all"]] == ["base", "base"]  # left.yaml, right.yaml
+
+
+def test_edits_are_seen_without_reset(specs):
+    root, parsed = specs
+    load_structured_file(str(root / "left.yaml"))
+    (root / "shared" / "base.yaml").write_text("name: edited!\n", encoding="utf-8")
+    assert load_structured_file(str(root / "left.yaml")) == [{"base": {"name": "edited!"}}]
+
+
+def test_cycle_is_reported(specs, capsys):
+    root, _ = specs
+    (root / "a.yaml").write_text("b: {$load: b.yaml}\n", encoding="utf-8")
+    (root / "b.yaml").write_text("a: {$load: a.yaml}\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        load_structured_file(str(root / "a.yaml"))
+    assert "$load cycle:" in capsys.readouterr().err
+    assert structload._EXPANDING == {}
+    with pytest.raises(SystemExit):
+        load_structured_file(str(root / "missing-ref.yaml"))
@@ -0,0 +1,58 @@
+import pytest
+
+from modules import cli
+from modules.matrix import expand_matrix, format_out, matrix_entries, parse_matrix
+
+
+pytest.importorskip("jinja2")
+pytest.importorskip("yaml")
+
+
+def test_parse_and_expand_product():
+    axes = parse_matrix(["branch=a,b", {"model": ["x", "y", "z"]}])
+    combos = expand_matrix(axes)
+    assert len(combos) == 6
+    assert combos[0] == {"branch": "a", "model": "x"}
+    assert combos[-1] == {"branch": "b", "model": "z"}
+
+
+def test_parse_matrix_rejects_bad_spec():
+    with pytest.raises(SystemExit):
+        parse_matrix(["novalues"])
+
+
+def test_out_template_requires_placeholders():
+    axes = parse_matrix(["k=1,2"])
+    with pytest.raises(SystemExit):
+        matrix_entries(axes, "out.txt")
+    with pytest.raises(SystemExit):
+        format_out("out/{missing}.txt", {"k": "1"})
+    assert [e["out"] for e in matrix_entries(axes, "o/{k}.txt")] == ["o/1.txt", "o/2.txt"]
+
+
+def test_cli_matrix_writes_one_file_per_combination(tmp_path, monkeypatch):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ owner }}:{{ branch }}:{{ model }}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    cli.main([
+        "--template-name", str(tfile), "--set", "owner=me",
+        "--matrix", "branch=a,b", "--matrix", "model=x,y",
+        "--out", str(tmp_path / "out" / "{branch}-{model}.md"), "--jobs", "2",
+    ])
+
+    got = sorted(p.name for p in (tmp_path / "out").iterdir())
+    assert got == ["a-x.md", "a-y.md", "b-x.md", "b-y.md"]
+    assert (tmp_path / "out" / "b-y.md").read_text(encoding="utf-8") == "me:b:y"
+
+
+def test_config_matrix_block_keeps_value_types(tmp_path, monkeypatch):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ n + 1 }}", encoding="utf-8")
+    (tmp_path / "codex.yaml").write_text("matrix:\n  n: [1, 2]\nout: ./n{n}.txt\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    cli.main(["--template-name", str(tfile), "--jobs", "1"])
+
+    assert (tmp_path / "n1.txt").read_text(encoding="utf-8") == "2"
+    assert (tmp_path / "n2.txt").read_text(encoding="utf-8") == "3"
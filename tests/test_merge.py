@@ -0,0 +1,93 @@
+import json
+import sys
+
+import pytest
+
+from modules import cli
+from modules.layered import LayeredDict
+from modules.merge import Merger, merge_documents, parse_strategies
+
+
+def test_default_merges_mappings_and_replaces_the_rest():
+    ctx = merge_documents({}, [{"a": {"x": 1, "l": [1]}, "b": 1}, {"a": {"y": 2, "l": [2]}, "b": {"z": 3}}])
+    assert ctx == {"a": {"x": 1, "y": 2, "l": [2]}, "b": {"z": 3}}
+
+
+def test_sources_are_shared_not_copied_and_never_modified():
+    d1 = {"big": {"rows": list(range(5))}, "svc": {"env": {"A": "1"}, "opts": {"k": 1}}}
+    d2 = {"svc": {"env": {"B": "2"}}}
+    before = json.dumps([d1, d2])
+    ctx = merge_documents({}, [d1, d2])
+    assert json.dumps([d1, d2]) == before
+    assert ctx["big"] is d1["big"] and ctx["svc"]["opts"] is d1["svc"]["opts"]
+    assert ctx["svc"] is not d1["svc"] and ctx["svc"]["env"] == {"A": "1", "B": "2"}
+
+
+def test_strategies():
+    docs = [
+        {"flags": ["-O1"], "services": [{"name": "api", "env": {"A": 1}, "tags": ["x"]}, {"name": "db"}],
+         "profiles": {"dev": {"a": 1}}},
+        {"flags": ["-g"], "services": [{"name": "api", "env": {"B": 2}, "tags": ["y"]}, {"name": "web"}],
+         "profiles": {"dev": {"b": 2}}},
+    ]
+    before = json.dumps(docs)
+    ctx = merge_documents({}, docs, {"flags": "append", "services": "keyed:name",
+                                     "services.tags": "append", "profiles.*": "replace"})
+    assert ctx == {
+        "flags": ["-O1", "-g"],
+        "services": [{"name": "api", "env": {"A": 1, "B": 2}, "tags": ["x", "y"]}, {"name": "db"}, {"name": "web"}],
+        "profiles": {"dev": {"b": 2}},
+    }
+    assert json.dumps(docs) == before
+    assert parse_strategies(["a.b=keyed:id", {"c": "merge"}]) == {"a.b": ("keyed", "id"), "c": ("merge", None)}
+    with pytest.raises(SystemExit):
+        parse_strategies(["a=sideways"])
+
+
+def test_keyed_lists_with_items_missing_the_field():
+    m = Merger({"svc": "keyed:name"})
+    ctx = m.merge({"svc": [{"other": 1}, {"name": "api", "port": 1}, "plain"]},
+                  {"svc": [{"other": 2}, {"name": "api", "port": 2}, {"name": "web"}]})
+    assert ctx == {"svc": [{"other": 1}, {"name": "api", "port": 2}, "plain", {"other": 2}, {"name": "web"}]}
+
+
+def test_nesting_deeper_than_the_recursion_limit():
+    def nested(depth, leaf):
+        doc = leaf
+        for _ in range(depth):
+            doc = {"n": doc}
+        return doc
+    depth = sys.getrecursionlimit() + 100
+    m = Merger()
+    ctx = m.merge({}, nested(depth, {"a": 1}))
+    m.merge(ctx, nested(depth, {"b": 2}))
+    for _ in range(depth):
+        ctx = ctx["n"]
+    assert ctx == {"a": 1, "b": 2}
+
+
+def test_layered_base_is_left_untouched():
+    base = {"services": [{"name": "api", "port": 1}]}
+    layer = Merger({"services": "keyed:name"}).merge(LayeredDict(base), {"services": [{"name": "api", "port": 2}]})
+    assert layer["services"] == [{"name": "api", "port": 2}]
+    assert base == {"services": [{"name": "api", "port": 1}]}
+
+
+def test_cli_and_config_merge_strategy(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("yaml")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.yaml").write_text("items: [1]\nsvc: [{name: api, port: 1}, {name: db}]\n", encoding="utf-8")
+    (tmp_path / "b.yaml").write_text("items: [2]\nsvc: [{name: api, port: 2}, {name: web}]\n", encoding="utf-8")
+    (tmp_path / "codex.yaml").write_text("merge_strategy:\n  svc: keyed:name\n", encoding="utf-8")
+    tpl = tmp_path / "main.tpl"
+    tpl.write_text("{{ items|tojson }} {{ svc|tojson }}", encoding="utf-8")
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl), "--load", "a.yaml", "--load", "b.yaml",
+                                      "--merge-strategy", "items=append"])
+    cli.main()
+    # The CLI flag replaces the config list, as for the other repeatable flags.
+    assert capsys.readouterr().out.strip() == '[1, 2] [{"name": "api", "port": 2}, {"name": "web"}]'
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl), "--load", "a.yaml", "--load", "b.yaml"])
+    cli.main()
+    assert capsys.readouterr().out.strip() == '[2] [{"name": "api", "port": 2}, {"name": "db"}, {"name": "web"}]'
@@ -0,0 +1,140 @@
+import glob
+import json
+import math
+import os
+
+import pytest
+
+from modules import cli, parsers
+from modules.jinja_filters import to_nice_yaml
+from modules.structload import load_structured_file
+
+yaml = pytest.importorskip("yaml")
+
+REPO = os.path.join(os.path.dirname(__file__), "..")
+CORPUS = sorted(f for ext in ("json", "yaml", "yml")
+                for f in glob.glob(os.path.join(REPO, "resources", "**", f"*.{ext}"), recursive=True)
+                + glob.glob(os.path.join(REPO, "config", f"*.{ext}")))
+
+
+def _available(kind):
+    names = []
+    for backend in (("stdlib", "orjson") if kind == "json" else ("python", "c")):
+        os.environ[parsers.JSON_ENV if kind == "json" else parsers.YAML_ENV] = backend
+        try:
+            (parsers.json_backend if kind == "json" else parsers.yaml_backend)()
+            names.append(backend)
+        except SystemExit:
+            pass
+    return names
+
+
+@pytest.fixture(autouse=True)
+def _restore_backends(monkeypatch):
+    monkeypatch.setenv(parsers.JSON_ENV, "")
+    monkeypatch.setenv(parsers.YAML_ENV, "")
+    monkeypatch.setenv("CODEX_DOC_CACHE", "0")
+
+
+def _outcome(fn, text):
+    try:
+        return ("ok", fn(text))
+    except Exception as e:
+        return ("error", type(e).__name__)
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_backends_agree_on_repo_corpus(path, monkeypatch):
+    text = open(path, encoding="utf-8").read()
+    results = {}
+    for backend in _available("yaml"):
+        monkeypatch.setenv(parsers.YAML_ENV, backend)
+        results[f"yaml-{backend}"] = _outcome(parsers.yaml_load_all, text)
+    if path.endswith(".json"):
+        for backend in _available("json"):
+            monkeypatch.setenv(parsers.JSON_ENV, backend)
+            results[f"json-{backend}"] = _outcome(parsers.json_loads, text)
+    yaml_results = [v for k, v in results.items() if k.startswith("yaml-")]
+    json_results = [v for k, v in results.items() if k.startswith("json-")]
+    assert all(r == yaml_results[0] for r in yaml_results), results
+    assert all(r == json_results[0] for r in json_results), results
+
+
+@pytest.mark.parametrize("text", [
+    '{"a": [1, 2.5, -0.0, 1e300, "\\u00e9", null, true], "b": {"c": "d"}}',
+    '{"dup": 1, "dup": 2}',
+    '[9223372036854775808, -9223372036854775809, 123456789012345678901234567890]',
+    '{"s": "\\ud800"}',
+])
+def test_json_backends_match_stdlib(text, monkeypatch):
+    for backend in _available("json"):
+        monkeypatch.setenv(parsers.JSON_ENV, backend)
+        assert parsers.json_loads(text) == json.loads(text)
+
+
+def test_json_nan_and_errors_match_stdlib(monkeypatch):
+    for backend in _available("json"):
+        monkeypatch.setenv(parsers.JSON_ENV, backend)
+        assert math.isnan(parsers.json_loads('{"x": NaN}')["x"])
+        with pytest.raises(json.JSONDecodeError) as err:
+            parsers.json_loads('{"x": ')
+        assert str(err.value) == "Expecting value: line 1 column 7 (char 6)"
+
+
+NICE_VALUES = [
+    {"name": "x", "items": [1, 2, {"k": None}], "nested": {"a": {"b": [True, 1.5]}}},
+    {"unicode": "héllo — ✓", "multi": "line one\nline two\n", "empty": [], "e": {}},
+    [("a", 1), ("b", 2)],  # zip filter output
+    {"long": "word " * 40, "quoted": "yes", "colon": "a: b", "num_str": "012"},
+    {"title": "ship it 🚀"},  # outside the BMP: CDumper escapes it
+    "abc",  # bare scalar: CDumper drops the '...' document end
+]
+
+
+@pytest.mark.parametrize("value", NICE_VALUES)
+def test_to_nice_yaml_is_backend_independent(value, monkeypatch):
+    outputs = set()
+    for backend in _available("yaml"):
+        monkeypatch.setenv(parsers.YAML_ENV, backend)
+        outputs.add(to_nice_yaml(value, indent=4))
+    yaml = pytest.importorskip("yaml")
+    assert outputs == {yaml.dump(value, default_flow_style=False, sort_keys=False, indent=4, allow_unicode=True)}
+
+
+def test_select_backends_via_config(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "codex.yaml").write_text("yaml_backend: python\njson_backend: stdlib\n", encoding="utf-8")
+    (tmp_path / "d.yaml").write_text("v: 1\n", encoding="utf-8")
+    (tmp_path / "t.tpl").write_text("{{ v }}", encoding="utf-8")
+    monkeypatch.delenv(parsers.JSON_ENV, raising=False)
+    monkeypatch.delenv(parsers.YAML_ENV, raising=False)
+    seen = []
+    dispatch = cli._dispatch
+    def spy(args):
+        seen.append(parsers.backend_names())
+        dispatch(args)
+    monkeypatch.setattr(cli, "_dispatch", spy)
+    cli.main(["--template-name", "t.tpl", "--load", "d.yaml"])
+    assert capsys.readouterr().out == "1"
+    assert seen == [{"json": "stdlib", "yaml": "python"}]
+    # The selection is scoped to that run.
+    assert parsers.JSON_ENV not in os.environ and parsers.YAML_ENV not in os.environ
+
+
+def test_unknown_or_missing_backend_is_an_error(monkeypatch):
+    with pytest.raises(SystemExit):
+        parsers.select_backends(json_backend="simdjson")
+    if not getattr(yaml, "__with_libyaml__", False):
+        monkeypatch.setenv(parsers.YAML_ENV, "c")
+        with pytest.raises(SystemExit):
+            parsers.yaml_backend()
+
+
+def test_loaded_documents_identical_across_backends(tmp_path, monkeypatch):
+    f = tmp_path / "d.yaml"
+    f.write_text("a: &x [1, 2]\nb: *x\nwhen: 2024-01-02\nt: !!str 3\n---\n- ~\n- 0x1F\n", encoding="utf-8")
+    results = []
+    for backend in _available("yaml"):
+        monkeypatch.setenv(parsers.YAML_ENV, backend)
+        results.append(load_structured_file(str(f)))
+    assert all(r == results[0] for r in results)
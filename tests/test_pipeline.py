@@ -0,0 +1,99 @@
+import pytest
+
+from modules import cli
+from modules.pipeline import phase_levels
+
+
+pytest.importorskip("jinja2")
+pytest.importorskip("yaml")
+
+
+def _setup(tmp_path):
+    (tmp_path / "p0.tpl").write_text("P0:{{ task }}", encoding="utf-8")
+    (tmp_path / "a.tpl").write_text("A<{{ PREV }}>", encoding="utf-8")
+    (tmp_path / "b.tpl").write_text("B<{{ PREV }}>{{ include_text('note.txt') }}", encoding="utf-8")
+    (tmp_path / "final.tpl").write_text("{{ A }}|{{ B }}", encoding="utf-8")
+    (tmp_path / "note.txt").write_text("n1", encoding="utf-8")
+    pipe = tmp_path / "pipe.yaml"
+    pipe.write_text(
+        f"""\
+context:
+  set: [task=T]
+phases:
+  - {{name: p0, template: {tmp_path}/p0.tpl, out: {tmp_path}/out/p0.md}}
+  - {{name: a, template: {tmp_path}/a.tpl, out: {tmp_path}/out/a.md, inputs: {{PREV: p0}}}}
+  - {{name: b, template: {tmp_path}/b.tpl, out: {tmp_path}/out/b.md, inputs: {{PREV: p0}}}}
+  - {{name: final, template: {tmp_path}/final.tpl, out: {tmp_path}/out/final.md, inputs: {{A: a, B: b}}}}
+""",
+        encoding="utf-8",
+    )
+    return pipe
+
+
+def test_phase_levels_groups_independent_phases_and_detects_cycles():
+    phases = [{"name": "x"}, {"name": "y", "inputs": {"K": "x"}}, {"name": "z", "after": ["x"]}]
+    assert [[p["name"] for p in lvl] for lvl in phase_levels(phases)] == [["x"], ["y", "z"]]
+    with pytest.raises(SystemExit):
+        phase_levels([{"name": "x", "after": "y"}, {"name": "y", "after": "x"}])
+
+
+def test_pipeline_runs_dag_and_skips_unchanged_phases(tmp_path, monkeypatch, capsys):
+    pipe = _setup(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    cli.main(["--pipeline", str(pipe), "--jobs", "2"])
+    assert (tmp_path / "out" / "final.md").read_text(encoding="utf-8") == "A<P0:T>|B<P0:T>n1"
+    assert "4 rendered, 0 skipped" in capsys.readouterr().err
+
+    cli.main(["--pipeline", str(pipe)])
+    assert "0 rendered, 4 skipped" in capsys.readouterr().err
+
+    # an include of phase b changed -> b and its dependent re-render
+    (tmp_path / "note.txt").write_text("n2", encoding="utf-8")
+    cli.main(["--pipeline", str(pipe)])
+    assert "2 rendered, 2 skipped" in capsys.readouterr().err
+    assert (tmp_path / "out" / "final.md").read_text(encoding="utf-8") == "A<P0:T>|B<P0:T>n2"
+
+    cli.main(["--pipeline", str(pipe), "--force"])
+    assert "4 rendered, 0 skipped" in capsys.readouterr().err
+
+
+def test_pipeline_failure_blocks_dependents(tmp_path, monkeypatch, capsys):
+    pipe = _setup(tmp_path)
+    (tmp_path / "b.tpl").write_text("{{ include_text('missing.txt') }}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--pipeline", str(pipe)])
+    assert exc.value.code == 1
+    err = capsys.readouterr().err
+    assert "FAILED b" in err and "BLOCKED final" in err
+    assert (tmp_path / "out" / "a.md").exists()
+
+
+def test_pipeline_paths_are_relative_to_the_pipeline_file(tmp_path, monkeypatch, capsys):
+    proj = tmp_path / "proj"
+    (proj / "tpl").mkdir(parents=True)
+    (proj / "tpl" / "a.tpl").write_text("A", encoding="utf-8")
+    (proj / "tpl" / "b.tpl").write_text("{{ PREV }}B {{ owner }} {{ D.v }} {{ note }} {{ N }}", encoding="utf-8")
+    (proj / "data.yaml").write_text("owner: me\n", encoding="utf-8")
+    (proj / "d.json").write_text('{"v": 1}', encoding="utf-8")
+    (proj / "note.txt").write_text("noted", encoding="utf-8")
+    pipe = proj / "pipe.yaml"
+    pipe.write_text(
+        "context:\n"
+        "  load: [data.yaml]\n"
+        "  set: [note=@note.txt]\n"
+        "phases:\n"
+        "  - {name: a, template: tpl/a.tpl, out: out/a.md}\n"
+        "  - {name: b, template: tpl/b.tpl, inputs: {PREV: a}, load_into: [D=d.json], set_file: [N=note.txt]}\n",
+        encoding="utf-8",
+    )
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+
+    cli.main(["--pipeline", "../proj/pipe.yaml"])
+    assert capsys.readouterr().out == "AB me 1 noted noted"
+    assert (proj / "out" / "a.md").read_text(encoding="utf-8") == "A"
+    assert (proj / ".pipe.state.json").exists() and not list(elsewhere.iterdir())
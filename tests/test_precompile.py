@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from modules import cli
+from modules.precompile import compile_tree, list_templates
+
+
+pytest.importorskip("jinja2")
+
+
+def _tree(tmp_path):
+    root = tmp_path / "tpl"
+    (root / "parts").mkdir(parents=True)
+    (root / "main.tpl").write_text("M[{% include 'parts/p.tpl' %}]{{ x|to_nice_yaml }}", encoding="utf-8")
+    (root / "parts" / "p.tpl").write_text("P{{ x }}", encoding="utf-8")
+    (root / ".hidden.swp").write_text("{% broken", encoding="utf-8")
+    (root / "schema.json").write_text('{"x": "{% not a template"}', encoding="utf-8")
+    return root
+
+
+def test_list_templates_skips_hidden_and_prefers_first_root(tmp_path):
+    root = _tree(tmp_path)
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "main.tpl").write_text("shadowed", encoding="utf-8")
+    refs = dict(list_templates([str(root), str(other)]))
+    assert sorted(refs) == ["main.tpl", "parts/p.tpl"]
+    (root / "prompt.j2.tpl.md").write_text("x", encoding="utf-8")
+    assert "prompt.j2.tpl.md" in dict(list_templates([str(root)]))
+    assert refs["main.tpl"] == str(root / "main.tpl")
+
+
+def test_compile_tree_reports_syntax_errors(tmp_path):
+    root = _tree(tmp_path)
+    (root / "bad.tpl").write_text("line1\n{% if %}", encoding="utf-8")
+    count, errors = compile_tree([str(root)], None, jobs=2)
+    assert count == 2
+    assert len(errors) == 1 and "bad.tpl:2" in errors[0]
+
+
+def test_cli_compile_then_render_precompiled(tmp_path, monkeypatch, capsys):
+    root = _tree(tmp_path)
+    target = tmp_path / "compiled.zip"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_PRECOMPILED", "")  # restored after the test; main() sets it
+
+    cli.main(["--compile-templates", str(target), "--template-search", str(root), "--jobs", "1"])
+    assert target.exists()
+    assert "2 compiled, 0 failed" in capsys.readouterr().err
+
+    # a source older than the archive renders from the compiled module...
+    part = root / "parts" / "p.tpl"
+    part.write_text("CHANGED", encoding="utf-8")
+    built = os.path.getmtime(target)
+    os.utime(part, (built - 10, built - 10))
+    cli.main(["--template-name", str(root / "main.tpl"), "--set", "x=1", "--precompiled", str(target)])
+    assert capsys.readouterr().out == "M[P1]'1'\n"
+    # ...and one edited after the archive was built from its source
+    os.utime(part, (built + 10, built + 10))
+    cli.main(["--template-name", str(root / "main.tpl"), "--set", "x=1", "--precompiled", str(target)])
+    assert capsys.readouterr().out == "M[CHANGED]'1'\n"
+
+
+def test_precompiled_directory_modules_are_stamped_per_template(tmp_path, monkeypatch, capsys):
+    root = _tree(tmp_path)
+    target = tmp_path / "compiled"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_PRECOMPILED", "")
+    compile_tree([str(root)], str(target), jobs=1)
+    main = root / "main.tpl"
+    main.write_text("new {{ x }}", encoding="utf-8")
+    os.utime(main, (os.path.getmtime(target) + 10,) * 2)
+    cli.main(["--template-name", str(main), "--set", "x=1", "--precompiled", str(target)])
+    assert capsys.readouterr().out.strip() == "new 1"
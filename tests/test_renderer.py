@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+
+from modules import cli, structload
+from modules.renderer import Renderer
+
+
+pytest.importorskip("jinja2")
+pytest.importorskip("yaml")
+
+
+def _layout(tmp_path):
+    tdir = tmp_path / "tpl"
+    tdir.mkdir()
+    tfile = tdir / "main.tpl"
+    tfile.write_text(
+        "{{ owner }}|{{ DATA.title }}|{% for t in tasks %}[{{ t }}]{% endfor %}|{{ meta }}|{{ L }}",
+        encoding="utf-8",
+    )
+    (tmp_path / "data.json").write_text('{"title": "T"}', encoding="utf-8")
+    (tmp_path / "base.yaml").write_text("owner: base\nmeta: {a: 1}\n", encoding="utf-8")
+    (tmp_path / "a.txt").write_text("A", encoding="utf-8")
+    return tfile
+
+
+def test_session_matches_cli_output(tmp_path, monkeypatch, capsys):
+    tfile = _layout(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    cli.main([
+        "--template-name", str(tfile),
+        "--load", "base.yaml", "--load-into", "DATA=data.json",
+        "--set", "owner=me", "--set-json", 'meta={"b": [1, 2]}',
+        "--add", "tasks=x", "--add-file", "tasks=*.txt", "--set-index", "L:1=y",
+    ])
+    expected = capsys.readouterr().out
+
+    r = Renderer(config=False)
+    got = (
+        r.session()
+        .load("base.yaml").load_into("DATA", "data.json")
+        .set("owner", "me").set_json("meta", {"b": [1, 2]})
+        .add("tasks", "x").add_file("tasks", "*.txt").set_index("L", 1, "y")
+        .render(tfile)
+    )
+    assert got == expected
+    assert got.startswith("me|T|[x][A]|")
+
+
+def test_sessions_are_independent_and_share_environment(tmp_path, monkeypatch):
+    tfile = _layout(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    r = Renderer(config=False)
+
+    s1 = r.session().load_into("DATA", "data.json").set("owner", "one")
+    s2 = r.session().load_into("DATA", "data.json").set("owner", "two")
+    assert r.session().set("x", "1").context() == {"x": "1"}
+    assert s1.render(tfile).startswith("one|")
+    assert "".join(s2.stream(tfile)).startswith("two|")
+    assert len(r._envs) == 1
+
+
+def test_renderer_uses_config_defaults(tmp_path, monkeypatch):
+    tfile = _layout(tmp_path)
+    (tmp_path / "codex.yaml").write_text("set:\n  - owner=cfg\nload_into:\n  DATA: ./data.json\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    out = Renderer().session().render(tfile)
+    assert out.startswith("cfg|T|")
+
+
+def test_sessions_share_listings_and_parsed_documents(tmp_path, monkeypatch):
+    tfile = _layout(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    parsed = []
+    real_parse = structload._parse_structured_file
+    monkeypatch.setattr(structload, "_parse_structured_file", lambda p: parsed.append(p.name) or real_parse(p))
+    r = Renderer(config=False)
+
+    def render():
+        return r.session().load("base.yaml").load_into("DATA", "data.json").add_file("tasks", "*.txt").render(tfile)
+
+    assert render().startswith("base|T|") and parsed == ["base.yaml", "data.json"]
+    # Setting a key in one session leaves the shared documents untouched.
+    assert r.session().load("base.yaml").set("meta.b", "2").context()["meta"] == {"a": 1, "b": "2"}
+    scans = r._tree_index.scans
+    assert "|[A]|{'a': 1}|" in render()
+    assert len(parsed) == 2 and r._tree_index.scans == scans
+    # New files and edits are picked up without invalidate().
+    (tmp_path / "b.txt").write_text("B", encoding="utf-8")
+    (tmp_path / "base.yaml").write_text("owner: new\nmeta: {a: 2}\n", encoding="utf-8")
+    assert render().startswith("new|T|[A][B]|{'a': 2}|")
+    r.invalidate()
+    render()
+    assert parsed.count("base.yaml") == 3 and parsed.count("data.json") == 2 and r._tree_index.scans > scans + 1
+
+
+def test_renderer_applies_config_run_settings_like_the_cli(tmp_path, monkeypatch, capsys):
+    (tmp_path / "a.yaml").write_text("items: [1]\n", encoding="utf-8")
+    (tmp_path / "b.yaml").write_text("items: [2]\n", encoding="utf-8")
+    (tmp_path / "codex.yaml").write_text("merge_strategy: {items: append}\nlist_index_limit: 5\n", encoding="utf-8")
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("{{ items|tojson }} {{ L|length }}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("CODEX_LIST_INDEX_LIMIT", raising=False)
+
+    cli.main(["--template-name", str(tfile), "--load", "a.yaml", "--load", "b.yaml", "--set-index", "L:1=x"])
+    expected = capsys.readouterr().out.strip()
+    r = Renderer()
+    assert r.session().load("a.yaml").load("b.yaml").set_index("L", 1, "x").render(tfile) == expected == "[1, 2] 2"
+    assert "".join(r.session().load("a.yaml").load("b.yaml").set_index("L", 1, "x").stream(tfile)) == expected
+
+    with pytest.raises(SystemExit):
+        cli.main(["--template-name", str(tfile), "--set-index", "L:10=x"])
+    with pytest.raises(SystemExit):
+        r.session().set_index("L", 10, "x").render(tfile)
+    assert "CODEX_LIST_INDEX_LIMIT" not in os.environ
+
+    # A session's own strategy replaces the config one, as the flag does.
+    assert r.session().load("a.yaml").load("b.yaml").merge_strategy("items", "replace").context() == {"items": [2]}
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from modules.search_index import SearchIndex
+from modules.template_env import build_environment, render_template
+
+
+def test_find_uses_listings_and_negative_entries(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir(); b.mkdir()
+    (b / "x.txt").write_text("x", encoding="utf-8")
+    idx = SearchIndex([str(a), str(b), str(tmp_path / "missing")])
+
+    for _ in range(50):
+        assert idx.find("x.txt") == str(b / "x.txt")
+        assert idx.find("nope.txt") is None
+    assert idx.scans == 3  # a, b, missing: listed once each
+    assert idx.stats == 0
+
+
+def test_begin_render_revalidates_directory_mtime(tmp_path):
+    idx = SearchIndex([str(tmp_path)])
+    assert idx.find("late.txt") is None
+    (tmp_path / "late.txt").write_text("hi", encoding="utf-8")
+    os.utime(tmp_path, ns=(0, 1))  # make the directory change visible at any mtime resolution
+    assert idx.find("late.txt") is None  # same render: cached listing
+    idx.begin_render()
+    assert idx.find("late.txt") == str(tmp_path / "late.txt")
+    idx.begin_render()
+    assert idx.find("late.txt") is not None
+    assert idx.stats == 2 and idx.scans == 2
+
+
+def test_find_handles_parent_and_subdir_names(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "s.txt").write_text("s", encoding="utf-8")
+    (tmp_path / "top.txt").write_text("t", encoding="utf-8")
+    idx = SearchIndex([str(tmp_path / "sub")])
+    assert idx.find("../top.txt") == str(tmp_path / "top.txt")
+    assert SearchIndex([str(tmp_path)]).find("sub/s.txt") == str(tmp_path / "sub" / "s.txt")
+    assert idx.find("sub") is None  # directories are not files
+
+
+def test_loader_and_include_helpers_share_the_index(tmp_path, monkeypatch):
+    pytest.importorskip("jinja2")
+    monkeypatch.chdir(tmp_path)  # include_text probes cwd first; keep it one of the roots
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc" / "part.txt").write_text("PART", encoding="utf-8")
+    (tmp_path / "inc" / "macro.j2").write_text("{% macro m() %}M{% endmacro %}", encoding="utf-8")
+    (tmp_path / "main.j2").write_text(
+        "{% from 'macro.j2' import m %}{{ m() }} {{ include_text('part.txt') }}", encoding="utf-8")
+
+    env = build_environment([str(tmp_path), str(tmp_path / "inc")])
+    assert env.get_template("main.j2").render() == "M PART"
+    index = env.search_index
+    assert index.scans == 2
+    assert env.get_template("main.j2").render() == "M PART"
+    assert index.scans == 2
+
+
+def test_render_template_picks_up_new_include_between_renders(tmp_path):
+    pytest.importorskip("jinja2")
+    from modules import template_env
+    t = tmp_path / "t.j2"
+    t.write_text("{{ include_text('data.txt') }}", encoding="utf-8")
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "data.txt").write_text("root", encoding="utf-8")
+    env = template_env.build_environment(template_env.template_search_paths(t, [str(tmp_path / "inc")]))
+    assert render_template(t, {}, [str(tmp_path / "inc")], env=env) == "root"
+    os.remove(tmp_path / "data.txt")
+    (tmp_path / "inc" / "data.txt").write_text("inc", encoding="utf-8")
+    os.utime(tmp_path, ns=(0, 1)); os.utime(tmp_path / "inc", ns=(0, 2))
+    assert render_template(t, {}, [str(tmp_path / "inc")], env=env) == "inc"
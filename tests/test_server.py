@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from modules import cli
+
+
+pytest.importorskip("jinja2")
+if not hasattr(socket, "AF_UNIX"):
+    pytest.skip("Unix-domain sockets not available", allow_module_level=True)
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def server(tmp_path):
+    sock = tmp_path / "render.sock"
+    proc = subprocess.Popen(
+        [sys.executable, str(REPO / "codex_prompt_builder.py"), "--serve", str(sock)],
+        cwd=REPO, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(200):
+            if sock.exists():
+                break
+            time.sleep(0.02)
+        else:
+            pytest.fail("server did not start")
+        yield sock
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def test_client_renders_through_server(server, tmp_path, monkeypatch, capsys):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("X={{ x }}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--connect", str(server), "--template-name", "t.tpl", "--set", "x=1"])
+    assert exc.value.code == 0
+    assert capsys.readouterr().out.endswith("X=1")
+
+    # edits are picked up (mtime-based invalidation)
+    time.sleep(0.01)
+    tfile.write_text("Y={{ x }}!", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        cli.main(["--connect", str(server), "--template-name", "t.tpl", "--set", "x=2"])
+    assert capsys.readouterr().out.endswith("Y=2!")
+
+
+def test_client_reports_server_errors(server, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--connect", str(server), "--template-name", "missing.tpl"])
+    assert exc.value.code == 2
+    assert "Template not found" in capsys.readouterr().err
+
+
+def test_output_is_streamed_while_the_render_runs(server, tmp_path):
+    # The render blocks reading the FIFO until the first chunk has arrived.
+    os.mkfifo(tmp_path / "gate")
+    (tmp_path / "t.tpl").write_text("{{ 'x' * 70000 }}|{{ gate }}", encoding="utf-8")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(10)
+    with sock, sock.makefile("rb") as stream:
+        sock.connect(str(server))
+        argv = ["--template-name", "t.tpl", "--lazy-files", "--set-file", "gate=gate"]
+        sock.sendall((json.dumps({"argv": argv, "cwd": str(tmp_path), "env": dict(os.environ)}) + "\n").encode())
+        first = json.loads(stream.readline())
+        assert first == {"stdout": "x" * 65536}
+        with open(tmp_path / "gate", "w", encoding="utf-8") as gate:
+            gate.write("done")
+        msgs = [json.loads(line) for line in stream]
+    out = first["stdout"] + "".join(m.get("stdout", "") for m in msgs)
+    assert out == "x" * 70000 + "|done" and msgs[-1] == {"exit": 0}
+
+
+def test_watch_is_rejected_and_the_server_keeps_serving(server, tmp_path, monkeypatch, capsys):
+    (tmp_path / "t.tpl").write_text("X={{ x }}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    for flag in ("--watch", "--wat"):
+        with pytest.raises(SystemExit) as exc:
+            cli.main(["--connect", str(server), "--template-name", "t.tpl", flag])
+        assert exc.value.code == 2
+        assert "--watch cannot be forwarded" in capsys.readouterr().err
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--connect", str(server), "--template-name", "t.tpl", "--set", "x=1"])
+    assert exc.value.code == 0
+    assert capsys.readouterr().out.endswith("X=1")
@@ -0,0 +1,79 @@
+import sys
+
+import pytest
+
+from modules import cli
+from modules.lazy_values import LazyFile
+from modules.snapshot import load_snapshot, snapshot_key
+from modules.utils import Dependencies, track_dependencies
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("yaml")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    monkeypatch.setenv("CODEX_LAZY_FILES", "")
+    (tmp_path / "conf").mkdir()
+    (tmp_path / "conf" / "a.yaml").write_text("name: one\n", encoding="utf-8")
+    (tmp_path / "intro.md").write_text("Hi", encoding="utf-8")
+    (tmp_path / "main.tpl").write_text("{{ name }} {{ intro }} {{ extra|default('-') }}", encoding="utf-8")
+    return tmp_path
+
+
+def _render(monkeypatch, capsys, *flags):
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", "main.tpl", "--load", "conf/*.yaml",
+                                      "--set-file", "intro=intro.md", *flags])
+    cli.main()
+    return capsys.readouterr().out.strip()
+
+
+def _no_build(monkeypatch):
+    def fail(*a, **k):
+        raise AssertionError("context was rebuilt")
+    monkeypatch.setattr(cli, "apply_context_ops", fail)
+
+
+def test_snapshot_is_reused_while_inputs_are_unchanged(project, monkeypatch, capsys):
+    assert _render(monkeypatch, capsys, "--save-context", "ctx.snap") == "one Hi -"
+    with monkeypatch.context() as m:
+        _no_build(m)
+        assert _render(m, capsys, "--load-context", "ctx.snap") == "one Hi -"
+    # A changed file, or a new glob match, rebuilds and rewrites the snapshot.
+    (project / "intro.md").write_text("Hello", encoding="utf-8")
+    assert _render(monkeypatch, capsys, "--load-context", "ctx.snap") == "one Hello -"
+    (project / "conf" / "b.yaml").write_text("extra: two\n", encoding="utf-8")
+    assert _render(monkeypatch, capsys, "--load-context", "ctx.snap") == "one Hello two"
+    with monkeypatch.context() as m:
+        _no_build(m)
+        assert _render(m, capsys, "--load-context", "ctx.snap") == "one Hello two"
+        # Other context flags never reuse it.
+        with pytest.raises(AssertionError):
+            _render(m, capsys, "--load-context", "ctx.snap", "--set", "extra=x")
+
+
+def test_snapshot_records_inputs_and_keeps_lazy_values(project, monkeypatch, capsys):
+    monkeypatch.setenv("CODEX_LAZY_FILES", "1")
+    _render(monkeypatch, capsys, "--save-context", "ctx.snap")
+    args = cli.build_argparser().parse_args(["--load", "conf/*.yaml", "--set-file", "intro=intro.md"])
+    deps = Dependencies()
+    with track_dependencies(deps):
+        ctx = load_snapshot("ctx.snap", snapshot_key(args))
+    assert isinstance(ctx["intro"], LazyFile) and ctx == {"name": "one", "intro": "Hi"}
+    assert str(project / "intro.md") in deps.files and str(project / "conf" / "*.yaml") in deps.globs
+    assert load_snapshot("ctx.snap", "other") is None
+    (project / "junk.snap").write_bytes(b"not a snapshot")
+    assert load_snapshot("junk.snap", snapshot_key(args)) is None
+
+
+def test_snapshot_globs_skip_excluded_trees(project, monkeypatch, capsys):
+    (project / "conf" / "vendor").mkdir()
+    assert _render(monkeypatch, capsys, "--load", "conf/**/*.yaml", "--exclude", "vendor/",
+                   "--save-context", "ctx.snap") == "one Hi -"
+    # A match inside the excluded tree neither invalidates the snapshot nor is walked.
+    (project / "conf" / "vendor" / "v.yaml").write_text("extra: vendored\n", encoding="utf-8")
+    with monkeypatch.context() as m:
+        _no_build(m)
+        assert _render(m, capsys, "--load", "conf/**/*.yaml", "--exclude", "vendor/",
+                       "--load-context", "ctx.snap") == "one Hi -"
@@ -0,0 +1,88 @@
+import json
+import sys
+
+import pytest
+
+from modules import cli
+from modules.context_ops import apply_add, apply_set_index, apply_set_pairs
+from modules.layered import LayeredDict, list_for_write
+from modules.lazy_values import context_json, json_default
+from modules.sparse_list import SparseList, set_index
+
+
+@pytest.fixture(autouse=True)
+def _policy(monkeypatch):
+    monkeypatch.setenv("CODEX_DENSE_LIST_GAP", "")
+    monkeypatch.setenv("CODEX_LIST_INDEX_LIMIT", "")
+
+
+def test_sparse_list_reads_like_the_padded_list():
+    s = SparseList(["a", "b"])
+    s.set_at(6, "g")
+    padded = ["a", "b", None, None, None, None, "g"]
+    assert len(s) == 7 and list(s) == padded and s == padded
+    assert s[-1] == "g" and s[3] is None and s[1:4] == ["b", None, None]
+    s.append("h")
+    s.insert(0, "z")
+    del s[1]
+    assert list(s) == ["z", "b", None, None, None, None, "g", "h"]
+    assert s.assigned() == {0: "z", 1: "b", 6: "g", 7: "h"}
+    with pytest.raises(IndexError):
+        s[8]
+
+
+def test_set_index_goes_sparse_past_the_gap():
+    lst = ["a"]
+    assert set_index(lst, 3, "d", gap=4) is lst and lst == ["a", None, None, "d"]
+    out = set_index(lst, 50_000_000, "x", gap=4)
+    assert isinstance(out, SparseList) and len(out) == 50_000_001
+    assert out.assigned() == {0: "a", 3: "d", 50_000_000: "x"}
+    assert set_index(["a"], 10, "x", gap=-1) == ["a"] + [None] * 9 + ["x"]
+
+
+def test_context_ops_store_huge_indexes_sparsely():
+    ctx = {}
+    apply_set_pairs(ctx, ["cfg.items[2]=two", "cfg.items[50000000]=far"])
+    apply_add(ctx, ["cfg.items=next"])
+    apply_set_index(ctx, ["cfg.items:0=zero"])
+    items = ctx["cfg"]["items"]
+    assert isinstance(items, SparseList) and len(items) == 50_000_002
+    assert items.assigned() == {0: "zero", 2: "two", 50_000_000: "far", 50_000_001: "next"}
+
+
+def test_dense_list_gap_and_index_limit(monkeypatch):
+    monkeypatch.setenv("CODEX_DENSE_LIST_GAP", "2")
+    ctx = {}
+    apply_set_pairs(ctx, ["a[2]=x", "b[3]=y"])
+    assert ctx["a"] == [None, None, "x"] and type(ctx["a"]) is list
+    assert isinstance(ctx["b"], SparseList)
+    monkeypatch.setenv("CODEX_LIST_INDEX_LIMIT", "10")
+    apply_set_index(ctx, ["c:10=ok"])
+    with pytest.raises(SystemExit):
+        apply_set_index(ctx, ["c:11=no"])
+
+
+def test_output_and_layers():
+    s = SparseList(["a"])
+    s.set_at(3, "d")
+    ctx = {"items": s}
+    assert json.dumps(ctx, default=json_default) == '{"items": ["a", null, null, "d"]}'
+    assert json.loads(context_json(ctx)) == {"items": {"<sparse list>": {"length": 4, "items": {"0": "a", "3": "d"}}}}
+    layer = LayeredDict(ctx)
+    list_for_write(layer, "items").append("e")
+    assert len(layer["items"]) == 5 and len(s) == 4
+
+
+def test_cli_flags_render_sparse_list(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("jinja2")
+    tpl = tmp_path / "main.tpl"
+    tpl.write_text("{{ items|length }} {{ items[5] }} {{ items|select|list }}", encoding="utf-8")
+    monkeypatch.setenv("CODEX_TPL_PATH", "")
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl), "--dense-list-gap", "2",
+                                      "--set", "items[5]=f", "--set", "items[0]=a"])
+    cli.main()
+    assert capsys.readouterr().out.strip() == "6 f ['a', 'f']"
+    monkeypatch.setattr(sys, "argv", ["prog", "--template-name", str(tpl), "--list-index-limit", "3",
+                                      "--set", "items[5]=f"])
+    with pytest.raises(SystemExit):
+        cli.main()
@@ -0,0 +1,48 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Cumulative import time budget for `modules.cli`, in microseconds: ~1.5x the
+# ~50 ms it measures on a typical runner, so a regression that pulls a heavy
+# import back in fails. Override with CODEX_STARTUP_BUDGET_US on slow runners.
+BUDGET_US = int(os.getenv("CODEX_STARTUP_BUDGET_US", "75000"))
+HEAVY = ("jinja2", "yaml", "json")
+
+
+def _importtime(code: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO, capture_output=True, text=True, check=True,
+    )
+    rows = {}
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if m:
+            rows[m.group(4)] = int(m.group(2))
+    return rows
+
+
+def test_cli_import_skips_heavy_modules():
+    rows = _importtime("import modules.cli")
+    loaded = [name for name in rows if name.split(".")[0] in HEAVY]
+    assert loaded == [], f"heavy modules imported at start-up: {loaded}"
+
+
+def test_cli_import_within_budget():
+    # best of three to smooth out scheduler noise
+    best = min(_importtime("import modules.cli")["modules.cli"] for _ in range(3))
+    assert best <= BUDGET_US, f"modules.cli import took {best}us (budget {BUDGET_US}us)"
+
+
+def test_help_does_not_depend_on_cwd(tmp_path):
+    proc = subprocess.run(
+        [sys.executable, str(REPO / "codex_prompt_builder.py"), "--help-extended"],
+        cwd=tmp_path, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0
+    assert "Extended Help" in proc.stdout
@@ -0,0 +1,98 @@
+import pytest
+
+from modules import cli
+from modules.template_env import bytecode_cache, render_template, template_cache_dir
+
+
+pytest.importorskip("jinja2")
+
+
+def _cache_files(root):
+    return [p for p in root.rglob("*.jinja.cache")]
+
+
+def test_bytecode_cache_written_and_invalidated_by_edits(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("CODEX_TEMPLATE_CACHE", raising=False)
+    t = tmp_path / "t.tpl"
+    t.write_text("one {{ x }}", encoding="utf-8")
+
+    assert render_template(t, {"x": 1}, []) == "one 1"
+    assert template_cache_dir().parent == tmp_path / "cache"
+    assert len(_cache_files(tmp_path / "cache")) == 1
+
+    # a fresh Environment reuses the bucket; an edit is still picked up
+    assert render_template(t, {"x": 2}, []) == "one 2"
+    t.write_text("two {{ x }}", encoding="utf-8")
+    assert render_template(t, {"x": 3}, []) == "two 3"
+    assert len(_cache_files(tmp_path / "cache")) == 1
+
+
+def test_xdg_cache_home_and_disable(tmp_path, monkeypatch):
+    monkeypatch.delenv("CODEX_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert template_cache_dir().parent == tmp_path / "xdg" / "codex-assistant"
+
+    monkeypatch.setenv("CODEX_TEMPLATE_CACHE", "0")
+    assert bytecode_cache() is None
+
+
+def test_cli_cache_flags(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path / "unused"))
+    monkeypatch.setenv("CODEX_TEMPLATE_CACHE", "")  # restored after the test; main() may set it
+    t = tmp_path / "t.tpl"
+    t.write_text("hi", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    cli.main(["--template-name", str(t), "--cache-dir", str(tmp_path / "c")])
+    assert len(_cache_files(tmp_path / "c")) == 1
+
+    cli.main(["--clear-template-cache", "--cache-dir", str(tmp_path / "c")])
+    assert _cache_files(tmp_path / "c") == []
+    assert "cleared template cache (1 files)" in capsys.readouterr().err
+
+    cli.main(["--template-name", str(t), "--cache-dir", str(tmp_path / "d"), "--no-template-cache"])
+    assert not (tmp_path / "d").exists()
+
+
+def test_cli_renders_edited_template_after_cache_is_filled(tmp_path, monkeypatch, capsys):
+    import os
+    from pathlib import Path
+    monkeypatch.delenv("CODEX_TEMPLATE_CACHE", raising=False)
+    cache = Path(os.environ["CODEX_CACHE_DIR"])  # set per test by conftest
+    assert template_cache_dir().parent == cache
+    t = tmp_path / "t.tpl"
+    t.write_text("old {{ x }}", encoding="utf-8")
+    cli.main(["--template-name", str(t), "--set", "x=1"])
+    cli.main(["--template-name", str(t), "--set", "x=1"])
+    assert capsys.readouterr().out == "old 1old 1"
+    assert len(_cache_files(cache)) == 1
+    # Same size, newer mtime: the stored bytecode must not be reused.
+    t.write_text("new {{ x }}", encoding="utf-8")
+    st = t.stat()
+    os.utime(t, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    cli.main(["--template-name", str(t), "--set", "x=2"])
+    assert capsys.readouterr().out == "new 2"
+
+
+def test_cached_environments_follow_build_settings(tmp_path, monkeypatch):
+    from jinja2 import ChoiceLoader
+
+    from modules import template_env
+    monkeypatch.setattr(template_env, "_ENV_CACHE", {})
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path / "a"))
+    monkeypatch.delenv("CODEX_TEMPLATE_CACHE", raising=False)
+    monkeypatch.delenv("CODEX_PRECOMPILED", raising=False)
+    paths = [str(tmp_path)]
+    env = template_env.get_environment(paths)
+    assert template_env.get_environment(paths) is env
+
+    monkeypatch.setenv("CODEX_CACHE_DIR", str(tmp_path / "b"))
+    other_dir = template_env.get_environment(paths)
+    assert other_dir is not env and other_dir.bytecode_cache.directory == str(template_cache_dir())
+    monkeypatch.setenv("CODEX_TEMPLATE_CACHE", "0")
+    assert template_env.get_environment(paths).bytecode_cache is None
+    monkeypatch.setenv("CODEX_PRECOMPILED", str(tmp_path / "compiled"))
+    loader = template_env.get_environment(paths).loader
+    assert isinstance(loader, ChoiceLoader) and len(loader.loaders) == 2
+    assert len(template_env._ENV_CACHE) == 4
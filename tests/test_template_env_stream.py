@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+from modules.template_env import render_template, stream_template, write_chunks, write_rendered
+
+
+pytest.importorskip("jinja2")
+
+
+def test_stream_matches_render(tmp_path):
+    t = tmp_path / "t.tpl"
+    t.write_text("{% for i in items %}{{ i }}\n{% endfor %}tail", encoding="utf-8")
+    ctx = {"items": list(range(50))}
+    assert "".join(stream_template(t, ctx, [])) == render_template(t, ctx, [])
+
+
+def test_write_chunks_bounds_each_write():
+    class Recorder(io.StringIO):
+        sizes = []
+
+        def write(self, s):
+            self.sizes.append(len(s))
+            return super().write(s)
+
+    fp = Recorder()
+    total = write_chunks(("x" * 10 for _ in range(100)), fp, buffer_chars=64)
+    assert total == 1000 and fp.getvalue() == "x" * 1000
+    assert max(fp.sizes) < 64 + 10
+
+
+def test_write_rendered_keeps_old_file_on_error(tmp_path):
+    out = tmp_path / "out.txt"
+    out.write_text("OLD", encoding="utf-8")
+
+    def chunks():
+        yield "partial"
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        write_rendered(chunks(), out)
+    assert out.read_text(encoding="utf-8") == "OLD"
+    assert list(tmp_path.iterdir()) == [out]
+
+    write_rendered(iter(["a", "b"]), out)
+    assert out.read_text(encoding="utf-8") == "ab"
@@ -0,0 +1,155 @@
+import glob
+import os
+
+import pytest
+
+from modules import cli
+from modules.tree_index import TreeIndex, glob_sorted, reset_tree_index, tree_index
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    for d in ("a/b/c", ".hid/x", "a/.h2"):
+        (tmp_path / d).mkdir(parents=True)
+    for f in ("a/x.md", "a/b/y.md", "a/b/c/z.md", "a/b/c/e.txt", ".hid/x/q.md", "a/.h2/w.md", "top.md"):
+        (tmp_path / f).write_text(f, encoding="utf-8")
+    os.symlink("a", tmp_path / "lnk")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+PATTERNS = ["*", "**", "**/*.md", "a/**", "a/**/*.md", "*/*.md", "a/*/c/*", "**/", "a/**/",
+            ".hid/**", "**/.h2/*", "lnk/**/*.md", "[ab]/x.md", "a/[!x]*", "./a/*.md",
+            "top.md", "missing/*", "a/x.md/*", ".*"]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matches_glob_module(tree, pattern):
+    assert TreeIndex().glob(pattern) == sorted(glob.glob(pattern, recursive=True))
+
+
+def test_absolute_patterns_match_glob_module(tree):
+    pattern = str(tree / "**" / "*.md")
+    assert TreeIndex().glob(pattern) == sorted(glob.glob(pattern, recursive=True))
+
+
+def test_patterns_share_one_walk(tree):
+    idx = TreeIndex()
+    idx.glob("**/*.md")
+    scans = idx.scans
+    idx.glob("**/*.txt")
+    idx.glob("a/b/*.md")
+    idx.glob(str(tree / "a" / "**"))
+    assert idx.scans == scans
+    assert idx.reused > 0 and idx.patterns == 4
+
+
+def test_snapshot_until_invalidated(tree):
+    idx = reset_tree_index()
+    assert glob_sorted("a/*.new") == []
+    (tree / "a" / "n.new").write_text("", encoding="utf-8")
+    assert glob_sorted("a/*.new") == []
+    idx.invalidate()
+    assert glob_sorted("a/*.new") == ["a/n.new"]
+    assert tree_index() is idx
+
+
+def test_cli_stats_reports_counters(tree, capsys):
+    (tree / "t.tpl").write_text("{{ DOCS|length }} {{ MORE|length }}", encoding="utf-8")
+    pytest.importorskip("jinja2")
+    cli.main(["--template-name", "t.tpl", "--add-file", "DOCS=**/*.md",
+              "--add-file", "MORE=a/**/*.md", "--stats"])
+    out, err = capsys.readouterr()
+    assert out.strip() == "7 3"  # lnk/ is followed, as glob does
+    assert "glob: 2 patterns, 10 matches" in err
+    assert "listings reused" in err
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    (tmp_path / ".git").mkdir()
+    for f in ("src/a.py", "src/gen/g.py", "src/keep.log", "node_modules/pkg/x.py",
+              "build/b.py", "pkg/node_modules/y.py", "pkg/p.py", "pkg/debug.log"):
+        (tmp_path / f).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / f).write_text(f, encoding="utf-8")
+    (tmp_path / ".gitignore").write_text("# deps\nnode_modules/\n/build\n*.log\n!keep.log\n", encoding="utf-8")
+    (tmp_path / "src" / ".codexignore").write_text("gen/\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_ignore_files_prune_the_walk(repo):
+    idx = TreeIndex(ignore_files=True)
+    assert idx.glob("**/*.py") == ["pkg/p.py", "src/a.py"]
+    assert idx.glob("**/*.log") == ["src/keep.log"]
+    scanned = set(idx._listings)
+    assert str(repo / "node_modules") not in scanned  # pruned, never listed
+    assert str(repo / "src" / "gen") not in scanned
+    assert idx.pruned >= 5
+
+
+def test_literal_components_enter_ignored_dirs(repo):
+    assert TreeIndex(ignore_files=True).glob("build/*.py") == ["build/b.py"]
+    assert TreeIndex(ignore_files=True).glob("node_modules/**/*.py") == ["node_modules/pkg/x.py"]
+
+
+def test_excludes_and_no_ignore(repo):
+    assert TreeIndex().glob("**/*.py") == sorted(glob.glob("**/*.py", recursive=True))
+    assert TreeIndex(["src/"], ignore_files=True).glob("**/*.py") == ["pkg/p.py"]
+    assert TreeIndex(["p.py"], ignore_files=False).glob("pkg/**/*.py") == ["pkg/node_modules/y.py"]
+
+
+def test_ignore_rules_apply_to_cli_globs_and_macros(repo, capsys):
+    pytest.importorskip("jinja2")
+    (repo / "data.json").write_text('{"files": {"$glob": "**/*.py"}}', encoding="utf-8")
+    (repo / "t.tpl").write_text("{{ files|length }} {{ SRC|length }}", encoding="utf-8")
+    cli.main(["--template-name", "t.tpl", "--load", "data.json", "--add-file", "SRC=**/*.py",
+              "--exclude", "pkg/", "--respect-ignore"])
+    assert capsys.readouterr().out.strip() == "1 1"
+
+
+@pytest.mark.parametrize("rule, path, is_dir, expected", [
+    ("*.log", "a/b/x.log", False, True),
+    ("/top.txt", "top.txt", False, True),
+    ("/top.txt", "sub/top.txt", False, False),
+    ("docs/*.md", "docs/a.md", False, True),
+    ("docs/*.md", "docs/sub/a.md", False, False),
+    ("a/**/b", "a/x/y/b", False, True),
+    ("a/**/b", "a/b", False, True),
+    ("**/cache", "deep/er/cache", True, True),
+    ("out/", "out", False, False),
+    ("out/", "x/out", True, True),
+    ("f[!0-9].txt", "fa.txt", False, True),
+    ("f[!0-9].txt", "f1.txt", False, False),
+    ("\\#hash", "#hash", False, True),
+])
+def test_gitignore_rule_syntax(rule, path, is_dir, expected):
+    from modules.ignore_rules import is_ignored, parse_rules
+    base = os.path.abspath("/base")
+    rules = parse_rules([rule], base)
+    assert is_ignored(rules, os.path.join(base, *path.split("/")), is_dir) is expected
+
+
+def test_ignore_files_are_opt_in(repo, capsys):
+    pytest.importorskip("jinja2")
+    (repo / "t.tpl").write_text("{{ SRC|length }} {{ B }}", encoding="utf-8")
+    cli.main(["--template-name", "t.tpl", "--add-file", "SRC=**/*.py", "--set-file", "B=build/b.py"])
+    assert capsys.readouterr().out.strip() == f"{len(glob.glob('**/*.py', recursive=True))} build/b.py"
+    # Ignored files stay loadable by explicit path when ignore files are respected.
+    cli.main(["--template-name", "t.tpl", "--add-file", "SRC=**/*.py", "--set-file", "B=build/b.py",
+              "--respect-ignore"])
+    assert capsys.readouterr().out.strip() == "2 build/b.py"
+
+
+def test_config_excludes_are_relative_to_the_config_file(repo, capsys, monkeypatch):
+    pytest.importorskip("jinja2")
+    pytest.importorskip("yaml")
+    (repo / "conf").mkdir()
+    (repo / "conf" / "codex.yaml").write_text("exclude: [/pkg/]\n", encoding="utf-8")
+    (repo / "conf" / "pkg").mkdir()
+    (repo / "conf" / "pkg" / "c.py").write_text("c", encoding="utf-8")
+    (repo / "t.tpl").write_text("{{ SRC|length }}", encoding="utf-8")
+    every = glob.glob("**/*.py", recursive=True)
+    cli.main(["--config", "conf/codex.yaml", "--template-name", "t.tpl", "--add-file", "SRC=**/*.py"])
+    # /pkg/ is anchored at conf/: only conf/pkg/c.py is pruned, not the top-level pkg/.
+    assert capsys.readouterr().out.strip() == str(len(every) - 1)
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+import pytest
+
+from modules import cli
+from modules.tree_index import TreeIndex
+from modules.utils import Dependencies, track_dependencies
+from modules.watch import _Snapshot, watch
+
+
+pytest.importorskip("jinja2")
+pytest.importorskip("yaml")
+
+
+def test_render_records_dependencies(tmp_path, monkeypatch):
+    tdir = tmp_path / "tpl"
+    tdir.mkdir()
+    (tdir / "part.txt").write_text("P", encoding="utf-8")
+    tfile = tdir / "main.tpl"
+    tfile.write_text("{% include 'part.txt' %}{{ include_text('inc.txt') }}{{ a }}{{ b|join }}", encoding="utf-8")
+    (tdir / "inc.txt").write_text("I", encoding="utf-8")
+    (tmp_path / "a.txt").write_text("A", encoding="utf-8")
+    (tmp_path / "snips").mkdir()
+    (tmp_path / "snips" / "s.md").write_text("S", encoding="utf-8")
+    (tmp_path / "d.yaml").write_text("b: { $glob: snips/*.md }\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    deps = Dependencies()
+    with track_dependencies(deps):
+        cli.main(["--template-name", str(tfile), "--set-file", "a=a.txt", "--load", "d.yaml",
+                  "--out", str(tmp_path / "out.txt")])
+
+    for name in ["tpl/main.tpl", "tpl/part.txt", "tpl/inc.txt", "a.txt", "d.yaml", "snips/s.md"]:
+        assert str(tmp_path / name) in deps.files, name
+    assert str(tmp_path / "snips" / "*.md") in deps.globs
+
+
+def test_snapshot_ignores_touch_but_sees_edits_and_new_matches(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("A", encoding="utf-8")
+    deps = Dependencies()
+    deps.files.add(str(f))
+    deps.globs.add(str(tmp_path / "*.md"))
+    snap = _Snapshot(deps)
+
+    st = f.stat()
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert snap.changed() == []
+
+    f.write_text("B", encoding="utf-8")
+    assert snap.changed() == [str(f)]
+
+    (tmp_path / "new.md").write_text("x", encoding="utf-8")
+    assert snap.changed() == [str(tmp_path / "*.md")]
+
+
+def test_watch_rerenders_after_change(tmp_path, monkeypatch):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("v1", encoding="utf-8")
+    out = tmp_path / "out.txt"
+    monkeypatch.chdir(tmp_path)
+    seen = []
+
+    def render_once():
+        cli.run(cli.build_argparser().parse_args(["--template-name", str(tfile), "--out", str(out)]))
+        seen.append(out.read_text(encoding="utf-8"))
+
+    th = threading.Thread(target=watch, args=(render_once,), kwargs={"interval": 0.05, "max_renders": 2})
+    th.start()
+    for _ in range(100):
+        if seen:
+            break
+        time.sleep(0.02)
+    time.sleep(0.05)
+    tfile.write_text("v2", encoding="utf-8")
+    th.join(timeout=10)
+    assert not th.is_alive()
+    assert seen == ["v1", "v2"]
+
+
+def test_watch_survives_template_errors_and_drops_unused_files(tmp_path, monkeypatch, capsys):
+    tfile = tmp_path / "t.tpl"
+    tfile.write_text("v1 {{ include_text('inc.txt') }}", encoding="utf-8")
+    inc = tmp_path / "inc.txt"
+    inc.write_text("I", encoding="utf-8")
+    out = tmp_path / "out.txt"
+    monkeypatch.chdir(tmp_path)
+    calls, seen = [], []
+
+    def render_once():
+        calls.append(1)
+        cli.run(cli.build_argparser().parse_args(["--template-name", str(tfile), "--out", str(out)]))
+        seen.append(out.read_text(encoding="utf-8"))
+
+    def wait_for(n):
+        for _ in range(200):
+            if len(calls) >= n:
+                break
+            time.sleep(0.02)
+        time.sleep(0.1)
+
+    th = threading.Thread(target=watch, args=(render_once,), kwargs={"interval": 0.05, "max_renders": 4})
+    th.start()
+    wait_for(1)
+    tfile.write_text("Hello {{ name }", encoding="utf-8")
+    wait_for(2)
+    tfile.write_text("v3", encoding="utf-8")
+    wait_for(3)
+    # inc.txt is no longer read, so editing it does not re-render.
+    inc.write_text("changed", encoding="utf-8")
+    time.sleep(0.3)
+    assert len(calls) == 3
+    tfile.write_text("v4", encoding="utf-8")
+    th.join(timeout=10)
+    assert not th.is_alive()
+    assert seen == ["v1 I", "v3", "v4"]
+    err = capsys.readouterr().err
+    assert "TemplateSyntaxError" in err and "render failed; waiting for changes" in err
+    assert "watch: 2 files" in err and "watch: 1 files" in err
+
+
+def test_snapshot_globs_follow_the_run_excludes(tmp_path):
+    (tmp_path / "node_modules").mkdir()
+    deps = Dependencies()
+    deps.globs.add(str(tmp_path / "**" / "*.md"))
+    snap = _Snapshot(deps, TreeIndex(["node_modules/"], exclude_base=str(tmp_path)))
+    (tmp_path / "node_modules" / "x.md").write_text("x", encoding="utf-8")
+    assert snap.changed() == []
+    (tmp_path / "y.md").write_text("y", encoding="utf-8")
+    assert snap.changed() == [str(tmp_path / "**" / "*.md")]